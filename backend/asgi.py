@@ -0,0 +1,211 @@
+"""
+Async API in front of the Flask app.
+
+The JSON endpoints the pages call most (/save-health-data,
+/generate-recommendation, /save-reminder, /register-device) are served
+here by FastAPI; everything else falls through to the Flask app, mounted
+as WSGI. Both sides read the same signed session cookie, so a user logged
+in through the Flask pages is logged in here too.
+
+SQLite work runs on a bounded thread pool (ASGI_DB_THREADS) and the chat
+API is called with a shared async HTTP client, so waiting clients - e.g.
+on /generate-recommendation/stream - cost a coroutine, not a thread.
+
+Each worker would otherwise start its own scheduler, so run the workers
+with RUN_SCHEDULER=0 and the jobs in one separate process:
+
+    cd backend
+    RUN_SCHEDULER=0 uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 4
+    python -m utils.jobs
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from fastapi import FastAPI, Request
+from fastapi.routing import APIRoute
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+
+import app as flask_module
+from routes.notifications import register_user_device
+from utils.metrics import METRICS, ensure_flusher
+
+flask_app = flask_module.app
+
+# Threads for SQLite calls; beyond this, requests queue instead of piling
+# more writers onto the database lock
+ASGI_DB_THREADS = int(os.getenv("ASGI_DB_THREADS", "16"))
+# Threads for the mounted Flask pages
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "16"))
+
+db_executor = ThreadPoolExecutor(max_workers=ASGI_DB_THREADS, thread_name_prefix="asgi-db")
+
+
+async def run_db(fn, *args):
+    """Run a blocking (SQLite) call on the bounded executor."""
+    return await asyncio.get_running_loop().run_in_executor(db_executor, partial(fn, *args))
+
+
+@asynccontextmanager
+async def lifespan(api):
+    api.state.http = httpx.AsyncClient(timeout=flask_module.CHATBOT_TIMEOUT)
+    try:
+        yield
+    finally:
+        await api.state.http.aclose()
+        db_executor.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+
+
+# ---------------- Session ----------------
+_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+
+
+def flask_session(request):
+    """The Flask session dict from the request cookie ({} if absent or invalid)."""
+    cookie = request.cookies.get(flask_app.config["SESSION_COOKIE_NAME"])
+    if not cookie or _serializer is None:
+        return {}
+    try:
+        return _serializer.loads(
+            cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds())
+        )
+    except Exception:
+        return {}
+
+
+def login_redirect():
+    # Same answer as the Flask login_required decorator
+    return RedirectResponse("/auth", status_code=302)
+
+
+async def json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def reply(result):
+    payload, status = result
+    return JSONResponse(payload, status_code=status)
+
+
+# ---------------- Chatbot ----------------
+async def chatbot_recommendation(health_summary):
+    """Async get_chatbot_recommendation(): None when the chat API isn't configured."""
+    request_parts = flask_module.chatbot_request(health_summary)
+    if request_parts is None:
+        return None
+    headers, payload = request_parts
+    try:
+        response = await app.state.http.post(flask_module.CHATBOT_URL, headers=headers, json=payload)
+        return flask_module.chatbot_reply(
+            response.status_code, response.json() if response.status_code == 200 else None
+        )
+    except Exception as e:
+        print("Chatbot Error:", e)
+        return flask_module.CHATBOT_FAILED
+
+
+# ---------------- JSON Endpoints ----------------
+@app.post("/save-health-data")
+async def save_health_data(request: Request):
+    user_id = flask_session(request).get("user_id")
+    if user_id is None:
+        return login_redirect()
+    return reply(await run_db(flask_module.save_health_data, user_id, await json_body(request)))
+
+
+@app.get("/generate-recommendation")
+async def generate_recommendation(request: Request, enrich: str = None):
+    user_id = flask_session(request).get("user_id")
+    if user_id is None:
+        return login_redirect()
+    result = await run_db(flask_module.recommendation_payload, user_id)
+    if enrich == "1" and result["health_summary"]:
+        result["chatbot"] = await chatbot_recommendation(result["health_summary"])
+    return JSONResponse(result)
+
+
+@app.get("/generate-recommendation/stream")
+async def generate_recommendation_stream(request: Request):
+    """
+    Server-sent events: the on-box recommendation straight away, then the
+    chat API's answer when (and if) it arrives, then "done".
+    """
+    user_id = flask_session(request).get("user_id")
+    if user_id is None:
+        return login_redirect()
+
+    async def events():
+        result = await run_db(flask_module.recommendation_payload, user_id)
+        yield f"event: recommendation\ndata: {json.dumps(result)}\n\n"
+        if result["health_summary"]:
+            chatbot = await chatbot_recommendation(result["health_summary"])
+            if chatbot is not None and not await request.is_disconnected():
+                yield f"event: chatbot\ndata: {json.dumps({'chatbot': chatbot})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/save-reminder")
+async def save_reminder(request: Request):
+    user_id = flask_session(request).get("user_id")
+    if user_id is None:
+        return login_redirect()
+    return reply(await run_db(flask_module.create_reminder, user_id, await json_body(request)))
+
+
+@app.post("/register-device")
+async def register_device(request: Request):
+    # A JSON client, not a page: 401 like the Flask route, not the login redirect
+    user_id = flask_session(request).get("user_id")
+    if user_id is None:
+        return JSONResponse({"error": "Login required"}, status_code=401)
+    return reply(await run_db(register_user_device, user_id, await json_body(request)))
+
+
+# ---------------- Metrics ----------------
+# The mounted Flask app times its own requests; this covers the routes above
+API_PATHS = {route.path for route in app.routes if isinstance(route, APIRoute)}
+
+
+class MetricsMiddleware:
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in API_PATHS:
+            return await self.inner(scope, receive, send)
+        ensure_flusher()
+        endpoint = scope["path"]
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        METRICS.started(endpoint)
+        started = time.perf_counter()
+        try:
+            await self.inner(scope, receive, send_status)
+        finally:
+            METRICS.finished(scope["method"], endpoint, status[0], time.perf_counter() - started)
+
+
+app.add_middleware(MetricsMiddleware)
+
+# Everything else: the Flask pages
+app.mount("/", WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS))
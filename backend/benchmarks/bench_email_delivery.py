@@ -0,0 +1,89 @@
+"""
+Email delivery benchmark against a local SMTP sink.
+
+Compares the old "connect + login per message" send against the pooled
+EmailDeliveryWorker. --connect-delay emulates the TLS handshake + LOGIN
+cost of a real provider (Gmail is typically 150-300 ms).
+
+    cd backend
+    python benchmarks/bench_email_delivery.py --messages 500 --connect-delay 0.05
+"""
+import argparse
+import os
+import smtplib
+import sys
+import time
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from smtp_sink import SMTPSink  # noqa: E402
+from utils.email_delivery import SMTPConnectionPool, EmailDeliveryWorker  # noqa: E402
+
+SENDER = "bench@smarthealthplus.local"
+
+
+def send_per_message(host, port, n):
+    for i in range(n):
+        msg = EmailMessage()
+        msg["From"] = SENDER
+        msg["To"] = f"user{i}@example.com"
+        msg["Subject"] = "SmartHealthPlus Reminder"
+        msg.set_content("Hello! This is your daily health reminder")
+        with smtplib.SMTP(host, port) as server:
+            server.login(SENDER, "secret")
+            server.send_message(msg)
+
+
+def send_pooled(host, port, n, pool_size):
+    pool = SMTPConnectionPool(host, port, username=SENDER, password="secret",
+                              use_ssl=False, size=pool_size)
+    worker = EmailDeliveryWorker(pool, sender=SENDER, backoff=0.01)
+    futures = [worker.submit(f"user{i}@example.com", "SmartHealthPlus Reminder",
+                             "Hello! This is your daily health reminder")
+               for i in range(n)]
+    delivered = sum(1 for f in futures if f.result())
+    stats = worker.stats()
+    worker.stop()
+    return delivered, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=3)
+    parser.add_argument("--connect-delay", type=float, default=0.05)
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    # The worker prints one line per message; keep the report readable
+    devnull = open(os.devnull, "w")
+
+    sink = SMTPSink(connect_delay=args.connect_delay).start()
+    try:
+        if not args.skip_baseline:
+            t0 = time.perf_counter()
+            send_per_message(sink.host, sink.port, args.messages)
+            elapsed = time.perf_counter() - t0
+            print(f"per-message connect : {args.messages} msgs in {elapsed:.2f}s "
+                  f"({args.messages / elapsed:.0f}/s, {sink.connections} connections)")
+
+        before = sink.connections
+        t0 = time.perf_counter()
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            delivered, stats = send_pooled(sink.host, sink.port, args.messages, args.pool_size)
+        finally:
+            sys.stdout = stdout
+        elapsed = time.perf_counter() - t0
+        print(f"pooled worker       : {delivered} msgs in {elapsed:.2f}s "
+              f"({delivered / elapsed:.0f}/s, {sink.connections - before} connections)")
+        print(f"worker stats        : {stats}")
+    finally:
+        sink.stop()
+        devnull.close()
+
+
+if __name__ == "__main__":
+    main()
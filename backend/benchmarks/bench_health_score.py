@@ -0,0 +1,259 @@
+"""
+Health score benchmark: scalar calculate_health_score / wellness_index in a
+Python loop vs the NumPy batch scorer, on random data that hits every
+threshold boundary. Fails loudly if any score or band differs.
+
+Also checks score_day against the app's previous per-module scorer on
+random stored days, partial records (a field or a module left out)
+included, and the flat scorer against its previous thresholds and
+wellness labels.
+
+    cd backend
+    python benchmarks/bench_health_score.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from models.recommendation import (  # noqa: E402
+    calculate_health_score, wellness_index,
+    calculate_health_scores, wellness_indices, mood_codes,
+)
+from utils.health_score import score_day  # noqa: E402
+
+MOODS = ["Happy", "happy", "HAPPY", "Positive", "good", "Neutral", "okay", "Sad", "Calm", "Anxious", "", None]
+
+
+def random_columns(n, seed=3):
+    rng = np.random.default_rng(seed)
+    # Half-step values so every band edge (6 / 7 / 9 h, 4 / 8 glasses,
+    # 15 / 30 min, stress 3 / 6) is hit exactly; ~5% NaN = not logged
+    def column(high):
+        col = rng.integers(0, high * 2, n) / 2
+        col[rng.random(n) < 0.05] = np.nan
+        return col
+
+    sleep = column(12)
+    hydration = column(12)
+    fitness = column(45)
+    stress = column(11)
+    moods = rng.choice(np.array(MOODS, dtype=object), n)
+    return sleep, hydration, fitness, stress, moods
+
+
+# ---------------- Stored Days vs The Previous Scorer ----------------
+def previous_score(latest):
+    """app.calculate_health_score before the engine, minus the query."""
+    total_score = 0
+    tips = []
+    module_score = 100 / 6
+
+    sleep = latest.get("sleep")
+    if isinstance(sleep, dict):
+        hours = int(sleep.get("hours", 0))
+        quality = sleep.get("quality", "").lower()
+        if 7 <= hours <= 8 and quality == "good":
+            total_score += module_score
+        elif hours >= 6:
+            total_score += module_score * 0.6
+            tips.append("Increase sleep duration.")
+        else:
+            tips.append("Sleep is too low.")
+    else:
+        tips.append("Add sleep data.")
+
+    hydration = latest.get("hydration")
+    if isinstance(hydration, dict):
+        level = hydration.get("level", "").lower()
+        if level == "high":
+            total_score += module_score
+        elif level == "moderate":
+            total_score += module_score * 0.6
+            tips.append("Drink more water.")
+        else:
+            tips.append("Very low hydration.")
+    else:
+        tips.append("Add hydration data.")
+
+    nutrition = latest.get("nutrition")
+    if isinstance(nutrition, dict):
+        if nutrition.get("quality", "").lower() == "good":
+            total_score += module_score
+        else:
+            total_score += module_score * 0.4
+            tips.append("Improve nutrition quality.")
+    else:
+        tips.append("Add nutrition data.")
+
+    fitness = latest.get("fitness")
+    if isinstance(fitness, dict):
+        minutes = int(fitness.get("minutes", 0))
+        steps = int(fitness.get("steps", 0))
+        if minutes >= 30 and steps >= 6000:
+            total_score += module_score
+        elif minutes >= 15 or steps >= 4000:
+            total_score += module_score * 0.6
+            tips.append("Increase activity.")
+        else:
+            tips.append("Very low physical activity.")
+    else:
+        tips.append("Add fitness data.")
+
+    stress = latest.get("stress")
+    if isinstance(stress, dict):
+        level = stress.get("level", "").lower()
+        if level == "low":
+            total_score += module_score
+        elif level == "medium":
+            total_score += module_score * 0.6
+            tips.append("Manage stress better.")
+        else:
+            tips.append("High stress detected.")
+    else:
+        tips.append("Add stress data.")
+
+    mood = latest.get("mood")
+    if isinstance(mood, dict):
+        if mood.get("mood", "").lower() == "happy":
+            total_score += module_score
+        else:
+            total_score += module_score * 0.6
+            tips.append("Mood seems low.")
+    else:
+        tips.append("Add mood data.")
+
+    score = int(round(total_score))
+    wellness = "Needs Improvement" if score < 40 else "Average" if score < 70 else "Excellent"
+    return score, wellness, " ".join(tips)
+
+
+STORED_FIELDS = {
+    "sleep": {"hours": lambda rnd: rnd.randint(0, 24) / 2, "quality": lambda rnd: rnd.choice(["Good", "Poor", "Unspecified"])},
+    "hydration": {"level": lambda rnd: rnd.choice(["High", "moderate", "Low", ""])},
+    "nutrition": {"quality": lambda rnd: rnd.choice(["Good", "good", "Average", "Poor"])},
+    "fitness": {"minutes": lambda rnd: rnd.randint(0, 45), "steps": lambda rnd: rnd.choice([0, 3999, 4000, 5999, 6000, 9000])},
+    "stress": {"level": lambda rnd: rnd.choice(["Low", "Medium", "High", ""])},
+    "mood": {"mood": lambda rnd: rnd.choice(["Happy", "happy", "Sad", "Calm", ""])},
+}
+
+
+def random_day(rnd):
+    """A stored day; ~10% of modules missing and ~15% of fields left out."""
+    day = {}
+    for module, fields in STORED_FIELDS.items():
+        if rnd.random() < 0.1:
+            continue
+        value = {field: make(rnd) for field, make in fields.items() if rnd.random() >= 0.15}
+        if value:
+            day[module] = value
+    return day
+
+
+def check_stored_days(n, seed=3):
+    rnd = random.Random(seed)
+    for _ in range(n):
+        day = random_day(rnd)
+        result = score_day(day)
+        if (result["score"], result["wellness"], " ".join(result["tips"])) != previous_score(day):
+            raise SystemExit(f"❌ score_day disagrees with the previous scorer on {day}")
+    # The partial records that used to slip through
+    for day, score in (({"sleep": {"hours": 7}}, 10), ({"sleep": {"quality": "good"}}, 0),
+                       ({"fitness": {"minutes": 45}}, 10), ({"fitness": {"steps": 8000}}, 10)):
+        if score_day(day)["score"] != score or previous_score(day)[0] != score:
+            raise SystemExit(f"❌ partial record {day} should score {score}")
+
+
+# ---------------- Flat Records vs The Previous Flat Scorer ----------------
+def previous_flat_score(user_data):
+    """models/recommendation.calculate_health_score before the engine."""
+    score = 0
+    sleep = user_data.get("sleep", 0)
+    score += 20 if sleep >= 7 else 10 if sleep >= 5 else 0
+    water = user_data.get("hydration", 0)
+    score += 20 if water >= 3 else 10 if water >= 2 else 0
+    fitness = user_data.get("fitness", 0)
+    score += 20 if fitness >= 30 else 10 if fitness >= 15 else 0
+    stress = user_data.get("stress", 10)
+    score += 20 if stress <= 3 else 10 if stress <= 6 else 0
+    mood = (user_data.get("mood") or "").lower()
+    score += 20 if mood in ["happy", "positive", "good"] else 10 if mood in ["neutral", "okay"] else 0
+    return score
+
+
+def previous_wellness_index(score):
+    if score >= 80:
+        return "Excellent 🌟"
+    elif score >= 60:
+        return "Good 🙂"
+    elif score >= 40:
+        return "Fair 😐"
+    return "Poor 😟"
+
+
+def check_flat_records(records, scores):
+    for record, score in zip(records, scores):
+        if score != previous_flat_score(record) or wellness_index(score) != previous_wellness_index(score):
+            raise SystemExit(f"❌ calculate_health_score changed on {record}: {score}")
+    for record, score, label in (
+        ({"sleep": 10, "hydration": 3, "fitness": 30, "stress": 2, "mood": "happy"}, 100, "Excellent 🌟"),
+        ({"sleep": 5.5, "hydration": 2, "fitness": 15, "stress": 6, "mood": "okay"}, 50, "Fair 😐"),
+        ({"sleep": 7, "hydration": 3, "mood": "Positive"}, 60, "Good 🙂"),
+        ({}, 0, "Poor 😟"),
+    ):
+        if calculate_health_score(record) != score or wellness_index(score) != label:
+            raise SystemExit(f"❌ {record} should score {score} ({label})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--days", type=int, default=200000, help="stored days checked against the previous scorer")
+    args = parser.parse_args()
+
+    check_stored_days(args.days)
+    print(f"{args.days:,} stored days, score_day matches the previous scorer")
+
+    sleep, hydration, fitness, stress, moods = random_columns(args.rows)
+
+    records = [
+        {"sleep": s, "hydration": h, "fitness": f, "stress": st, "mood": m}
+        for s, h, f, st, m in zip(sleep.tolist(), hydration.tolist(), fitness.tolist(),
+                                  stress.tolist(), moods.tolist())
+    ]
+    t0 = time.perf_counter()
+    scalar_scores = [calculate_health_score(r) for r in records]
+    scalar_bands = [wellness_index(s) for s in scalar_scores]
+    scalar_s = time.perf_counter() - t0
+    check_flat_records(records, scalar_scores)
+
+    t0 = time.perf_counter()
+    codes = mood_codes(moods.tolist())
+    encode_s = time.perf_counter() - t0
+
+    # Best of a few runs: the first one also pays for page-faulting the arrays
+    batch_s = float("inf")
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        scores = calculate_health_scores(sleep, hydration, fitness, stress, codes)
+        bands = wellness_indices(scores)
+        batch_s = min(batch_s, time.perf_counter() - t0)
+
+    if not np.array_equal(scores, np.array(scalar_scores)) or not np.array_equal(bands, np.array(scalar_bands)):
+        raise SystemExit("❌ batch scorer disagrees with calculate_health_score")
+
+    print(f"{args.rows:,} records, results identical")
+    print(f"  scalar loop   : {scalar_s:.2f}s ({args.rows / scalar_s:,.0f} rows/s)")
+    print(f"  batch scorer  : {batch_s:.3f}s ({args.rows / batch_s:,.0f} rows/s), "
+          f"{scalar_s / batch_s:.0f}x faster")
+    print(f"  mood encoding : {encode_s:.2f}s (one-off, if moods arrive as strings)")
+
+
+if __name__ == "__main__":
+    main()
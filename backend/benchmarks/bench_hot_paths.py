@@ -0,0 +1,287 @@
+"""
+Hot-path micro-benchmarks with regression thresholds.
+
+Times the pure functions that run on every request or job -
+generate_suggestion per category, the health score engine,
+models/recommendation.*, the cycle phase / female summary, the weekly
+digest text and the profile's calculate_summary - on representative
+inputs from benchmarks/datagen.py, and compares each against
+benchmarks/baselines.json. Exits 1 if any case got slower than its
+baseline by more than --threshold percent (or the case's own
+"threshold" in the file).
+
+Every case is timed best-of --repeat, each run long enough (--min-time)
+for the clock not to matter. Times are divided by a fixed pure-Python
+calibration loop timed between the repeats, so baselines recorded on one
+machine still mean something on another; the raw ns/call are shown too.
+
+    cd backend
+    python benchmarks/bench_hot_paths.py                  # check against the baselines
+    python benchmarks/bench_hot_paths.py --only summary   # cases whose name contains "summary"
+    python benchmarks/bench_hot_paths.py --update         # record new baselines
+
+Re-record the baselines (and commit them) when a change makes a case
+slower on purpose, or faster: an improvement that isn't recorded can be
+given back later without failing the check.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.update({
+    "SMART_HEALTH_PLUS_SECRET_KEY": os.environ.get("SMART_HEALTH_PLUS_SECRET_KEY", "bench"),
+    "NOTIFY_BACKEND": "fake",
+    "RUN_SCHEDULER": "0",
+    "PASSWORD_POOL_SIZE": "0",
+    "METRICS_DIR": "",
+})
+
+import database  # noqa: E402
+from datagen import CATEGORIES, SYMPTOMS, entry_value, persona  # noqa: E402
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_THRESHOLD = 20.0
+INPUTS = 200
+
+
+# ---------------- Timing ----------------
+def _calibration():
+    # Dict/str/float work in the same proportions as the code under test
+    total = 0.0
+    for i in range(1000):
+        d = {"hours": i % 11, "quality": "Good" if i % 3 else "Poor"}
+        total += d["hours"] * 0.5 + len(d["quality"] + str(i))
+    return total
+
+
+def _runner(fn, inputs, min_time):
+    """run() -> ns per call of fn(*args) over `inputs`, looping long enough to time."""
+    def run(number):
+        started = time.perf_counter_ns()
+        for _ in range(number):
+            for args in inputs:
+                fn(*args)
+        return time.perf_counter_ns() - started
+
+    number = 1
+    while run(number) < min_time * 1e9:
+        number *= 2
+    return lambda: run(number) / (number * len(inputs))
+
+
+def measure(fn, inputs, repeat, min_time, calibration):
+    """
+    Best-of-`repeat` (ns/call, calibration ns). The calibration loop runs
+    between the repeats, so both see the same machine (frequency scaling,
+    noisy neighbours) and their ratio stays put.
+    """
+    case = _runner(fn, inputs, min_time)
+    case_ns, calibration_ns = [], []
+    # As timeit: a collection landing in one run would be charged to it
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            calibration_ns.append(calibration())
+            case_ns.append(case())
+    finally:
+        gc.enable()
+    return min(case_ns), min(calibration_ns)
+
+
+# ---------------- Inputs ----------------
+def _days(rnd, n_days):
+    """{"YYYY-MM-DD": day dict} with the odd missing category, like real logs."""
+    who = persona(rnd)
+    today = date(2026, 3, 1)
+    days = {}
+    for back in range(n_days):
+        day = {}
+        for category in CATEGORIES:
+            if rnd.random() < 0.85:
+                day[category] = entry_value(rnd, category, who)
+        days[(today - timedelta(days=back)).isoformat()] = day
+    return days
+
+
+def _weekly_stats(rnd):
+    stats = {}
+    for category, labels in (("sleep", None), ("hydration", ["low", "moderate", "high"]),
+                             ("fitness", None), ("stress", ["low", "medium", "high"]),
+                             ("mood", ["happy", "neutral", "sad", "angry"])):
+        entries = rnd.randint(0, 7)
+        if not entries:
+            continue
+        cat = {"entries": entries, "sum": rnd.uniform(0.5, 9) * entries, "labels": {}}
+        for label in labels or []:
+            cat["labels"][label] = rnd.randint(0, entries)
+        stats[category] = cat
+    return stats
+
+
+TRENDS = [
+    {"label": "Sleep", "direction": "down", "recent": 6.1, "usual": 7.2, "unit": "h"},
+    {"label": "Steps", "direction": "up", "recent": 8400, "usual": 6100, "unit": ""},
+]
+
+
+def build_cases(app_module):
+    from models import recommendation
+    from utils.digests import generate_weekly_summary
+    from utils.health_score import score_day
+
+    rnd = random.Random(49)
+    cases = {}
+
+    for category in CATEGORIES:
+        cases[f"generate_suggestion.{category}"] = (
+            app_module.generate_suggestion,
+            [(category, entry_value(rnd, category)) for _ in range(INPUTS)],
+        )
+
+    days = _days(rnd, INPUTS)
+    cases["health_score.score_day"] = (score_day, [(day,) for day in days.values()])
+
+    flat = []
+    for _ in range(INPUTS):
+        row = {"sleep": rnd.choice([None, 5.5, 6.5, 7, 8.5, 10]), "hydration": rnd.randint(0, 12),
+               "fitness": rnd.choice([0, 10, 20, 45]), "stress": rnd.randint(0, 10),
+               "mood": rnd.choice(["Happy", "Sad", "Anxious", "Neutral", None])}
+        flat.append((row,))
+    cases["recommendation.calculate_health_score"] = (recommendation.calculate_health_score, flat)
+    cases["recommendation.wellness_index"] = (
+        recommendation.wellness_index, [(rnd.randint(0, 100),) for _ in range(INPUTS)])
+
+    for name, values in (
+        ("sleep_recommendation", [rnd.choice([4, 6.5, 7.5, 9.5]) for _ in range(INPUTS)]),
+        ("stress_recommendation", [rnd.choice(["High", "Medium", "Low"]) for _ in range(INPUTS)]),
+        ("fitness_recommendation", [rnd.randint(0, 14000) for _ in range(INPUTS)]),
+        ("nutrition_recommendation", [rnd.randint(900, 3200) for _ in range(INPUTS)]),
+        ("hydration_recommendation", [rnd.randint(0, 12) for _ in range(INPUTS)]),
+        ("mood_recommendation", [rnd.choice(["Sad", "Anxious", "Happy", "Neutral"]) for _ in range(INPUTS)]),
+        ("goal_recommendation", [rnd.choice(["Not Started", "In Progress", "Completed"]) for _ in range(INPUTS)]),
+    ):
+        cases[f"recommendation.{name}"] = (getattr(recommendation, name), [(v,) for v in values])
+
+    # Batch scorer: one call scores a 10k-row column set
+    rows = [row for (row,) in flat] * 50
+    columns = (
+        [float("nan") if r["sleep"] is None else r["sleep"] for r in rows],
+        [r["hydration"] for r in rows], [r["fitness"] for r in rows], [r["stress"] for r in rows],
+        recommendation.mood_codes(r["mood"] for r in rows),
+    )
+    cases["recommendation.calculate_health_scores[10k]"] = (recommendation.calculate_health_scores, [columns])
+    cases["recommendation.mood_codes[10k]"] = (recommendation.mood_codes, [([r["mood"] for r in rows],)])
+
+    periods = []
+    for _ in range(INPUTS):
+        last = date(2026, 3, 1) - timedelta(days=rnd.randint(0, 60))
+        periods.append({"last_period_date": last.isoformat(), "cycle_length": rnd.randint(24, 35),
+                        "period_duration": rnd.randint(3, 7), "symptoms": rnd.choice(SYMPTOMS)})
+    cases["get_cycle_phase"] = (
+        app_module.get_cycle_phase, [(p["last_period_date"], p["cycle_length"]) for p in periods])
+    cases["generate_female_health_summary"] = (app_module.generate_female_health_summary, [(p,) for p in periods])
+
+    cases["digests.generate_weekly_summary"] = (
+        generate_weekly_summary, [(_weekly_stats(rnd),) for _ in range(INPUTS)])
+
+    # The profile page: this week and the whole 30-day window
+    month = [_days(rnd, 30) for _ in range(10)]
+    cases["profile.calculate_summary[7d]"] = (
+        app_module.calculate_summary, [({d: v for d, v in sorted(m.items())[-7:]}, TRENDS) for m in month])
+    cases["profile.calculate_summary[30d]"] = (app_module.calculate_summary, [(m, TRENDS) for m in month])
+    return cases
+
+
+# ---------------- Main ----------------
+def load_app():
+    # app.py needs a database at import; an empty one with the real schema
+    tmp = tempfile.TemporaryDirectory()
+    database.DB_PATH = os.path.join(tmp.name, "hot_paths.db")
+    from init_db import init_db
+    init_db()
+    import app as app_module
+    app_module.DB_PATH = database.DB_PATH
+    return app_module, tmp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="run the cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per timed run")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help=f"allowed slowdown in percent (default: the file's, else {DEFAULT_THRESHOLD:g})")
+    parser.add_argument("--baselines", default=BASELINES)
+    parser.add_argument("--update", action="store_true", help="write the results as the new baselines")
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+    threshold = args.threshold if args.threshold is not None else baselines.get("threshold", DEFAULT_THRESHOLD)
+    recorded = baselines.get("cases", {})
+
+    app_module, tmp = load_app()
+    cases = build_cases(app_module)
+    if args.only:
+        cases = {name: case for name, case in cases.items() if args.only in name}
+
+    calibration = _runner(_calibration, [()], args.min_time)
+    for _ in range(args.repeat):  # warm-up
+        calibration()
+    print(f"calibration: {calibration() / 1000:.1f} us   threshold: {threshold:g}%\n")
+    print(f"{'case':<46} {'ns/call':>11} {'relative':>10} {'baseline':>10} {'change':>8}")
+
+    results, regressions = {}, []
+    for name, (fn, inputs) in cases.items():
+        ns, calibration_ns = measure(fn, inputs, args.repeat, args.min_time, calibration)
+        relative = ns / calibration_ns
+        results[name] = {"relative": round(relative, 6), "ns": round(ns, 1)}
+        base = recorded.get(name)
+        if base is None:
+            print(f"{name:<46} {ns:>11.0f} {relative:>10.4f} {'-':>10} {'new':>8}")
+            continue
+        change = (relative / base["relative"] - 1) * 100
+        limit = base.get("threshold", threshold)
+        flag = ""
+        if change > limit:
+            regressions.append(name)
+            flag = f"  REGRESSION (> {limit:g}%)"
+        print(f"{name:<46} {ns:>11.0f} {relative:>10.4f} {base['relative']:>10.4f} {change:>+7.1f}%{flag}")
+    tmp.cleanup()
+
+    if args.update:
+        # Keep per-case thresholds and cases that weren't run this time
+        for name, result in results.items():
+            if "threshold" in recorded.get(name, {}):
+                result["threshold"] = recorded[name]["threshold"]
+        baselines = {
+            "threshold": baselines.get("threshold", DEFAULT_THRESHOLD),
+            "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                        "calibration_ns": round(calibration())},
+            "cases": dict(sorted({**recorded, **results}.items())),
+        }
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=2)
+            f.write("\n")
+        print(f"\nwrote {len(results)} baselines to {args.baselines}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Nightly insights benchmark.
+
+Builds a throwaway database with the real schema (init_db), N users with
+90 days of daily_rollups each (every 10th user with sleep driving next-day
+stress), then times run_insights(): paging users, building the series
+array and correlating every pair / lag with NumPy.
+
+    cd backend
+    python benchmarks/bench_insights.py --users 20000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+
+STRESS = ["low", "medium", "high"]
+MOODS = ["happy", "neutral", "sad"]
+
+
+def seed(path, n_users, today, days):
+    from init_db import init_db
+    init_db()
+
+    rnd = random.Random(5)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO users (name, email, role) VALUES (?, ?, 'user')",
+        ((f"User {i}", f"user{i}@example.com") for i in range(n_users))
+    )
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE role = 'user'")]
+
+    def rows():
+        for uid in user_ids:
+            linked = uid % 10 == 0
+            prev_sleep = 7.0
+            for d in range(days, 0, -1):
+                day = (today - timedelta(days=d)).isoformat()
+                sleep = rnd.uniform(4, 9)
+                yield (uid, day, "sleep", "", 1, sleep)
+                yield (uid, day, "fitness", "", 1, rnd.randint(0, 60))
+                level = rnd.choice(["low", "moderate", "high"])
+                yield (uid, day, "hydration", level, 1, {"low": 1, "moderate": 2, "high": 3}[level])
+                if linked:
+                    stress = 2 if prev_sleep < 5.5 else (1 if prev_sleep < 7.5 else 0)
+                else:
+                    stress = rnd.randrange(3)
+                yield (uid, day, "stress", STRESS[stress], 1, 0)
+                yield (uid, day, "mood", rnd.choice(MOODS), 1, 0)
+                prev_sleep = sleep
+
+    conn.executemany("""
+        INSERT INTO daily_rollups (user_id, day, category, label, entries, value_sum)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows())
+    conn.execute("INSERT INTO job_checkpoints (name, value) VALUES ('daily_rollups_backfilled', 'bench')")
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "insights_bench.db")
+        from utils.insights import run_insights, user_insights
+
+        today = date(2026, 10, 19)
+        t0 = time.perf_counter()
+        seed(database.DB_PATH, args.users, today, args.days)
+        print(f"seeded {args.users} users x {args.days} days in {time.perf_counter() - t0:.1f}s")
+
+        result = run_insights(today=today, window_days=args.days, page_size=args.page_size)
+        print(f"insights computed : {result['users']} users in {result['elapsed_seconds']}s "
+              f"({result['users'] / max(result['elapsed_seconds'], 1e-9):.0f} users/s)")
+        print(f"users w/ insights : {result['with_insights']} "
+              f"(~{args.users // 10} have a planted sleep -> stress link)")
+
+        t0 = time.perf_counter()
+        for uid in range(1, 1001):
+            user_insights(uid)
+        print(f"request-time read : {(time.perf_counter() - t0):.3f} ms per user (cached row)")
+        print("example           :", user_insights(10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Sign-in storm benchmark.
+
+Seeds users whose passwords still use an old hash, then has --threads
+threads log in concurrently through the Flask test client (one threaded
+worker) while one more thread keeps requesting a cheap page (/auth). It
+reports login and /auth latency percentiles and how many hashes were
+upgraded, once with hashing on the request threads (PASSWORD_POOL_SIZE=0)
+and once through the process pool. Before the storm it checks that a
+password longer than bcrypt's 72 bytes still registers, signs in and
+gets its old hash upgraded. The pool can only pay off with spare
+cores: run it on the kind of machine the workers run on.
+
+    cd backend
+    python benchmarks/bench_login.py --users 40 --threads 8 --logins 5
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import json, sys, threading, time
+sys.path.insert(0, ".")
+from utils.checkpoints import set_checkpoint
+set_checkpoint("metric_stats_backfilled", "bench")
+from werkzeug.security import generate_password_hash
+from database import get_db_connection
+
+users, threads, logins = %d, %d, %d
+old = generate_password_hash("bench-pass", method="pbkdf2:sha256:%d")
+conn = get_db_connection()
+conn.executemany(
+    "INSERT OR IGNORE INTO users (name, age, gender, mobile, email, password, role) VALUES (?,?,?,?,?,?, 'user')",
+    [(f"Bench {i}", 30, "male", "9000000000", f"bench{i}@example.com", old) for i in range(users)],
+)
+LONG = "long-pass-" * 8  # 80 bytes
+conn.execute(
+    "INSERT OR IGNORE INTO users (name, age, gender, mobile, email, password, role) VALUES (?,?,?,?,?,?, 'user')",
+    ("Bench long", 30, "male", "9000000000", "benchlong@example.com",
+     generate_password_hash(LONG, method="pbkdf2:sha256:%d")),
+)
+conn.commit()
+conn.close()
+
+import app
+from utils.passwords import shutdown_pool
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+login_ms, page_ms, failures = [], [], []
+stop = threading.Event()
+
+def storm(index):
+    client = app.app.test_client()
+    for n in range(logins):
+        email = f"bench{(index * logins + n) %% users}@example.com"
+        started = time.perf_counter()
+        response = client.post("/login", json={"email": email, "password": "bench-pass"})
+        login_ms.append((time.perf_counter() - started) * 1000)
+        if not response.get_json().get("success"):
+            failures.append(response.status_code)
+
+def bystander():
+    client = app.app.test_client()
+    while not stop.is_set():
+        started = time.perf_counter()
+        client.get("/auth")
+        page_ms.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.005)
+
+# Warm the pool / imports outside the measurement
+app.app.test_client().post("/login", json={"email": "nobody@example.com", "password": "x"})
+
+# > 72 bytes: upgrade on the first login, then the new hash; register + login
+client = app.app.test_client()
+
+def succeeds(path, **body):
+    response = client.post(path, json=body)
+    return response.status_code == 200 and bool((response.get_json(silent=True) or {}).get("success"))
+
+long_ok = [
+    succeeds("/login", email="benchlong@example.com", password=LONG),
+    succeeds("/login", email="benchlong@example.com", password=LONG),
+    succeeds("/register", name="Long", email="benchlong2@example.com", mobile="9000000000",
+             password=LONG, gender="male", age=30),
+    succeeds("/login", email="benchlong2@example.com", password=LONG),
+    not succeeds("/login", email="benchlong2@example.com", password=LONG[:-1]),
+]
+
+side = threading.Thread(target=bystander)
+side.start()
+started = time.perf_counter()
+workers = [threading.Thread(target=storm, args=(i,)) for i in range(threads)]
+for w in workers:
+    w.start()
+for w in workers:
+    w.join()
+elapsed = time.perf_counter() - started
+stop.set()
+side.join()
+
+conn = get_db_connection()
+upgraded = conn.execute(
+    "SELECT COUNT(*) FROM users WHERE email LIKE 'bench%%' AND email NOT LIKE 'benchlong%%' "
+    "AND password NOT LIKE 'pbkdf2:%%'"
+).fetchone()[0]
+conn.close()
+shutdown_pool()
+print("RESULT " + json.dumps({
+    "logins": len(login_ms), "failures": len(failures), "elapsed": elapsed,
+    "login_p50": percentile(login_ms, 50), "login_p99": percentile(login_ms, 99),
+    "page_p50": percentile(page_ms, 50), "page_p99": percentile(page_ms, 99),
+    "upgraded": upgraded, "long_password": all(long_ok),
+}), flush=True)
+"""
+
+
+def run(backend, pool_size, args):
+    workdir = tempfile.mkdtemp(prefix="bench_login_")
+    try:
+        copy = os.path.join(workdir, "backend")
+        shutil.copytree(backend, copy, ignore=shutil.ignore_patterns("__pycache__", "benchmarks"))
+        for folder in ("templates", "static"):
+            source = os.path.join(os.path.dirname(backend), folder)
+            if os.path.isdir(source):
+                os.symlink(source, os.path.join(workdir, folder))
+        env = dict(
+            os.environ, SMART_HEALTH_PLUS_SECRET_KEY="bench", NOTIFY_BACKEND="fake", RUN_SCHEDULER="0",
+            RATE_LIMITS_ENABLED="0", SHED_QUEUE="1000", SHED_WAIT_SECONDS="60",
+            PASSWORD_POOL_SIZE=str(pool_size), PASSWORD_HASH_ALGORITHM=args.algorithm,
+        )
+        if args.cost:
+            env["PASSWORD_HASH_COST"] = str(args.cost)
+        subprocess.run([sys.executable, "init_db.py"], cwd=copy, env=env, check=True, stdout=subprocess.DEVNULL)
+        code = CHILD % (args.users, args.threads, args.logins, args.old_iterations, args.old_iterations)
+        out = subprocess.run([sys.executable, "-c", code], cwd=copy, env=env,
+                             check=True, capture_output=True, text=True).stdout
+        line = next(line for line in out.splitlines() if "RESULT {" in line)
+        return json.loads(line[line.index("RESULT {") + len("RESULT "):])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=5, help="logins per thread")
+    parser.add_argument("--algorithm", default="bcrypt")
+    parser.add_argument("--cost", type=int, default=None)
+    parser.add_argument("--old-iterations", type=int, default=260000, help="PBKDF2 iterations of the seeded hashes")
+    parser.add_argument("--pool-sizes", default="0,2", help="comma-separated PASSWORD_POOL_SIZE values")
+    parser.add_argument("--backend", default=os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+    args = parser.parse_args()
+
+    print(f"{'pool':>5} {'logins':>7} {'fail':>5} {'login/s':>8} {'login p50':>10} {'login p99':>10} "
+          f"{'/auth p50':>10} {'/auth p99':>10} {'upgraded':>9}")
+    for pool_size in (int(size) for size in args.pool_sizes.split(",")):
+        r = run(os.path.abspath(args.backend), pool_size, args)
+        if not r["long_password"]:
+            raise SystemExit(f"❌ a password over 72 bytes failed to register or sign in (pool {pool_size})")
+        print(f"{pool_size:>5} {r['logins']:>7} {r['failures']:>5} {r['logins'] / r['elapsed']:>8.1f} "
+              f"{r['login_p50']:>8.0f}ms {r['login_p99']:>8.0f}ms {r['page_p50']:>8.1f}ms {r['page_p99']:>8.1f}ms "
+              f"{r['upgraded']:>9}")
+
+
+if __name__ == "__main__":
+    main()
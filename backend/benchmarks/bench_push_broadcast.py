@@ -0,0 +1,85 @@
+"""
+Offline push broadcast benchmark.
+
+Fills a throwaway SQLite file with user_devices rows and broadcasts through
+the fake push provider (with a simulated round trip), comparing one call
+per device against the chunked, concurrent pipeline.
+
+    cd backend
+    python benchmarks/bench_push_broadcast.py --devices 100000 --latency 0.3
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.providers import FakePushProvider  # noqa: E402
+from utils.push_pipeline import broadcast_push  # noqa: E402
+
+
+def build_db(path, n_devices, invalid_every):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE user_devices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            device_id TEXT NOT NULL,
+            platform TEXT DEFAULT 'web',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, device_id)
+        )
+    """)
+    conn.execute("CREATE INDEX idx_user_devices_device ON user_devices (device_id)")
+    conn.executemany(
+        "INSERT INTO user_devices (user_id, device_id) VALUES (?, ?)",
+        ((i // 2, f"device-{i}") for i in range(n_devices))
+    )
+    conn.commit()
+    conn.close()
+    return {f"device-{i}" for i in range(0, n_devices, invalid_every)} if invalid_every else set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=100000)
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated provider round trip (s)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--invalid-every", type=int, default=50, help="mark every Nth device invalid")
+    parser.add_argument("--serial-sample", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "push_bench.db")
+        invalid = build_db(path, args.devices, args.invalid_every)
+
+        def connect():
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+            return conn
+
+        # ---------- old style: one request per device (sampled) ----------
+        provider = FakePushProvider(latency=args.latency)
+        t0 = time.perf_counter()
+        for i in range(args.serial_sample):
+            provider.send([f"device-{i}"], "Reminder", "Time to log your vitals")
+        per_call = (time.perf_counter() - t0) / args.serial_sample
+        print(f"one call per device : ~{per_call * args.devices:.0f}s for {args.devices} devices "
+              f"(measured on {args.serial_sample})")
+
+        # ---------- chunked concurrent pipeline ----------
+        provider = FakePushProvider(latency=args.latency, invalid_ids=invalid)
+        stats = broadcast_push("Reminder", "Time to log your vitals", provider=provider,
+                               workers=args.workers, limit=None, connect=connect)
+        print(f"chunked pipeline    : {stats['elapsed_seconds']:.2f}s for {stats['devices']} devices "
+              f"({stats['chunks']} requests, {provider.calls} provider calls)")
+
+        remaining = connect().execute("SELECT COUNT(*) FROM user_devices").fetchone()[0]
+        print(f"pruned              : {stats['pruned']} invalid devices ({remaining} left)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Reminder dispatch benchmark.
+
+Seeds a throwaway SQLite DB with N reminders spread over the day and a
+few timezones, then times the minute tick's due-reminder lookup and batch
+dispatch (with no-op senders) for random minutes. Reports how many
+messages the coalesced dispatch actually sends per minute.
+
+    cd backend
+    python benchmarks/bench_reminder_dispatch.py --sizes 100000,1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import utils.dispatch as dispatch  # noqa: E402
+import utils.reminder_jobs as reminder_jobs  # noqa: E402
+
+TIMEZONES = ["Asia/Kolkata", "Europe/London", "America/New_York",
+             "Asia/Dubai", "Australia/Sydney", "UTC"]
+
+
+def seed(path, n_reminders, seed_value=42):
+    rnd = random.Random(seed_value)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            reminder_type TEXT,
+            reminder_time TEXT,
+            reminder_email TEXT,
+            reminder_phone TEXT,
+            timezone TEXT DEFAULT 'Asia/Kolkata'
+        );
+    """)
+    n_users = max(1, n_reminders // 3)
+    conn.executemany("INSERT INTO users (id, name) VALUES (?, ?)",
+                     ((i, f"User {i}") for i in range(1, n_users + 1)))
+
+    def rows():
+        for _ in range(n_reminders):
+            uid = rnd.randint(1, n_users)
+            minute = rnd.randrange(1440)
+            yield (uid, rnd.choice(["water", "medicine", "exercise"]),
+                   f"{minute // 60:02d}:{minute % 60:02d}",
+                   f"user{uid}@example.com", None,
+                   TIMEZONES[uid % len(TIMEZONES)])
+
+    conn.executemany("""
+        INSERT INTO reminders (user_id, reminder_type, reminder_time,
+                               reminder_email, reminder_phone, timezone)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows())
+    conn.execute("CREATE INDEX idx_reminders_due ON reminders (timezone, reminder_time)")
+    conn.commit()
+    conn.close()
+
+
+def run(n_reminders, samples):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        t0 = time.perf_counter()
+        seed(path, n_reminders)
+        seed_s = time.perf_counter() - t0
+
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+
+        t0 = time.perf_counter()
+        timezones = reminder_jobs.reminder_timezones(cursor)
+        tz_ms = (time.perf_counter() - t0) * 1000
+
+        query_ms, dispatch_ms, due_counts, message_counts = [], [], [], []
+        base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        rnd = random.Random(7)
+        for _ in range(samples):
+            minute = base + timedelta(minutes=rnd.randrange(1440))
+
+            t0 = time.perf_counter()
+            rows = reminder_jobs.fetch_due_reminders(cursor, minute, timezones)
+            t1 = time.perf_counter()
+            sent = reminder_jobs.dispatch_reminders(rows)
+            t2 = time.perf_counter()
+
+            query_ms.append((t1 - t0) * 1000)
+            dispatch_ms.append((t2 - t0) * 1000)
+            due_counts.append(len(rows))
+            message_counts.append(sent)
+
+        conn.close()
+    finally:
+        os.remove(path)
+
+    def pct(values, p):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * p))]
+
+    print(f"\n{n_reminders:,} reminders  (seeded in {seed_s:.1f}s, timezone scan {tz_ms:.1f} ms)")
+    print(f"  due per minute     avg {statistics.mean(due_counts):.0f}   "
+          f"coalesced to {statistics.mean(message_counts):.0f} messages")
+    print(f"  lookup             p50 {pct(query_ms, .5):.2f} ms   p95 {pct(query_ms, .95):.2f} ms")
+    print(f"  lookup + dispatch  p50 {pct(dispatch_ms, .5):.2f} ms   p95 {pct(dispatch_ms, .95):.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,1000000")
+    parser.add_argument("--samples", type=int, default=60)
+    args = parser.parse_args()
+
+    # Measure the dispatcher itself, not SMTP / Twilio round trips or
+    # the provider rate limits.
+    reminder_jobs.send_email = lambda *a, **k: True
+    reminder_jobs.send_sms = lambda *a, **k: True
+    dispatch.PROVIDER_LIMITS.clear()
+
+    for size in args.sizes.split(","):
+        run(int(size), args.samples)
+
+
+if __name__ == "__main__":
+    main()
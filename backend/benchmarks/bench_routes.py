@@ -0,0 +1,213 @@
+"""
+Route load harness.
+
+Generates a database with benchmarks/datagen.py (or reuses one given with
+--db), then drives the key routes through the Flask test client from
+--concurrency threads, route by route, as logged-in users picked at
+random (or as admin for the admin pages). Per route it reports
+throughput, p50/p95/p99 latency, errors, SQL statements per request and
+peak memory.
+
+    cd backend
+    python benchmarks/bench_routes.py --users 500 --days 120 --requests 200 --concurrency 8
+    python benchmarks/bench_routes.py --db /tmp/shp_bench.db --routes profile,goal
+
+Notes: rate limiting and load shedding are switched off, the scheduler
+isn't started and notifications use the fake backend. "peak MB" is the
+tracemalloc peak of Python allocations during that route's run (with
+--tracemalloc, which slows everything down); "RSS MB" is the process
+peak so far.
+"""
+import argparse
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.update({
+    "SMART_HEALTH_PLUS_SECRET_KEY": os.environ.get("SMART_HEALTH_PLUS_SECRET_KEY", "bench"),
+    "NOTIFY_BACKEND": "fake",
+    "RUN_SCHEDULER": "0",
+    "RATE_LIMITS_ENABLED": "0",
+    "SHED_SLOTS": "1000",
+    "SHED_QUEUE": "1000",
+    "SHED_WAIT_SECONDS": "600",
+    "METRICS_DIR": "",
+})
+
+import database  # noqa: E402
+from datagen import CATEGORIES, entry_value, generate  # noqa: E402
+
+
+# ---------------- Query Counting ----------------
+# Every sqlite3 connection the app opens gets a trace callback that
+# counts statements for the thread running the request.
+_counts = threading.local()
+_connect = sqlite3.connect
+
+
+def _counting_connect(*args, **kwargs):
+    conn = _connect(*args, **kwargs)
+    conn.set_trace_callback(_count_statement)
+    return conn
+
+
+STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+
+def _count_statement(sql):
+    # BEGIN/COMMIT and PRAGMAs aren't queries
+    if sql.lstrip().upper().startswith(STATEMENTS):
+        _counts.n = getattr(_counts, "n", 0) + 1
+
+
+# ---------------- Routes ----------------
+def _save_health_data(rnd):
+    category = rnd.choice(CATEGORIES)
+    return "POST", "/save-health-data", {"json": {"category": category, "value": entry_value(rnd, category)}}
+
+
+def _report(rnd):
+    end = date.today()
+    start = end - timedelta(days=rnd.choice([7, 30, 90]))
+    return "GET", f"/download-health-report?start_date={start}&end_date={end}", {}
+
+
+def _get(path):
+    return lambda rnd: ("GET", path, {})
+
+
+# name -> (request builder, as admin)
+ROUTES = {
+    "save-health-data": (_save_health_data, False),
+    "profile": (_get("/profile"), False),
+    "goal": (_get("/goal"), False),
+    "recommendation": (_get("/recommendation"), False),
+    "generate-recommendation": (_get("/generate-recommendation"), False),
+    "download-health-report": (_report, False),
+    "admin-dashboard": (_get("/admin/dashboard"), True),
+    "admin-users": (_get("/admin/users"), True),
+    "admin-feedback": (_get("/admin/feedback"), True),
+    "admin-feedback-pdf": (_get("/admin/feedback/export_pdf"), True),
+}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+def run_route(app, name, users, admin, total, concurrency, seed):
+    build, as_admin = ROUTES[name]
+    latencies, queries, errors = [], [], []
+    lock = threading.Lock()
+    next_request = iter(range(total))
+
+    def worker(index):
+        rnd = random.Random(seed * 1000 + index)
+        client = app.test_client()
+        while True:
+            with lock:
+                if next(next_request, None) is None:
+                    return
+            user = admin if as_admin else rnd.choice(users)
+            with client.session_transaction() as session:
+                session.clear()
+                session.update(user_id=user["id"], role=user["role"], name=user["name"],
+                               user_name=user["name"], gender=(user["gender"] or "male").lower())
+            method, path, kwargs = build(rnd)
+            _counts.n = 0
+            started = time.perf_counter()
+            response = client.open(path, method=method, **kwargs)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed * 1000)
+                queries.append(_counts.n)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    return {
+        "requests": len(latencies), "errors": len(errors), "rps": len(latencies) / wall,
+        "p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "p99": percentile(latencies, 99),
+        "queries": sum(queries) / max(len(queries), 1),
+        "statuses": sorted(set(errors)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="use this database (generated first if it doesn't exist)")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma-separated, from: " + ", ".join(ROUTES))
+    parser.add_argument("--tracemalloc", action="store_true", help="measure peak Python allocations per route")
+    args = parser.parse_args()
+    routes = [name.strip() for name in args.routes.split(",") if name.strip()]
+    unknown = [name for name in routes if name not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+
+    tmp = None
+    db_path = args.db
+    if db_path is None:
+        tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp.name, "routes_bench.db")
+    if not os.path.exists(db_path):
+        t0 = time.perf_counter()
+        generate(db_path, args.users, args.days, args.seed)
+        print(f"generated in {time.perf_counter() - t0:.1f}s")
+
+    # app.py keeps its own DB_PATH next to database.py's
+    database.DB_PATH = db_path
+    sqlite3.connect = _counting_connect
+    import app as app_module
+    app_module.DB_PATH = db_path
+    app = app_module.app
+
+    conn = _connect(db_path)
+    conn.row_factory = sqlite3.Row
+    users = [dict(row) for row in conn.execute("SELECT id, name, gender, role FROM users WHERE role = 'user'")]
+    admin = dict(conn.execute("SELECT id, name, gender, role FROM users WHERE role = 'admin' LIMIT 1").fetchone())
+    health_rows = conn.execute("SELECT COUNT(*) FROM health_data").fetchone()[0]
+    conn.close()
+    print(f"database: {db_path} ({len(users)} users, {health_rows} health_data rows)")
+    print(f"{args.requests} requests per route, {args.concurrency} threads\n")
+
+    print(f"{'route':<26} {'reqs':>5} {'err':>4} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'queries':>8} {'peak MB':>8} {'RSS MB':>7}")
+    for name in routes:
+        if args.tracemalloc:
+            tracemalloc.start()
+        r = run_route(app, name, users, admin, args.requests, args.concurrency, args.seed)
+        peak = ""
+        if args.tracemalloc:
+            peak = f"{tracemalloc.get_traced_memory()[1] / 1e6:.1f}"
+            tracemalloc.stop()
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{name:<26} {r['requests']:>5} {r['errors']:>4} {r['rps']:>7.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} "
+              f"{r['p99']:>8.1f} {r['queries']:>8.1f} {peak:>8} {rss:>7.0f}"
+              + (f"  (HTTP {', '.join(map(str, r['statuses']))})" if r["statuses"] else ""))
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,549 @@
+"""
+SQL scaling curves.
+
+Extracts every SQL statement that app.py, utils/ and routes/ pass to
+execute() / executemany(), seeds databases of growing size with
+benchmarks/datagen.py (more users with the same months of history, as a
+real deploy grows), and times each statement and reads its query plan at
+every size. The report fits latency against health_data rows on a log-log
+scale and flags statements that grow super-linearly, so index and schema
+work can start from the top of the list.
+
+    cd backend
+    python benchmarks/bench_sql_scaling.py                          # 10k,100k,1M,10M rows
+    python benchmarks/bench_sql_scaling.py --sizes 10k,100k,300k --workdir /tmp/shp_scaling
+    python benchmarks/bench_sql_scaling.py --list                   # just the extracted statements
+
+Generating 10M rows takes a while (about 10 minutes per 10M on one core);
+--workdir keeps the databases, and a database already there for a size
+is reused. Statements are found statically: string constants, f-strings
+over module constants, and locals built up with = / += or returned by a
+query builder; IN (...) lists built from a page of ids get IN_LIST
+placeholders. Parameters are bound from the column each ? is compared
+with (a real user id, a category, the last 30 days...). Writes run in a
+transaction that is rolled back. A statement that can't be resolved or
+fails is listed with the reason rather than dropped.
+"""
+import argparse
+import ast
+import builtins
+import glob
+import importlib
+import json
+import math
+import os
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND)
+os.environ.update({
+    "SMART_HEALTH_PLUS_SECRET_KEY": os.environ.get("SMART_HEALTH_PLUS_SECRET_KEY", "bench"),
+    "NOTIFY_BACKEND": "fake",
+    "RUN_SCHEDULER": "0",
+    "PASSWORD_POOL_SIZE": "0",
+    "METRICS_DIR": "",
+})
+
+import database  # noqa: E402
+from datagen import CATEGORIES, generate  # noqa: E402
+
+SOURCES = ["app.py", "utils/*.py", "routes/*.py"]
+SKIP_KINDS = {"CREATE", "DROP", "ALTER", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "VACUUM", "ANALYZE"}
+WRITE_KINDS = {"INSERT", "UPDATE", "DELETE", "REPLACE"}
+IN_LIST = 50
+ROWS_PER_USER_DAY = 3.4  # what datagen averages over its personas
+
+# Latencies under this are timer noise: clamped before fitting
+FLOOR_MS = 0.02
+SUPER_LINEAR = 1.15
+LINEAR = 0.75
+SUB_LINEAR = 0.25
+
+
+# ---------------- Extraction ----------------
+class Statement:
+    def __init__(self, sql, locations):
+        self.sql = sql
+        self.locations = locations
+        self.kind = sql.split(None, 1)[0].upper()
+
+
+def _compact(sql):
+    return " ".join(sql.split())
+
+
+class _Scope(dict):
+    """eval() locals: the enclosing function's assignments, then module globals, else a page of ids."""
+
+    def __init__(self, resolver, func, line):
+        super().__init__()
+        self._resolver = resolver
+        self._func = func
+        self._line = line
+
+    def __missing__(self, name):
+        value = self._resolver.resolve_name(self._func, name, self._line)
+        self[name] = value
+        return value
+
+
+SAFE_BUILTINS = {"len", "str", "int", "list", "tuple", "range", "sorted", "min", "max"}
+STR_METHODS = {"join", "format", "replace", "strip", "lower", "upper"}
+DB_CALLS = re.compile(r"\b(execute|executemany|cursor|connect|get_db_connection|commit)\b")
+
+
+class _Resolver:
+    def __init__(self, path, tree):
+        self.path = path
+        self.tree = tree
+        self._globals = None
+        self._resolving = set()
+        with open(path) as f:
+            source = f.read()
+        # Module-level functions that only build SQL text (no database access) may be called
+        self._builders = {
+            node.name for node in tree.body
+            if isinstance(node, ast.FunctionDef) and not DB_CALLS.search(ast.get_source_segment(source, node))
+        }
+
+    def _check_pure(self, node):
+        """Evaluating a call could touch the database (or anything else): only string building is allowed."""
+        for sub in ast.walk(node):
+            if not isinstance(sub, ast.Call):
+                continue
+            func = sub.func
+            if isinstance(func, ast.Name) and (func.id in SAFE_BUILTINS or func.id in self._builders):
+                continue
+            if isinstance(func, ast.Attribute) and func.attr in STR_METHODS:
+                continue
+            raise ValueError(f"calls {ast.unparse(func)}()")
+
+    def module_globals(self):
+        if self._globals is None:
+            name = os.path.relpath(self.path, BACKEND)[:-3].replace(os.sep, ".")
+            try:
+                self._globals = dict(vars(importlib.import_module(name)))
+            except Exception as e:  # noqa: BLE001 - the statement is reported as unresolved
+                print(f"⚠️ {name} not importable ({e}); only literal SQL extracted from it")
+                self._globals = {}
+        return self._globals
+
+    def evaluate(self, node, func, line):
+        if isinstance(node, ast.Constant):
+            return node.value
+        self._check_pure(node)
+        expr = ast.Expression(body=node)
+        ast.fix_missing_locations(expr)
+        return eval(compile(expr, self.path, "eval"), self.module_globals(), _Scope(self, func, line))
+
+    def resolve_name(self, func, name, line):
+        key = (id(func), name)
+        if key in self._resolving:
+            raise NameError(name)
+        self._resolving.add(key)
+        try:
+            value, found = None, False
+            for node in sorted(ast.walk(func), key=lambda n: getattr(n, "lineno", 0)) if func else ():
+                if getattr(node, "lineno", line) >= line:
+                    continue
+                try:
+                    if isinstance(node, ast.Assign):
+                        for target in node.targets:
+                            if isinstance(target, ast.Name) and target.id == name:
+                                value, found = self.evaluate(node.value, func, node.lineno), True
+                            elif isinstance(target, ast.Tuple):
+                                for i, item in enumerate(target.elts):
+                                    if isinstance(item, ast.Name) and item.id == name:
+                                        value, found = self.evaluate(node.value, func, node.lineno)[i], True
+                    elif (isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name)
+                          and node.target.id == name and isinstance(node.op, ast.Add) and found):
+                        # Optional pieces (", password=?") are all taken: the widest variant
+                        value = value + self.evaluate(node.value, func, node.lineno)
+                except Exception:  # noqa: BLE001 - built at runtime, see the fallbacks below
+                    continue
+            if found:
+                return value
+        finally:
+            self._resolving.discard(key)
+        if name in self.module_globals() or hasattr(builtins, name):
+            raise KeyError(name)  # eval goes on to the globals / builtins
+        # Whatever else it is, it's most likely the page of ids an IN list is built from
+        return list(range(1, IN_LIST + 1))
+
+
+def _functions(tree):
+    return [n for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+
+
+def _enclosing(functions, line):
+    inside = [f for f in functions if f.lineno <= line <= f.end_lineno]
+    return max(inside, key=lambda f: f.lineno) if inside else None
+
+
+def extract(backend=BACKEND):
+    """(statements deduplicated by text, [(location, reason)] for calls that couldn't be resolved)."""
+    found, unresolved = {}, []
+    paths = [p for pattern in SOURCES for p in sorted(glob.glob(os.path.join(backend, pattern)))]
+    for path in paths:
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        resolver = _Resolver(path, tree)
+        functions = _functions(tree)
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr in ("execute", "executemany") and node.args):
+                continue
+            location = f"{os.path.relpath(path, backend)}:{node.lineno}"
+            try:
+                sql = resolver.evaluate(node.args[0], _enclosing(functions, node.lineno), node.lineno)
+            except Exception as e:  # noqa: BLE001
+                unresolved.append((location, f"{type(e).__name__}: {e}"))
+                continue
+            if not isinstance(sql, str) or not sql.strip():
+                unresolved.append((location, f"not a SQL string ({type(sql).__name__})"))
+                continue
+            text = _compact(sql)
+            if text.split(None, 1)[0].upper() in SKIP_KINDS:
+                continue
+            found.setdefault(text, []).append(location)
+    return [Statement(sql, locations) for sql, locations in found.items()], unresolved
+
+
+# ---------------- Parameters ----------------
+_INSERT = re.compile(r"^\s*(?:insert|replace)(?:\s+or\s+\w+)?\s+into\s+\w+\s*\(([^)]*)\)\s*values\s*\(", re.I)
+_CONTEXT = [
+    (re.compile(r"(\w+)\s+in\s*\((?:\s*\?\s*,)*\s*$", re.I), "in"),
+    (re.compile(r"(\w+)\s+between\s+\?\s+and\s+$", re.I), "end"),
+    (re.compile(r"(\w+)\s+between\s+$", re.I), "start"),
+    (re.compile(r"(\w+)\s*(<=|<)\s*$", re.I), "end"),
+    (re.compile(r"(\w+)\s*(>=|>)\s*$", re.I), "after"),
+    (re.compile(r"(\w+)\s*(?:=|==|!=|<>|\blike\b|\bis\b)\s*$", re.I), "eq"),
+    (re.compile(r"\b(limit|offset)\s+$", re.I), "eq"),
+    (re.compile(r"\b(julianday|date|datetime)\s*\(\s*$", re.I), "start"),
+]
+
+
+def _split_values(text):
+    """Top-level comma-separated items of a VALUES (...) list."""
+    items, depth, current = [], 0, ""
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            if depth == 0:
+                items.append(current)
+                return items
+            depth -= 1
+        if ch == "," and depth == 0:
+            items.append(current)
+            current = ""
+        else:
+            current += ch
+    items.append(current)
+    return items
+
+
+def placeholder_hints(sql):
+    """(column, how) for each ? in `sql`, from the INSERT column list or what the ? is compared with."""
+    positions = [m.start() for m in re.finditer(r"\?", sql)]
+    hints = [None] * len(positions)
+    insert = _INSERT.match(sql)
+    if insert:
+        columns = [c.strip().lower() for c in insert.group(1).split(",")]
+        values = _split_values(sql[insert.end():])
+        index = 0
+        for column, value in zip(columns, values):
+            for _ in range(value.count("?")):
+                if index < len(hints):
+                    hints[index] = (column, "eq")
+                index += 1
+    for i, pos in enumerate(positions):
+        if hints[i] is not None:
+            continue
+        before = sql[max(0, pos - 120):pos]
+        for pattern, how in _CONTEXT:
+            m = pattern.search(before)
+            if m:
+                hints[i] = (m.group(1).lower(), how)
+                break
+        else:
+            hints[i] = (None, "eq")
+    return hints
+
+
+class Binder:
+    """Parameter values that look like the app's, for one database."""
+
+    def __init__(self, conn, seed):
+        self.rnd = random.Random(seed)
+        low, high = conn.execute("SELECT MIN(id), MAX(id) FROM users WHERE role = 'user'").fetchone()
+        self.users = (low or 1, high or 1)
+        self.today = date.today()
+        try:
+            from utils.metric_stats import METRIC_SPEC
+            self.metrics = list(METRIC_SPEC)
+        except ImportError:
+            self.metrics = ["sleep_hours"]
+
+    def user_id(self):
+        return self.rnd.randint(*self.users)
+
+    def value(self, column, how):
+        c = column or ""
+        if c == "limit":
+            return IN_LIST
+        if c == "offset":
+            return 0
+        if c in ("id", "user_id") and how == "after":
+            return 0  # keyset paging from the first page
+        if c in ("user_id", "id"):
+            return self.user_id()
+        if c in ("day", "date", "julianday", "datetime") or "date" in c or c.endswith(("_at", "_day", "_time")):
+            if how == "end":
+                return (self.today + timedelta(days=1)).isoformat()
+            return (self.today - timedelta(days=30)).isoformat()
+        if c == "category":
+            return self.rnd.choice(CATEGORIES)
+        if c == "label":
+            return self.rnd.choice(["low", "medium", "high", "happy", "sad"])
+        if c == "metric":
+            return self.rnd.choice(self.metrics)
+        if c == "email":
+            return f"bench{self.user_id()}@example.com"
+        if c == "role":
+            return "user"
+        if c == "gender":
+            return self.rnd.choice(["Male", "Female"])
+        if c in ("is_active", "age", "cycle_length", "period_duration", "tokens", "entries", "value_sum",
+                 "n", "count", "attempts", "status_code"):
+            return 1
+        return "x"
+
+    def bind(self, hints):
+        return [self.value(column, how) for column, how in hints]
+
+
+# ---------------- Measuring ----------------
+class Timeout(Exception):
+    pass
+
+
+def run_statement(conn, statement, hints, binder, runs, max_seconds):
+    """(median ms, plan, error). Writes are rolled back."""
+    write = statement.kind in WRITE_KINDS
+    try:
+        plan = " / ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + statement.sql, binder.bind(hints)))
+    except sqlite3.Error as e:
+        return None, "", str(e)
+
+    samples = []
+    for i in range(runs + 1):  # the first run warms the page cache
+        params = binder.bind(hints)
+        deadline = time.perf_counter() + max_seconds
+        conn.set_progress_handler(lambda: time.perf_counter() > deadline, 10000)
+        if write:
+            conn.execute("BEGIN")
+        started = time.perf_counter()
+        try:
+            conn.execute(statement.sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            if "interrupted" in str(e):
+                return max_seconds * 1000, plan, f"timed out after {max_seconds:g}s"
+            return None, plan, str(e)
+        except sqlite3.Error as e:
+            return None, plan, str(e)
+        finally:
+            elapsed = time.perf_counter() - started
+            conn.set_progress_handler(None, 0)
+            if write:
+                conn.execute("ROLLBACK")
+        if i:
+            samples.append(elapsed * 1000)
+    return statistics.median(samples), plan, None
+
+
+def growth(rows, times):
+    """Slope of log(ms) against log(rows), least squares over the sizes measured."""
+    points = [(math.log(n), math.log(max(t, FLOOR_MS))) for n, t in zip(rows, times) if t is not None and n]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var
+
+
+def classify(slope):
+    if slope is None:
+        return "-"
+    if slope >= SUPER_LINEAR:
+        return "SUPER-LINEAR"
+    if slope >= LINEAR:
+        return "linear"
+    if slope >= SUB_LINEAR:
+        return "sub-linear"
+    return "flat"
+
+
+def full_scans(plan):
+    """Tables read start to end ("SCAN t", not "SCAN t USING ... INDEX")."""
+    return sorted({m.group(1) for m in re.finditer(r"\bSCAN (\w+)\b(?! USING)", plan)})
+
+
+# ---------------- Databases ----------------
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def database_for(workdir, label, size, days, seed):
+    path = os.path.join(workdir, f"sql_scaling_{label}_d{days}_s{seed}.db")
+    if not os.path.exists(path):
+        users = max(1, round(size / (days * ROWS_PER_USER_DAY)))
+        print(f"generating {label} ({users} users x {days} days)...", flush=True)
+        started = time.perf_counter()
+        generate(path, users, days, seed, quiet=True)
+        print(f"   done in {time.perf_counter() - started:.0f}s", flush=True)
+    return path
+
+
+# ---------------- Report ----------------
+def _ms(value):
+    if value is None:
+        return "err"
+    return f"{value:.3f}" if value < 1 else f"{value:.1f}"
+
+
+def per_user(hints):
+    """Reads one user's rows: its cost should stay flat however big the table gets."""
+    return ("user_id", "eq") in hints
+
+
+def report(statements, hints, unresolved, sizes, results):
+    labels = [label for label, _, _ in sizes]
+    rows = [n for _, _, n in sizes]
+    print("\nhealth_data rows: " + ", ".join(f"{label} = {n:,}" for label, _, n in sizes))
+    print(f"growth: slope of log(latency) on log(rows); >= {SUPER_LINEAR} super-linear, "
+          f">= {LINEAR} linear, >= {SUB_LINEAR} sub-linear, else flat\n")
+
+    ranked = []
+    for i, statement in enumerate(statements):
+        times = [results[label][i]["ms"] for label in labels]
+        slope = growth(rows, times)
+        ranked.append((slope if slope is not None else -1, times[-1] or 0, i, slope, times))
+    ranked.sort(reverse=True)
+
+    header = f"{'#':>3}  {'growth':<12} {'slope':>5}  " + " ".join(f"{label + ' ms':>10}" for label in labels)
+    print(header + "  statement")
+    for _, _, i, slope, times in ranked:
+        statement = statements[i]
+        scans = full_scans(results[labels[-1]][i]["plan"])
+        note = f"  [scan {', '.join(scans)}]" if scans else ""
+        if per_user(hints[i]) and slope is not None and slope >= LINEAR:
+            note += "  [per-user, grows with the table]"
+        print(f"{i + 1:>3}  {classify(slope):<12} {'' if slope is None else f'{slope:.2f}':>5}  "
+              + " ".join(f"{_ms(t):>10}" for t in times)
+              + f"  {statement.sql[:70]}  ({statement.locations[0]}){note}")
+
+    print("\nDetails (most growth first)")
+    for _, _, i, slope, _ in ranked:
+        statement = statements[i]
+        print(f"\n[{i + 1}] {classify(slope)}  {', '.join(statement.locations)}")
+        print(f"    {statement.sql[:400]}{' ...' if len(statement.sql) > 400 else ''}")
+        plans = [(label, results[label][i]["plan"]) for label in labels]
+        if len({plan for _, plan in plans}) == 1:
+            print(f"    plan: {plans[-1][1] or '-'}")
+        else:
+            print("    plan changes with size:")
+            for label, plan in plans:
+                print(f"      {label}: {plan or '-'}")
+        errors = {results[label][i]["error"] for label in labels} - {None}
+        for error in sorted(errors):
+            print(f"    ! {error}")
+
+    if unresolved:
+        print("\nNot extracted (SQL built at runtime):")
+        for location, reason in unresolved:
+            print(f"    {location}: {reason}")
+    return ranked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10k,100k,1M,10M", help="health_data rows per database")
+    parser.add_argument("--days", type=int, default=120, help="history per user")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per statement and size (median)")
+    parser.add_argument("--max-seconds", type=float, default=30, help="give up on one execution after this")
+    parser.add_argument("--workdir", help="keep (and reuse) the generated databases here")
+    parser.add_argument("--json", help="also write the full results here")
+    parser.add_argument("--list", action="store_true", help="print the extracted statements and exit")
+    args = parser.parse_args()
+
+    tmp = None
+    workdir = args.workdir
+    if workdir is None:
+        tmp = tempfile.TemporaryDirectory()
+        workdir = tmp.name
+    os.makedirs(workdir, exist_ok=True)
+
+    # Modules are imported to read their SQL constants; app.py wants a database for that
+    database.DB_PATH = os.path.join(workdir, "sql_scaling_extract.db")
+    from init_db import init_db
+    init_db()
+    statements, unresolved = extract()
+    hints = [placeholder_hints(statement.sql) for statement in statements]
+    print(f"{len(statements)} statements extracted, {len(unresolved)} not resolvable")
+    if args.list:
+        for i, statement in enumerate(statements):
+            print(f"\n[{i + 1}] {', '.join(statement.locations)}\n    {statement.sql}")
+            print("    params: " + ", ".join(f"{c or '?'}/{how}" for c, how in hints[i]))
+        for location, reason in unresolved:
+            print(f"\n[-] {location}: {reason}")
+        return
+
+    sizes, results = [], {}
+    for label in (s.strip() for s in args.sizes.split(",") if s.strip()):
+        path = database_for(workdir, label, parse_size(label), args.days, args.seed)
+        conn = sqlite3.connect(path, isolation_level=None)
+        rows = conn.execute("SELECT COUNT(*) FROM health_data").fetchone()[0]
+        sizes.append((label, path, rows))
+        binder = Binder(conn, args.seed)
+        print(f"timing {len(statements)} statements at {label} ({rows:,} rows)...", flush=True)
+        results[label] = []
+        for statement, statement_hints in zip(statements, hints):
+            ms, plan, error = run_statement(conn, statement, statement_hints, binder, args.runs, args.max_seconds)
+            results[label].append({"ms": ms, "plan": plan, "error": error})
+        conn.close()
+
+    ranked = report(statements, hints, unresolved, sizes, results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "sizes": {label: rows for label, _, rows in sizes},
+                "statements": [{
+                    "sql": statements[i].sql, "locations": statements[i].locations,
+                    "slope": slope, "growth": classify(slope),
+                    "by_size": {label: results[label][i] for label, _, _ in sizes},
+                } for _, _, i, slope, _ in ranked],
+                "unresolved": [{"location": loc, "reason": reason} for loc, reason in unresolved],
+            }, f, indent=2)
+        print(f"\nwrote {args.json}")
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Worker start-up benchmark.
+
+Starts fresh interpreters that import app.py the way a gunicorn worker
+does and reports, per run, the import time, the resident set size after
+the import and which heavy libraries got loaded. Each run uses a
+throwaway copy of the database so nothing touches the real one.
+
+    cd backend
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 5 --scheduler    # as a single-process deploy
+
+--backend points at another checkout's backend/ (e.g. a `git worktree` of
+an older commit) to get "before" numbers on the same machine.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY = ["reportlab", "fpdf", "twilio", "flask_dance", "flask_sqlalchemy", "sqlalchemy", "pytz",
+         "apscheduler", "numpy", "requests"]
+
+CHILD = r"""
+import json, resource, sys, time
+sys.path.insert(0, ".")
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+if getattr(app, "scheduler", None) is not None:
+    app.scheduler.shutdown(wait=False)
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+heavy = %r
+print("RESULT " + json.dumps({
+    "import_seconds": elapsed,
+    "rss_mb": rss_kb / 1024,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "loaded": [name for name in heavy if name in sys.modules],
+}), flush=True)
+"""
+
+
+def run_once(backend, scheduler):
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        # app.py and database.py find the DB next to themselves
+        copy = os.path.join(workdir, "backend")
+        shutil.copytree(backend, copy, ignore=shutil.ignore_patterns("__pycache__", "benchmarks"))
+        for folder in ("templates", "static"):
+            source = os.path.join(os.path.dirname(backend), folder)
+            if os.path.isdir(source):
+                os.symlink(source, os.path.join(workdir, folder))
+
+        env = dict(os.environ, SMART_HEALTH_PLUS_SECRET_KEY="bench", NOTIFY_BACKEND="fake",
+                   RUN_SCHEDULER="1" if scheduler else "0", PYTHONDONTWRITEBYTECODE="1")
+        subprocess.run([sys.executable, "init_db.py"], cwd=copy, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        # Compile once so every run measures a warm bytecode cache, like a restart
+        subprocess.run([sys.executable, "-m", "compileall", "-q", "."], cwd=copy, check=True)
+        env.pop("PYTHONDONTWRITEBYTECODE")
+        out = subprocess.run([sys.executable, "-c", CHILD % HEAVY], cwd=copy, env=env,
+                             check=True, capture_output=True, text=True).stdout
+        # Scheduler threads print too, possibly onto the same line
+        line = next(line for line in out.splitlines() if "RESULT {" in line)
+        return json.loads(line[line.index("RESULT {") + len("RESULT "):].split("}", 1)[0] + "}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", default=os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+    parser.add_argument("--scheduler", action="store_true", help="start the scheduler, as RUN_SCHEDULER=1")
+    args = parser.parse_args()
+
+    results = [run_once(os.path.abspath(args.backend), args.scheduler) for _ in range(args.runs)]
+    times = [r["import_seconds"] for r in results]
+    rss = [r["rss_mb"] for r in results]
+    print(f"backend:        {args.backend}")
+    print(f"scheduler:      {'on' if args.scheduler else 'off'}")
+    print(f"import time:    median {statistics.median(times):.3f}s (min {min(times):.3f}s, max {max(times):.3f}s)")
+    print(f"RSS after:      median {statistics.median(rss):.1f} MB")
+    print(f"modules:        {results[-1]['modules']}")
+    print(f"heavy loaded:   {', '.join(results[-1]['loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Synthetic data generator.
+
+Fills a database (the real schema, via init_db) with N users and months
+of history shaped like what the forms save: health_data for all six
+categories in the normalized JSON save_health_data() stores, with the
+rule-pack suggestion, period_tracking for women, reminders and feedback.
+Users differ (sleep habit, activity, how often they log, weekends), so
+the per-user tables aren't uniform. The derived tables (daily_rollups,
+user_metric_stats, user_bundles) are then built by the app's own
+backfills, as on a real deploy.
+
+The same --seed gives the same data.
+
+    cd backend
+    python benchmarks/datagen.py --db /tmp/shp_bench.db --users 500 --days 120
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+
+PASSWORD = "bench-pass"
+
+CATEGORIES = ["sleep", "hydration", "nutrition", "stress", "mood", "fitness"]
+SLEEP_REASONS = ["Stress", "Workload", "Exams", "Personal Issues", "Health Issues"]
+MOOD_REASONS = ["Work Stress", "Family Issues", "Health Problems", "Other"]
+STRESS_REASONS = ["Workload", "Exams", "Personal Problems", "Health", "Other"]
+HYDRATION_REASONS = ["Forgot", "Busy", "Weather"]
+NUTRITION_REASONS = ["Junk Food", "Skipped Meals", "Outside Food", "Lack of Time"]
+WORKOUTS = ["Cardio", "Strength Training", "Yoga", "Pilates", "Other"]
+SYMPTOMS = ["", "", "Cramps", "Back pain", "Headache", "Fatigue", "Mood swings", "Cramps, fatigue"]
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Ishaan", "Rohan", "Kabir", "Arjun", "Dev",
+               "Ananya", "Diya", "Isha", "Kavya", "Meera", "Priya", "Saanvi", "Tara"]
+LAST_NAMES = ["Sharma", "Verma", "Gupta", "Kushwaha", "Patel", "Singh", "Reddy", "Iyer", "Nair", "Das"]
+
+# Rough local time-of-day each form gets used
+ENTRY_HOURS = {"sleep": (6, 10), "hydration": (17, 22), "nutrition": (13, 22),
+               "stress": (18, 23), "mood": (8, 23), "fitness": (6, 21)}
+
+
+# ---------------- People ----------------
+def persona(rnd):
+    """Habits that stay with a user for the whole history."""
+    return {
+        "sleep": rnd.gauss(7.0, 0.9),          # usual hours
+        "active": rnd.random(),                # 0 couch .. 1 athlete
+        "stress": rnd.random(),                # baseline stress
+        "diet": rnd.random(),                  # 0 junk .. 1 careful
+        "adherence": rnd.uniform(0.25, 0.95),  # chance a form is filled on a day
+        "weekend_dip": rnd.uniform(0.3, 1.0),  # how much less on weekends
+        "double_log": rnd.uniform(0.0, 0.15),  # same form twice a day
+    }
+
+
+def _pick(rnd, weights):
+    return rnd.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def entry_value(rnd, category, who=None, slept=7.0):
+    """A value dict as save_health_data() stores it for `category`."""
+    who = who or persona(rnd)
+    if category == "sleep":
+        hours = round(max(3.0, min(11.0, rnd.gauss(who["sleep"], 1.0))) * 2) / 2
+        quality = "Good" if hours >= 7 else ("Average" if hours >= 6 else "Poor")
+        if rnd.random() < 0.15:
+            quality = rnd.choice(["Good", "Average", "Poor"])
+        return {"hours": hours, "quality": quality,
+                "reason": "Not specified" if quality == "Good" else rnd.choice(SLEEP_REASONS)}
+    if category == "hydration":
+        level = _pick(rnd, {"Low": 1.2 - who["diet"], "Moderate": 1.0, "High": 0.3 + who["diet"]})
+        return {"level": level, "reason": "Not specified" if level == "High" else rnd.choice(HYDRATION_REASONS)}
+    if category == "nutrition":
+        quality = _pick(rnd, {"Poor": 1.1 - who["diet"], "Average": 1.0, "Good": 0.2 + who["diet"]})
+        return {"quality": quality,
+                "reason": "Not specified" if quality == "Good" else rnd.choice(NUTRITION_REASONS)}
+    if category == "stress":
+        # Short nights push the next day's stress up
+        pressure = who["stress"] + (0.35 if slept < 6 else 0.0)
+        level = _pick(rnd, {"Low": 1.2 - pressure, "Medium": 1.0, "High": 0.2 + pressure})
+        return {"level": level, "reason": "Not specified" if level == "Low" else rnd.choice(STRESS_REASONS)}
+    if category == "mood":
+        mood = _pick(rnd, {"Happy": 1.3 - who["stress"], "Neutral": 1.0, "Sad": 0.2 + who["stress"] / 2,
+                           "Angry": 0.1 + who["stress"] / 3})
+        return {"mood": mood,
+                "reason": rnd.choice(MOOD_REASONS) if mood in ("Sad", "Angry") else "Not specified"}
+    if category == "fitness":
+        worked_out = rnd.random() < 0.2 + 0.7 * who["active"]
+        minutes = int(max(0, rnd.gauss(20 + 50 * who["active"], 15))) if worked_out else 0
+        steps = int(max(300, rnd.gauss(3000 + 9000 * who["active"], 2000)))
+        return {"minutes": minutes, "type": rnd.choice(WORKOUTS) if minutes else "Unspecified", "steps": steps}
+    raise ValueError(category)
+
+
+# ---------------- Generator ----------------
+def generate(db_path, users=500, days=120, seed=7, now=None, quiet=False):
+    """Create db_path (if needed) and fill it. Returns row counts."""
+    from init_db import init_db
+    from utils.rule_packs import current_pack
+    from werkzeug.security import generate_password_hash
+
+    database.DB_PATH = db_path
+    init_db()
+    rnd = random.Random(seed)
+    now = now or datetime.now().replace(microsecond=0)
+    pack = current_pack()
+    password = generate_password_hash(PASSWORD)
+    suggestions = {}
+
+    def suggestion(category, value):
+        key = (category, json.dumps(value, sort_keys=True))
+        if key not in suggestions:
+            suggestions[key] = pack.suggestion(category, value, False)
+        return suggestions[key]
+
+    conn = sqlite3.connect(db_path)
+    start_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+    people = []
+    for i in range(users):
+        gender = rnd.choices(["Male", "Female", "Other"], weights=[48, 48, 4])[0]
+        name = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+        joined = now - timedelta(days=days, hours=rnd.randint(0, 23))
+        people.append((name, rnd.randint(18, 72), gender, f"bench{start_id + i + 1}@example.com",
+                       f"9{rnd.randint(100000000, 999999999)}", password, joined.strftime("%Y-%m-%d %H:%M:%S")))
+    conn.executemany("""
+        INSERT INTO users (name, age, gender, email, mobile, password, role, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, 'user', ?)
+    """, people)
+    user_rows = conn.execute(
+        "SELECT id, gender FROM users WHERE id > ? AND role = 'user' ORDER BY id", (start_id,)
+    ).fetchall()
+
+    counts = {"users": len(user_rows), "health_data": 0, "period_tracking": 0, "reminders": 0, "feedback": 0}
+    for user_id, gender in user_rows:
+        who = persona(rnd)
+        rows = []
+        slept = who["sleep"]
+        for d in range(days, -1, -1):
+            day = (now - timedelta(days=d)).date()
+            chance = who["adherence"] * (who["weekend_dip"] if day.weekday() >= 5 else 1.0)
+            for category in CATEGORIES:
+                if rnd.random() >= chance:
+                    continue
+                for _ in range(2 if rnd.random() < who["double_log"] else 1):
+                    low, high = ENTRY_HOURS[category]
+                    at = datetime(day.year, day.month, day.day, rnd.randint(low, high - 1),
+                                  rnd.randint(0, 59), rnd.randint(0, 59))
+                    if at > now:
+                        continue
+                    value = entry_value(rnd, category, who, slept)
+                    if category == "sleep":
+                        slept = value["hours"]
+                    rows.append((user_id, category, json.dumps(value), suggestion(category, value),
+                                 at.strftime("%Y-%m-%d %H:%M:%S")))
+        # Saved in time order, like the real table
+        rows.sort(key=lambda row: row[4])
+        conn.executemany("""
+            INSERT INTO health_data (user_id, category, input_value, recommendation, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        counts["health_data"] += len(rows)
+
+        if gender == "Female" and rnd.random() < 0.8:
+            cycle = max(21, min(40, int(rnd.gauss(28, 2))))
+            start = now.date() - timedelta(days=days) + timedelta(days=rnd.randint(0, cycle - 1))
+            periods = []
+            while start <= now.date():
+                logged = datetime.combine(start, datetime.min.time()) + timedelta(hours=rnd.randint(8, 22))
+                periods.append((user_id, start.isoformat(), cycle, rnd.randint(3, 7), rnd.choice(SYMPTOMS),
+                                logged.strftime("%Y-%m-%d %H:%M:%S")))
+                start += timedelta(days=cycle + rnd.randint(-2, 2))
+            conn.executemany("""
+                INSERT INTO period_tracking (user_id, last_period_date, cycle_length, period_duration, symptoms, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, periods)
+            counts["period_tracking"] += len(periods)
+
+        reminders = [
+            (user_id, rnd.choice(["medicine", "exercise", "water"]),
+             f"{rnd.randint(6, 22):02d}:{rnd.choice([0, 15, 30, 45]):02d}",
+             f"bench{user_id}@example.com" if rnd.random() < 0.8 else None,
+             f"9{rnd.randint(100000000, 999999999)}" if rnd.random() < 0.4 else None,
+             rnd.choices(["Asia/Kolkata", "Europe/London", "America/New_York"], weights=[90, 5, 5])[0])
+            for _ in range(rnd.choices([0, 1, 2, 3], weights=[40, 35, 15, 10])[0])
+        ]
+        conn.executemany("""
+            INSERT INTO reminders (user_id, reminder_type, reminder_time, reminder_email, reminder_phone, timezone)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, reminders)
+        counts["reminders"] += len(reminders)
+
+        if rnd.random() < 0.2:
+            at = now - timedelta(days=rnd.randint(0, days), minutes=rnd.randint(0, 1440))
+            conn.execute("""
+                INSERT INTO feedback (user_id, rating, usefulness, feedback_type, improve, feature, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (user_id, rnd.choices([2, 3, 4, 5], weights=[1, 2, 4, 3])[0],
+                  rnd.choice(["Very useful", "Useful", "Somewhat", "Not really"]),
+                  rnd.choice(["Suggestion", "Bug", "Complaint"]),
+                  rnd.choice(["", "Faster pages", "More charts", "Dark mode"]),
+                  rnd.choice(["", "Export to CSV", "Apple Health sync", "Reminders by WhatsApp"]),
+                  at.strftime("%Y-%m-%d %H:%M:%S")))
+            counts["feedback"] += 1
+    conn.commit()
+    conn.close()
+
+    # Derived tables, built the way a deploy builds them
+    from utils.checkpoints import set_checkpoint
+    from utils.digests import backfill_daily_rollups
+    from utils.metric_stats import backfill_metric_stats
+    from utils.bundles import rebuild_bundles
+
+    backfill_daily_rollups()
+    set_checkpoint("daily_rollups_backfilled", now.isoformat())
+    backfill_metric_stats()
+    rebuild_bundles()
+    if not quiet:
+        print("🧪 Generated:", counts)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="database file to create or add to")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    generate(args.db, args.users, args.days, args.seed)
+    print(f"done in {time.perf_counter() - t0:.1f}s -> {args.db}")
+
+
+if __name__ == "__main__":
+    main()
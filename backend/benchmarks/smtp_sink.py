@@ -0,0 +1,98 @@
+"""
+Minimal local SMTP sink for delivery tests and benchmarks.
+
+Accepts EHLO/AUTH/MAIL/RCPT/DATA on plain TCP and just counts messages.
+`connect_delay` sleeps once per new connection to stand in for the TCP +
+TLS handshake and LOGIN that a real provider costs.
+
+    python benchmarks/smtp_sink.py --port 1025
+    SMTP_HOST=localhost SMTP_PORT=1025 SMTP_USE_SSL=0 python app.py
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        if sink.connect_delay:
+            time.sleep(sink.connect_delay)
+
+        self._reply("220 smtp-sink ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self._reply("250-smtp-sink")
+                self._reply("250-AUTH PLAIN LOGIN")
+                self._reply("250 OK")
+            elif verb == "AUTH":
+                self._reply("235 Authentication successful")
+            elif verb == "RCPT" and any(bad in command for bad in sink.reject):
+                self._reply("550 No such user")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with sink.lock:
+                    sink.messages += 1
+                self._reply("250 OK queued")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    def __init__(self, host="127.0.0.1", port=0, connect_delay=0.0, reject=()):
+        self.connect_delay = connect_delay
+        self.reject = tuple(reject)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self._server = _Server((host, port), _SinkHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--connect-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    sink = SMTPSink(port=args.port, connect_delay=args.connect_delay).start()
+    print(f"SMTP sink listening on {sink.host}:{sink.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"connections={sink.connections} messages={sink.messages}")
+    except KeyboardInterrupt:
+        sink.stop()
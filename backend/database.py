@@ -17,21 +17,31 @@ def get_db_connection():
 
 
 # ---------------- Flask & SQLAlchemy ----------------
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+# `app` / `db` for scripts that want the ORM. Built on first access: the
+# web app only uses get_db_connection() and shouldn't pay for SQLAlchemy.
+_orm = {}
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
-app = Flask(
-    __name__,
-    template_folder=os.path.join(BASE_DIR, "templates"),
-    static_folder=os.path.join(BASE_DIR, "static")
-)
+def __getattr__(name):
+    if name not in ("app", "db", "BASE_DIR"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if not _orm:
+        from flask import Flask
+        from flask_sqlalchemy import SQLAlchemy
 
-app.secret_key = os.environ.get("SMART_HEALTH_PLUS_SECRET_KEY")
+        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
-# Use the same absolute path for SQLAlchemy
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_PATH}"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        app = Flask(
+            __name__,
+            template_folder=os.path.join(base_dir, "templates"),
+            static_folder=os.path.join(base_dir, "static")
+        )
 
-db = SQLAlchemy(app)
+        app.secret_key = os.environ.get("SMART_HEALTH_PLUS_SECRET_KEY")
+
+        # Use the same absolute path for SQLAlchemy
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_PATH}"
+        app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+
+        _orm.update(app=app, db=SQLAlchemy(app), BASE_DIR=base_dir)
+    return _orm[name]
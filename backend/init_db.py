@@ -1,13 +1,13 @@
 from database import get_db_connection
 from werkzeug.security import generate_password_hash
 
-def init_db():
-    conn = get_db_connection()
-    if not conn:
-        print("Failed to connect to database.")
-        return
+# Bump when migrate_schema() gains a table, column or index: start-up
+# only touches a database whose PRAGMA user_version is behind
+SCHEMA_VERSION = 1
 
-    cursor = conn.cursor()
+
+def migrate_schema(cursor):
+    """Create missing tables, columns and indexes. Idempotent; no data."""
 
     # ---------------- USERS ----------------
     cursor.execute("""
@@ -119,6 +119,100 @@ def init_db():
     )
     """)
 
+    # ---------------- DAILY ROLLUPS ----------------
+    # Per user / day / category aggregates of health_data for digests
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS daily_rollups (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,                -- YYYY-MM-DD
+        category TEXT NOT NULL,
+        label TEXT NOT NULL DEFAULT '',   -- level / mood / quality, '' for numeric
+        entries INTEGER NOT NULL DEFAULT 0,
+        value_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day, category, label),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """)
+
+    # ---------------- METRIC STATS ----------------
+    # Streaming per-user stats (utils/metric_stats.py), one row per metric
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS user_metric_stats (
+        user_id INTEGER NOT NULL,
+        metric TEXT NOT NULL,
+        n INTEGER NOT NULL DEFAULT 0,     -- folded days
+        mean REAL NOT NULL DEFAULT 0,
+        m2 REAL NOT NULL DEFAULT 0,       -- Welford sum of squared deviations
+        ema REAL,
+        last_day TEXT,                    -- last folded day, YYYY-MM-DD
+        streak INTEGER NOT NULL DEFAULT 0,
+        pending_day TEXT,                 -- current day, not folded yet
+        pending_value REAL,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, metric),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """)
+
+    # ---------------- INSIGHTS ----------------
+    # Nightly cross-metric correlations per user (utils/insights.py), JSON list
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS user_insights (
+        user_id INTEGER PRIMARY KEY,
+        insights TEXT NOT NULL,
+        window_days INTEGER NOT NULL,
+        computed_at TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """)
+
+    # Nightly per-cohort histograms of users' typical values (utils/cohort_sketches.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS metric_sketches (
+        metric TEXT NOT NULL,
+        cohort TEXT NOT NULL,
+        users INTEGER NOT NULL,
+        counts TEXT NOT NULL,
+        computed_at TEXT NOT NULL,
+        PRIMARY KEY (metric, cohort)
+    )
+    """)
+
+    # Nightly focus areas from the on-box model (utils/focus_model.py), JSON list
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS user_focus (
+        user_id INTEGER PRIMARY KEY,
+        focus TEXT NOT NULL,
+        model_version TEXT NOT NULL,
+        computed_at TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """)
+
+    # Ready-to-serve recommendation / score bundle per user (utils/bundles.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS user_bundles (
+        user_id INTEGER PRIMARY KEY,
+        snapshot TEXT NOT NULL,
+        bundle TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """)
+
+    # Token buckets for RATE_LIMIT_BACKEND=sqlite (utils/rate_limits.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS rate_limits (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated REAL NOT NULL
+    )
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_rate_limits_updated
+    ON rate_limits (updated)
+    """)
+
     # ---------------- REMINDERS ----------------
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS reminders (
@@ -129,11 +223,104 @@ def init_db():
         reminder_date TEXT,
         reminder_email TEXT,
         reminder_phone TEXT,
+        timezone TEXT DEFAULT 'Asia/Kolkata',
         created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
     )
     """)
 
+    # Older databases were created before reminders had a timezone
+    cursor.execute("PRAGMA table_info(reminders)")
+    reminder_columns = [col["name"] for col in cursor.fetchall()]
+    if "timezone" not in reminder_columns:
+        cursor.execute("ALTER TABLE reminders ADD COLUMN timezone TEXT DEFAULT 'Asia/Kolkata'")
+
+    # The minute tick looks up reminders by (timezone, "HH:MM")
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_reminders_due
+    ON reminders (timezone, reminder_time)
+    """)
+
+    # ---------------- JOB CHECKPOINTS ----------------
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS job_checkpoints (
+        name TEXT PRIMARY KEY,
+        value TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+    # ---------------- NOTIFICATION OUTBOX ----------------
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        channel TEXT NOT NULL,            -- email / sms
+        recipient TEXT NOT NULL,
+        subject TEXT,
+        body TEXT NOT NULL,
+        user_id INTEGER,
+        reminder_id INTEGER,
+        priority INTEGER DEFAULT 0,       -- higher is delivered first
+        status TEXT DEFAULT 'pending',    -- pending / sending / sent / dead
+        attempts INTEGER DEFAULT 0,
+        available_at TEXT NOT NULL,
+        lease_owner TEXT,
+        lease_expires TEXT,
+        last_error TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        sent_at TEXT
+    )
+    """)
+
+    cursor.execute("PRAGMA table_info(outbox)")
+    if "priority" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE outbox ADD COLUMN priority INTEGER DEFAULT 0")
+
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_outbox_claim
+    ON outbox (status, priority, id)
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS outbox_attempts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        outbox_id INTEGER NOT NULL,
+        attempt INTEGER NOT NULL,
+        worker TEXT,
+        ok INTEGER NOT NULL,
+        error TEXT,
+        duration_ms REAL,
+        attempted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (outbox_id) REFERENCES outbox(id) ON DELETE CASCADE
+    )
+    """)
+
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_outbox_attempts_outbox
+    ON outbox_attempts (outbox_id)
+    """)
+
+    # ---------------- USER DEVICES (PUSH) ----------------
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS user_devices (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        device_id TEXT NOT NULL,
+        platform TEXT DEFAULT 'web',  -- web / android / ios
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, device_id),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """)
+
+    # Pruning invalid device IDs deletes by device_id
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_user_devices_device
+    ON user_devices (device_id)
+    """)
+
 
    # ---------------- FEEDBACK (FIXED) ----------------
     cursor.execute("""
@@ -156,19 +343,6 @@ def init_db():
     """)
 
 
-    # ---------------- DEFAULT ADMIN ----------------
-    cursor.execute("SELECT * FROM users WHERE role='admin'")
-    admin_exists = cursor.fetchone()
-    if not admin_exists:
-        admin_email = "admin0202@gmail.com"
-        admin_password = generate_password_hash("Admin@0202")
-        admin_name = "Admin"
-        cursor.execute(
-            "INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, ?)",
-            (admin_name, admin_email, admin_password, "admin")
-        )
-        print("Default admin created:", admin_email)
-
     # ---------------- PERIOD TRACKING ----------------
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS period_tracking (
@@ -183,6 +357,62 @@ def init_db():
     )
     """)
 
+
+def _begin_migration(conn):
+    cursor = conn.cursor()
+    # WAL lets the web app read while scheduler / outbox workers write
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # One write transaction, so processes starting together take turns
+    # at the guarded ALTERs
+    cursor.execute("BEGIN IMMEDIATE")
+    return cursor
+
+
+def upgrade_schema():
+    """
+    Start-up path (app.py, utils/jobs.py): bring an existing database's
+    schema up to date. Writes nothing when it already is, and never adds
+    users or other data.
+    """
+    conn = get_db_connection()
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        cursor = _begin_migration(conn)
+        # Another process may have migrated while we waited for the lock
+        if cursor.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            migrate_schema(cursor)
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            print("✅ Database schema upgraded to version", SCHEMA_VERSION)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def init_db():
+    """First-time setup (python init_db.py): the schema plus a default admin."""
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect to database.")
+        return
+
+    cursor = _begin_migration(conn)
+    migrate_schema(cursor)
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # ---------------- DEFAULT ADMIN ----------------
+    cursor.execute("SELECT * FROM users WHERE role='admin'")
+    admin_exists = cursor.fetchone()
+    if not admin_exists:
+        admin_email = "admin0202@gmail.com"
+        admin_password = generate_password_hash("Admin@0202")
+        admin_name = "Admin"
+        cursor.execute(
+            "INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, ?)",
+            (admin_name, admin_email, admin_password, "admin")
+        )
+        print("Default admin created:", admin_email)
+
     conn.commit()
     cursor.close()
     conn.close()
@@ -1,5 +1,5 @@
-from .user import user_bp
-from .stress import stress_bp
-from .sleep import sleep_bp
-from .nutrition import nutrition_bp
-from .fitness import fitness_bp
+# Rule-based health models. Nothing is re-exported here: the per-category
+# modules (user, sleep, stress, ...) expect a `database.get_db` helper and
+# `*_bp` blueprints that don't exist, so importing them eagerly made every
+# `models.*` import fail. Import submodules directly, e.g.
+# `from models.recommendation import calculate_health_scores`.
@@ -3,6 +3,10 @@
 # Rule-based intelligent logic
 # ================================
 
+import numpy as np
+
+from utils.health_score import FLAT_ENGINE
+
 # -------- SLEEP --------
 def sleep_recommendation(hours):
     if hours < 6:
@@ -73,53 +77,116 @@ def goal_recommendation(status):
         return "Congratulations! You achieved your goal. Set a new one to stay motivated."
 
 # -------- health score --------
+# Scored by the shared engine in utils/health_score.py, with its own
+# FLAT_SCORE_SPEC (0 / 10 / 20 points per module, Poor..Excellent). This
+# module takes flat numbers (sleep hours, glasses of water, fitness
+# minutes, stress 0-10, mood text); FLAT_FEATURES says which engine
+# feature each one feeds.
+
+FLAT_FEATURES = {
+    "sleep": "hours",
+    "hydration": "glasses",
+    "fitness": "minutes",
+    "stress": "score",
+    "mood": "mood",
+}
+
+
+def _logged(value):
+    return value is not None and value == value  # NaN != NaN
+
+
+def _flat_to_day(user_data):
+    return {
+        module: {feature: user_data[module]}
+        for module, feature in FLAT_FEATURES.items()
+        if _logged(user_data.get(module))
+    }
+
+
 def calculate_health_score(user_data):
-    score = 0
-
-    # Sleep
-    sleep = user_data.get("sleep", 0)
-    if sleep >= 7:
-        score += 20
-    elif sleep >= 5:
-        score += 10
-
-    # Hydration
-    water = user_data.get("hydration", 0)
-    if water >= 3:
-        score += 20
-    elif water >= 2:
-        score += 10
-
-    # Fitness
-    fitness = user_data.get("fitness", 0)
-    if fitness >= 30:
-        score += 20
-    elif fitness >= 15:
-        score += 10
-
-    # Stress
-    stress = user_data.get("stress", 10)
-    if stress <= 3:
-        score += 20
-    elif stress <= 6:
-        score += 10
-
-    # Mood
-    mood = user_data.get("mood", "")
-    if mood.lower() in ["happy", "positive", "good"]:
-        score += 20
-    elif mood.lower() in ["neutral", "okay"]:
-        score += 10
-
-    return score
+    return FLAT_ENGINE.score(_flat_to_day(user_data))
 
 
 def wellness_index(score):
-    if score >= 80:
-        return "Excellent 🌟"
-    elif score >= 60:
-        return "Good 🙂"
-    elif score >= 40:
-        return "Fair 😐"
-    else:
-        return "Poor 😟"
+    return FLAT_ENGINE.wellness(score)
+
+
+# -------- batch scoring (NumPy) --------
+# Same engine tables, applied to whole columns at once for cohort views and
+# nightly jobs: bisect bands become np.searchsorted, label maps become a
+# code -> points lookup. Results are identical to the scalar functions.
+
+def _band_points(feature, values):
+    values = np.asarray(values, dtype=np.float64)
+    side = "right" if feature.closed == "left" else "left"
+    idx = np.searchsorted(np.asarray(feature.cuts), values, side=side)
+    points = np.asarray(feature.points)[idx]
+    # NaN = not logged: the module is missing, not scored
+    return np.where(np.isnan(values), np.nan, points)
+
+
+def _mood_feature():
+    return FLAT_ENGINE.module("mood").feature(FLAT_FEATURES["mood"])
+
+
+def mood_code(mood):
+    """Encode a mood string for calculate_health_scores (-1 = not logged)."""
+    if mood is None:
+        return -1
+    return _mood_feature().code(mood)
+
+
+def mood_codes(moods):
+    """
+    Encode a column of mood strings. There are only a handful of distinct
+    moods, so each is looked up once and cached for the rest of the column.
+    """
+    moods = list(moods)
+    cache = {}
+
+    def encode(mood):
+        code = cache.get(mood)
+        if code is None:
+            code = cache[mood] = mood_code(mood)
+        return code
+
+    return np.fromiter((encode(m) for m in moods), dtype=np.int16, count=len(moods))
+
+
+def _label_points(feature, codes):
+    codes = np.asarray(codes, dtype=np.int16)
+    points = np.asarray(feature.points)[np.clip(codes, 0, len(feature.points) - 1)]
+    return np.where(codes < 0, np.nan, points)
+
+
+def calculate_health_scores(sleep, hydration, fitness, stress, mood):
+    """
+    Vectorized calculate_health_score. Takes equal-length columns (lists
+    or arrays) of sleep hours, glasses of water, fitness minutes, stress
+    (0-10) and mood codes (see mood_code); NaN / -1 means not logged.
+    Returns an int32 array of scores.
+    """
+    columns = {"sleep": sleep, "hydration": hydration, "fitness": fitness, "stress": stress}
+    total = None
+    for module in FLAT_ENGINE.modules:
+        if module.name == "mood":
+            points = _label_points(_mood_feature(), mood)
+        elif module.name in columns:
+            points = _band_points(module.feature(FLAT_FEATURES[module.name]), columns[module.name])
+        else:
+            continue
+        contribution = np.nan_to_num(points, nan=0.0) * module.weight
+        total = contribution if total is None else total + contribution
+
+    return np.rint(total / FLAT_ENGINE.total_weight * 100).astype(np.int32)
+
+
+def wellness_bands(scores):
+    """Index into FLAT_ENGINE.wellness_labels for each score."""
+    return np.searchsorted(np.asarray(FLAT_ENGINE.wellness_cuts), np.asarray(scores), side="right")
+
+
+def wellness_indices(scores):
+    """Vectorized wellness_index: array of labels."""
+    return np.asarray(FLAT_ENGINE.wellness_labels)[wellness_bands(scores)]
@@ -1,16 +1,28 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, session
 from database import get_db_connection
 
 notification_bp = Blueprint("notification_bp", __name__)
 
 @notification_bp.route("/register-device", methods=["POST"])
 def register_device():
-    user_id = request.json.get("user_id")
-    device_id = request.json.get("device_id")
-    platform = request.json.get("platform", "web")
+    user_id = session.get("user_id")
+    if user_id is None:
+        return jsonify({"error": "Login required"}), 401
+    result, status = register_user_device(user_id, request.get_json(silent=True))
+    return jsonify(result), status
+
+
+def register_user_device(user_id, data):
+    """
+    Store a push device for the logged-in `user_id` (any user_id in the
+    body is ignored). Returns (json, status); also used by asgi.py.
+    """
+    data = data or {}
+    device_id = data.get("device_id")
+    platform = data.get("platform", "web")
 
     if not user_id or not device_id:
-        return jsonify({"error": "Missing data"}), 400
+        return {"error": "Missing data"}, 400
 
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -23,4 +35,4 @@ def register_device():
     conn.commit()
     conn.close()
 
-    return jsonify({"message": "Device registered successfully"})
+    return {"message": "Device registered successfully"}, 200
@@ -0,0 +1,230 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+from database import get_db_connection
+from utils.health_score import ENGINE, parse_value
+from utils.rule_packs import current_pack
+
+
+# ---------------- Recommendation Bundles ----------------
+# One ready-to-serve row per user in user_bundles: the health summary
+# text, the recommendation and its summary, today's score / wellness /
+# tips and the AI tip. /recommendation, /generate-recommendation and /goal
+# read it by primary key instead of re-reading every health_data row.
+#
+# The bundle keeps the small snapshot it was rendered from (latest value
+# per category, and today's latest per category for the score), so:
+#   - save-health-data updates it in O(1), in the same transaction
+#   - a new rule pack or a new day re-renders it from the snapshot
+#   - the nightly rebuild re-derives everything from health_data
+
+BUNDLE_PAGE_SIZE = int(os.getenv("BUNDLE_PAGE_SIZE", "500"))
+
+NO_SCORE = (0, "No Data", "Please add today’s health data.")
+
+
+def score_day_key():
+    # Same day boundary as calculate_health_score (SQLite DATE('now'))
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+# ---------------- Snapshot ----------------
+def empty_snapshot():
+    return {
+        "latest": {},      # category as stored -> {"value": input_value, "at": created_at}
+        "day": None,       # score day of `today`
+        "today": {},       # lower-cased category -> parsed value dict
+        "today_rows": 0,
+    }
+
+
+def apply_row(snapshot, category, input_value, created_at):
+    """Fold one health_data row, in save order, into a snapshot."""
+    snapshot["latest"][category] = {"value": input_value, "at": str(created_at)}
+    day = str(created_at)[:10]
+    if day != snapshot["day"]:
+        if snapshot["day"] is not None and day < snapshot["day"]:
+            return snapshot  # backdated: only the newest day is scored
+        snapshot["day"], snapshot["today"], snapshot["today_rows"] = day, {}, 0
+    snapshot["today_rows"] += 1
+    value = parse_value(input_value)
+    if value is not None:
+        snapshot["today"][(category or "").lower()] = value
+    return snapshot
+
+
+def snapshot_from_rows(rows):
+    """Snapshot from health_data rows (category, input_value, created_at), newest first."""
+    snapshot = empty_snapshot()
+    for row in reversed(rows):
+        apply_row(snapshot, row["category"], row["input_value"], row["created_at"])
+    return snapshot
+
+
+# ---------------- Rendering ----------------
+def _health_summary(latest):
+    """The text get_user_health_summary() builds from raw rows."""
+    if not latest:
+        return "No health data available."
+    lines = [
+        f"{category.capitalize()}: {entry['value']}\n"
+        for category, entry in sorted(latest.items(), key=lambda item: item[1]["at"], reverse=True)
+        if entry["value"]
+    ]
+    return "".join(lines)
+
+
+def _latest_data(latest):
+    data = {}
+    for category, entry in latest.items():
+        try:
+            data[category] = json.loads(entry["value"])
+        except (TypeError, ValueError):
+            data[category] = {}
+    return data
+
+
+def render(snapshot, pack=None, today=None):
+    """The served bundle for a snapshot."""
+    pack = pack or current_pack()
+    today = today or score_day_key()
+    latest = snapshot["latest"]
+
+    if latest:
+        recommendation, rec_summary = pack.recommendation(_latest_data(latest))
+    else:
+        recommendation, rec_summary = pack.recommendation_empty, ""
+
+    if snapshot["day"] == today and snapshot["today_rows"]:
+        result = ENGINE.evaluate(snapshot["today"])
+        score, wellness, tips = result["score"], result["wellness"], " ".join(result["tips"])
+    else:
+        score, wellness, tips = NO_SCORE
+
+    return {
+        "summary": _health_summary(latest),
+        "has_data": bool(latest),
+        "recommendation": recommendation,
+        "recommendation_summary": rec_summary,
+        "score": score,
+        "wellness": wellness,
+        "tips": tips,
+        "ai_tip": pack.ai_tip(score, wellness, latest),
+        "pack_version": pack.version,
+        "score_day": today,
+    }
+
+
+# ---------------- Storage ----------------
+def _write(cursor, user_id, snapshot, bundle):
+    cursor.execute("""
+        INSERT INTO user_bundles (user_id, snapshot, bundle, updated_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(user_id) DO UPDATE SET
+            snapshot = excluded.snapshot,
+            bundle = excluded.bundle,
+            updated_at = excluded.updated_at
+    """, (user_id, json.dumps(snapshot), json.dumps(bundle)))
+
+
+def update_bundle(cursor, user_id, category, input_value, created_at):
+    """Fold one saved health_data row into the user's bundle; the caller commits."""
+    cursor.execute("SELECT snapshot FROM user_bundles WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    if row is None:
+        # First save since the last rebuild: start from the full history
+        cursor.execute("""
+            SELECT category, input_value, created_at FROM health_data
+            WHERE user_id = ?
+            ORDER BY created_at DESC
+        """, (user_id,))
+        snapshot = snapshot_from_rows(cursor.fetchall())
+    else:
+        snapshot = apply_row(json.loads(row[0]), category, input_value, created_at)
+    _write(cursor, user_id, snapshot, render(snapshot))
+
+
+def user_bundle(user_id):
+    """
+    The user's bundle: one primary-key read. Re-rendered in memory when the
+    rule pack or the score day changed since it was written, and built
+    from health_data if the user has none yet.
+    """
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT snapshot, bundle FROM user_bundles WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            # Hold the write lock so a save can't land between read and write
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("""
+                SELECT category, input_value, created_at FROM health_data
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+            """, (user_id,)).fetchall()
+            snapshot = snapshot_from_rows(rows)
+            bundle = render(snapshot)
+            _write(conn.cursor(), user_id, snapshot, bundle)
+            conn.commit()
+            return bundle
+    finally:
+        conn.close()
+
+    bundle = json.loads(row["bundle"])
+    pack = current_pack()
+    if bundle["pack_version"] != pack.version or bundle["score_day"] != score_day_key():
+        bundle = render(json.loads(row["snapshot"]), pack)
+    return bundle
+
+
+# ---------------- Nightly Rebuild ----------------
+def rebuild_bundles(page_size=BUNDLE_PAGE_SIZE):
+    """
+    Re-derive every bundle from health_data, a page of users per write
+    transaction so saves made meanwhile are never overwritten.
+    """
+    started = time.monotonic()
+    pack = current_pack()
+    today = score_day_key()
+    users = 0
+    after_id = 0
+    while True:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            page = [row["id"] for row in cursor.execute("""
+                SELECT id FROM users
+                WHERE id > ? AND role != 'admin'
+                ORDER BY id
+                LIMIT ?
+            """, (after_id, page_size)).fetchall()]
+            if not page:
+                conn.rollback()
+                break
+            after_id = page[-1]
+            rows = cursor.execute(f"""
+                SELECT user_id, category, input_value, created_at FROM health_data
+                WHERE user_id IN ({','.join('?' * len(page))})
+                ORDER BY user_id, created_at DESC
+            """, page).fetchall()
+            by_user = {user_id: [] for user_id in page}
+            for row in rows:
+                by_user[row["user_id"]].append(row)
+            for user_id, user_rows in by_user.items():
+                snapshot = snapshot_from_rows(user_rows)
+                _write(cursor, user_id, snapshot, render(snapshot, pack, today))
+            conn.commit()
+            users += len(page)
+        finally:
+            conn.close()
+
+    result = {"users": users, "pack": pack.version, "elapsed_seconds": round(time.monotonic() - started, 2)}
+    print("📦 Bundles:", result)
+    return result
+
+
+def schedule_bundle_jobs(scheduler):
+    # Just after midnight UTC, when every score rolls over to a new day
+    scheduler.add_job(rebuild_bundles, trigger="cron", hour=0, minute=10, timezone="UTC",
+                      id="nightly_bundles", replace_existing=True)
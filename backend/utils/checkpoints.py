@@ -0,0 +1,39 @@
+from database import get_db_connection
+
+
+# ---------------- Job Checkpoints ----------------
+# Small key/value table so scheduled jobs can remember how far they got
+# (last dispatched minute, last processed user id, ...) across restarts.
+
+def get_checkpoint(name, default=None):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM job_checkpoints WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return row["value"] if row else default
+
+
+def set_checkpoint(name, value, cursor=None):
+    """
+    Pass `cursor` to write the checkpoint inside the caller's transaction
+    (the caller commits); otherwise it is committed on its own connection.
+    """
+    sql = """
+        INSERT INTO job_checkpoints (name, value, updated_at)
+        VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(name) DO UPDATE SET
+            value = excluded.value,
+            updated_at = excluded.updated_at
+    """
+    if cursor is not None:
+        cursor.execute(sql, (name, str(value)))
+        return
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(sql, (name, str(value)))
+    conn.commit()
+    cursor.close()
+    conn.close()
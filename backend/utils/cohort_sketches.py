@@ -0,0 +1,289 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from database import get_db_connection
+
+
+# ---------------- Cohort Percentile Sketches ----------------
+# "Your sleep is higher than 62% of people aged 25-34" without a percentile
+# query over health_data. Each user contributes one value per metric (their
+# running mean from user_metric_stats) to a fixed-bin histogram per
+# (metric, age band, gender). Fixed bins make the sketches exactly
+# mergeable - two pages, two cohorts or two nights just add their counts -
+# which is how the nightly rebuild pages through users and how the wider
+# fallback cohorts ("25-34, any gender", "everyone") are built.
+#
+# Workers keep every sketch in memory with a prefix-sum table, so a
+# percentile lookup is one bin index and one interpolation: O(1).
+
+# Metric -> fixed bins [lo, hi) split into `bins`; values outside land in
+# the first / last bin. Keys match utils.metric_stats.METRIC_SPEC.
+SKETCH_SPEC = {
+    "sleep_hours": {"lo": 0, "hi": 14, "bins": 112},      # 7.5 min bins
+    "steps": {"lo": 0, "hi": 30000, "bins": 150},         # 200 steps
+    "minutes": {"lo": 0, "hi": 180, "bins": 90},          # 2 min
+}
+
+AGE_BANDS = [(0, 17, "under 18"), (18, 24, "18-24"), (25, 34, "25-34"), (35, 44, "35-44"),
+             (45, 54, "45-54"), (55, 64, "55-64"), (65, 200, "65+")]
+GENDERS = ("male", "female")
+ANY = "*"
+
+# Fewer users than this and the next wider cohort is used instead
+SKETCH_MIN_USERS = int(os.getenv("SKETCH_MIN_USERS", "30"))
+SKETCH_PAGE_SIZE = int(os.getenv("SKETCH_PAGE_SIZE", "5000"))
+SKETCH_REFRESH_SECONDS = float(os.getenv("SKETCH_REFRESH_SECONDS", "300"))
+
+
+def age_band(age):
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return None
+    for low, high, label in AGE_BANDS:
+        if low <= age <= high:
+            return label
+    return None
+
+
+def gender_group(gender):
+    gender = str(gender or "").strip().lower()
+    return gender if gender in GENDERS else None
+
+
+def cohort_key(band, gender):
+    return f"{band or ANY}|{gender or ANY}"
+
+
+def cohort_chain(age, gender):
+    """Narrowest to widest cohort for a user: band+gender, band, everyone."""
+    band, gender = age_band(age), gender_group(gender)
+    chain = []
+    if band and gender:
+        chain.append(cohort_key(band, gender))
+    if band:
+        chain.append(cohort_key(band, None))
+    chain.append(cohort_key(None, None))
+    return chain
+
+
+def cohort_label(key):
+    band, gender = key.split("|")
+    if band == ANY:
+        return "all users"
+    who = f"{gender} users" if gender != ANY else "users"
+    return f"{who} aged {band}" if band != "under 18" else f"{who} under 18"
+
+
+# ---------------- Sketch ----------------
+class Sketch:
+    """Fixed-bin histogram with a prefix-sum table for O(1) percentiles."""
+
+    def __init__(self, metric, counts=None):
+        spec = SKETCH_SPEC[metric]
+        self.metric = metric
+        self.lo, self.hi, self.bins = float(spec["lo"]), float(spec["hi"]), int(spec["bins"])
+        self.width = (self.hi - self.lo) / self.bins
+        self.counts = np.zeros(self.bins, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self._seal()
+
+    def _seal(self):
+        self.total = int(self.counts.sum())
+        # below[i] = users in bins before i
+        self.below = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+
+    def bin_index(self, values):
+        idx = np.floor((np.asarray(values, dtype=float) - self.lo) / self.width)
+        return np.clip(idx, 0, self.bins - 1).astype(np.intp)
+
+    def add(self, values):
+        np.add.at(self.counts, self.bin_index(values), 1)
+        self._seal()
+        return self
+
+    def merge(self, other):
+        return Sketch(self.metric, self.counts + other.counts)
+
+    def percentile(self, value):
+        """Share (0-100) of the cohort below `value`, interpolated in its bin."""
+        if not self.total:
+            return None
+        i = int(min(max((value - self.lo) // self.width, 0), self.bins - 1))
+        within = min(max((value - self.lo - i * self.width) / self.width, 0.0), 1.0)
+        return 100.0 * float(self.below[i] + self.counts[i] * within) / self.total
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0-1), for admin summaries."""
+        if not self.total:
+            return None
+        target = q * self.total
+        i = int(np.searchsorted(np.cumsum(self.counts), target, side="left"))
+        i = min(i, self.bins - 1)
+        within = (target - self.below[i]) / self.counts[i] if self.counts[i] else 0.0
+        return self.lo + (i + within) * self.width
+
+
+# ---------------- Nightly Rebuild ----------------
+# Per-user typical value: the folded mean plus today's pending value
+USER_VALUE_SQL = """
+    (s.mean * s.n + COALESCE(s.pending_value, 0))
+    / (s.n + CASE WHEN s.pending_value IS NULL THEN 0 ELSE 1 END)
+"""
+
+
+def _page_sketches(rows):
+    """{(metric, cohort): Sketch} for one page of (metric, value, age, gender) rows."""
+    grouped = {}
+    for metric, value, age, gender in rows:
+        if metric not in SKETCH_SPEC or value is None:
+            continue
+        band = age_band(age)
+        # Only the narrowest cohort here; wider ones are merged afterwards.
+        # Without an age the user only counts towards everyone.
+        group = gender_group(gender) if band else None
+        grouped.setdefault((metric, cohort_key(band, group)), []).append(value)
+    return {key: Sketch(key[0]).add(values) for key, values in grouped.items()}
+
+
+def _merge_into(target, sketches):
+    for key, sketch in sketches.items():
+        target[key] = target[key].merge(sketch) if key in target else sketch
+
+
+def _widen(sketches):
+    """Add the band-only and everyone cohorts by merging the narrow ones."""
+    wider = {}
+    for (metric, key), sketch in sketches.items():
+        band, _ = key.split("|")
+        targets = {cohort_key(None, None)}
+        if band != ANY:
+            targets.add(cohort_key(band, None))
+        for target in targets - {key}:
+            wide_key = (metric, target)
+            wider[wide_key] = wider[wide_key].merge(sketch) if wide_key in wider else sketch
+    _merge_into(sketches, wider)
+    return sketches
+
+
+def rebuild_sketches(page_size=SKETCH_PAGE_SIZE):
+    """Recompute every cohort sketch from user_metric_stats, page by page."""
+    started = time.monotonic()
+    sketches = {}
+    after_id = 0
+    conn = get_db_connection()
+    try:
+        while True:
+            page = conn.execute("""
+                SELECT id, age, gender FROM users
+                WHERE id > ? AND role != 'admin' AND is_active = 1
+                ORDER BY id
+                LIMIT ?
+            """, (after_id, page_size)).fetchall()
+            if not page:
+                break
+            after_id = page[-1]["id"]
+            rows = conn.execute(f"""
+                SELECT s.metric, {USER_VALUE_SQL} AS value, u.age, u.gender
+                FROM user_metric_stats s
+                JOIN users u ON u.id = s.user_id
+                WHERE s.user_id BETWEEN ? AND ?
+                  AND u.role != 'admin' AND u.is_active = 1
+                  AND s.metric IN ({','.join('?' * len(SKETCH_SPEC))})
+                  AND (s.n > 0 OR s.pending_value IS NOT NULL)
+            """, (page[0]["id"], after_id, *SKETCH_SPEC)).fetchall()
+            _merge_into(sketches, _page_sketches(rows))
+
+        _widen(sketches)
+        computed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute("DELETE FROM metric_sketches")
+        conn.executemany("""
+            INSERT INTO metric_sketches (metric, cohort, users, counts, computed_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(metric, key, sketch.total, json.dumps(sketch.counts.tolist()), computed_at)
+              for (metric, key), sketch in sketches.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+    _cache["next_refresh"] = 0.0  # this worker picks the new sketches up now
+    result = {"sketches": len(sketches), "elapsed_seconds": round(time.monotonic() - started, 2)}
+    print("📊 Cohort sketches:", result)
+    return result
+
+
+# ---------------- Lookup ----------------
+_cache = {"sketches": {}, "next_refresh": 0.0}
+_cache_lock = threading.Lock()
+
+
+def _load_sketches():
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("SELECT metric, cohort, counts FROM metric_sketches").fetchall()
+    finally:
+        conn.close()
+    return {
+        (row["metric"], row["cohort"]): Sketch(row["metric"], json.loads(row["counts"]))
+        for row in rows if row["metric"] in SKETCH_SPEC
+    }
+
+
+def current_sketches():
+    """All sketches, re-read from the table at most every SKETCH_REFRESH_SECONDS."""
+    now = time.monotonic()
+    if now >= _cache["next_refresh"] and _cache_lock.acquire(blocking=False):
+        try:
+            _cache["sketches"] = _load_sketches()
+            _cache["next_refresh"] = now + SKETCH_REFRESH_SECONDS
+        finally:
+            _cache_lock.release()
+    return _cache["sketches"]
+
+
+def cohort_percentile(metric, value, age, gender):
+    """
+    (percentile, cohort key, users) against the narrowest cohort with at
+    least SKETCH_MIN_USERS users, or None.
+    """
+    if value is None or metric not in SKETCH_SPEC:
+        return None
+    sketches = current_sketches()
+    for key in cohort_chain(age, gender):
+        sketch = sketches.get((metric, key))
+        if sketch is not None and sketch.total >= SKETCH_MIN_USERS:
+            return sketch.percentile(value), key, sketch.total
+    return None
+
+
+def user_benchmarks(views, age, gender):
+    """
+    Benchmarks for a user's metric views (utils.metric_stats.user_metric_stats):
+    [{"metric", "label", "unit", "value", "percentile", "cohort", "users"}].
+    """
+    out = []
+    for metric, view in views.items():
+        if metric not in SKETCH_SPEC:
+            continue
+        days = view["days"] + (1 if view["value"] is not None else 0)
+        if not days:
+            continue
+        value = (view["mean"] * view["days"] + (view["value"] or 0)) / days
+        found = cohort_percentile(metric, value, age, gender)
+        if found is None:
+            continue
+        percentile, key, users = found
+        out.append({
+            "metric": metric, "label": view["label"], "unit": view["unit"],
+            "value": round(value, 1), "percentile": int(round(percentile)),
+            "cohort": cohort_label(key), "users": users,
+        })
+    return out
+
+
+def schedule_sketch_jobs(scheduler):
+    # After the metric stats have settled for the day
+    scheduler.add_job(rebuild_sketches, trigger="cron", hour=3, minute=0,
+                      id="cohort_sketches", replace_existing=True)
@@ -0,0 +1,383 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from database import get_db_connection
+from utils.checkpoints import get_checkpoint, set_checkpoint
+from utils.outbox import enqueue, PRIORITY_BULK
+
+
+# ---------------- Daily Rollups ----------------
+# One row per (user, day, category, label) with an entry count and a sum.
+# save-health-data bumps it in the same transaction as the raw insert, so a
+# weekly / monthly summary reads ~30 small rows per user instead of
+# re-parsing every JSON health_data row.
+
+HYDRATION_SCORES = {"low": 1, "moderate": 2, "high": 3}
+
+DIGEST_PAGE_SIZE = int(os.getenv("DIGEST_PAGE_SIZE", "1000"))
+DIGEST_WORKERS = int(os.getenv("DIGEST_WORKERS", "4"))
+# A run stops here; resume_digests picks it up from its checkpoint the next night
+DIGEST_WINDOW_SECONDS = int(os.getenv("DIGEST_WINDOW_SECONDS", str(4 * 3600)))
+
+DIGEST_SUBJECTS = {
+    "weekly": "Your SmartHealthPlus weekly summary",
+    "monthly": "Your SmartHealthPlus monthly summary",
+}
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def rollup_entry(category, value):
+    """
+    (category, label, numeric value) for a normalized health_data value, or
+    None for categories that don't feed summaries.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    if not isinstance(value, dict):
+        return None
+
+    category = (category or "").lower()
+    if category == "sleep":
+        return ("sleep", "", _number(value.get("hours")))
+    if category == "fitness":
+        return ("fitness", "", _number(value.get("minutes")))
+    if category == "hydration":
+        level = str(value.get("level") or "").lower()
+        return ("hydration", level, HYDRATION_SCORES.get(level, 0))
+    if category == "stress":
+        return ("stress", str(value.get("level") or "").lower(), 0)
+    if category == "mood":
+        return ("mood", str(value.get("mood") or "").lower(), 0)
+    if category == "nutrition":
+        return ("nutrition", str(value.get("quality") or "").lower(), 0)
+    return None
+
+
+def record_daily_rollup(cursor, user_id, category, value, created_at):
+    """Bump the rollup for one health_data row; the caller commits."""
+    entry = rollup_entry(category, value)
+    if entry is None:
+        return
+    category, label, amount = entry
+    cursor.execute("""
+        INSERT INTO daily_rollups (user_id, day, category, label, entries, value_sum)
+        VALUES (?, ?, ?, ?, 1, ?)
+        ON CONFLICT(user_id, day, category, label) DO UPDATE SET
+            entries = entries + 1,
+            value_sum = value_sum + excluded.value_sum
+    """, (user_id, str(created_at)[:10], category, label, amount))
+
+
+def backfill_daily_rollups(batch_size=5000):
+    """Rebuild daily_rollups from health_data (once, for existing data)."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM daily_rollups")
+        last_id = 0
+        while True:
+            # The JOIN skips rows left behind by deleted users
+            rows = conn.execute("""
+                SELECT h.id, h.user_id, h.category, h.input_value, h.created_at
+                FROM health_data h
+                JOIN users u ON u.id = h.user_id
+                WHERE h.id > ?
+                ORDER BY h.id
+                LIMIT ?
+            """, (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                record_daily_rollup(cursor, row["user_id"], row["category"],
+                                    row["input_value"], row["created_at"])
+            last_id = rows[-1]["id"]
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def ensure_daily_rollups():
+    """Backfill once, before the first job that reads rollups."""
+    if get_checkpoint("daily_rollups_backfilled") is None:
+        backfill_daily_rollups()
+        set_checkpoint("daily_rollups_backfilled", datetime.now(timezone.utc).isoformat())
+
+
+def fetch_rollups(cursor, user_ids, start, end):
+    """
+    {user_id: {category: {"entries", "sum", "labels": {label: entries}}}}
+    for the inclusive day range, in one query per page of users.
+    """
+    stats = {uid: {} for uid in user_ids}
+    if not user_ids:
+        return stats
+    cursor.execute(f"""
+        SELECT user_id, category, label, SUM(entries) AS entries, SUM(value_sum) AS value_sum
+        FROM daily_rollups
+        WHERE user_id IN ({','.join('?' * len(user_ids))})
+          AND day BETWEEN ? AND ?
+        GROUP BY user_id, category, label
+    """, [*user_ids, start.isoformat(), end.isoformat()])
+    for row in cursor.fetchall():
+        cat = stats[row["user_id"]].setdefault(row["category"], {"entries": 0, "sum": 0.0, "labels": {}})
+        cat["entries"] += row["entries"]
+        cat["sum"] += row["value_sum"]
+        if row["label"]:
+            cat["labels"][row["label"]] = cat["labels"].get(row["label"], 0) + row["entries"]
+    return stats
+
+
+def _average(stats, category):
+    cat = stats.get(category)
+    if not cat or not cat["entries"]:
+        return None
+    return cat["sum"] / cat["entries"]
+
+
+# ---------------- Summaries ----------------
+def generate_weekly_summary(stats):
+    if not stats:
+        return "No sufficient data available for this week."
+
+    msg = []
+
+    sleep = _average(stats, "sleep")
+    if sleep is not None and sleep < 7:
+        msg.append("Your sleep duration was below recommended levels.")
+    else:
+        msg.append("Your sleep routine was mostly consistent.")
+
+    hydration = stats.get("hydration")
+    if hydration and (hydration["labels"].get("low", 0) >= 2 or _average(stats, "hydration") < 2):
+        msg.append("Hydration levels were low on several days.")
+    else:
+        msg.append("You maintained good hydration habits.")
+
+    fitness = _average(stats, "fitness")
+    if fitness is not None and fitness < 30:
+        msg.append("Physical activity needs improvement.")
+    else:
+        msg.append("Your fitness activity was good this week.")
+
+    stress = stats.get("stress")
+    if stress and stress["labels"].get("high", 0) > 2:
+        msg.append("Stress levels were frequently high.")
+
+    mood = stats.get("mood")
+    if mood and mood["labels"]:
+        common_mood = max(mood["labels"], key=mood["labels"].get)
+        msg.append(f"Most frequent mood was {common_mood}.")
+
+    return " ".join(msg)
+
+
+def generate_monthly_summary(stats):
+    if not stats:
+        return "No sufficient data available for this month."
+
+    msg = []
+
+    sleep = _average(stats, "sleep")
+    if sleep is not None and sleep >= 7:
+        msg.append("Sleep consistency improved over the month.")
+    else:
+        msg.append("Sleep routine needs improvement.")
+
+    hydration = _average(stats, "hydration")
+    if hydration is not None and hydration >= 2.5:
+        msg.append("Hydration habits were well maintained.")
+    else:
+        msg.append("Hydration was inconsistent.")
+
+    fitness = _average(stats, "fitness")
+    if fitness is not None and fitness >= 30:
+        msg.append("Physical activity level was satisfactory.")
+    else:
+        msg.append("Physical activity was below recommended levels.")
+
+    msg.append("Overall health trends show gradual progress.")
+
+    return " ".join(msg)
+
+
+SUMMARIES = {"weekly": generate_weekly_summary, "monthly": generate_monthly_summary}
+
+
+# ---------------- Digest Periods ----------------
+def digest_period(period, today=None):
+    """(key, first day, last day) of the last complete week / month."""
+    today = today or date.today()
+    if period == "weekly":
+        end = today - timedelta(days=today.weekday() + 1)  # last Sunday
+        start = end - timedelta(days=6)
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}", start, end
+    if period == "monthly":
+        end = today.replace(day=1) - timedelta(days=1)
+        start = end.replace(day=1)
+        return start.strftime("%Y-%m"), start, end
+    raise ValueError(f"Unknown digest period: {period}")
+
+
+def render_digest(user, stats, period, period_key):
+    summary = SUMMARIES[period](stats)
+    body = (
+        f"Hello {user['name']},\n\n"
+        f"{summary}\n\n"
+        f"Log in to SmartHealthPlus to see your full report.\n"
+    )
+    return {
+        "key": f"digest:{period}:{period_key}:u{user['id']}",
+        "channel": "email",
+        "to": user["email"],
+        "subject": DIGEST_SUBJECTS[period],
+        "message": body,
+        "user_id": user["id"],
+        "priority": PRIORITY_BULK,
+    }
+
+
+def _render_page(users, stats, period, period_key):
+    # Nothing logged in the period, nothing to summarize
+    return [render_digest(u, stats[u["id"]], period, period_key) for u in users if stats.get(u["id"])]
+
+
+def _fetch_page(after_id, start, end, page_size):
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, name, email FROM users
+            WHERE id > ? AND role != 'admin' AND is_active = 1
+              AND email IS NOT NULL AND email != ''
+            ORDER BY id
+            LIMIT ?
+        """, (after_id, page_size))
+        users = [dict(row) for row in cursor.fetchall()]
+        stats = fetch_rollups(cursor, [u["id"] for u in users], start, end)
+    finally:
+        conn.close()
+    return users, stats
+
+
+def _commit_page(checkpoint, last_id, messages):
+    """Outbox rows for a page and the checkpoint past it, in one transaction."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        queued = enqueue(cursor, messages)
+        set_checkpoint(checkpoint, last_id, cursor=cursor)
+        conn.commit()
+    finally:
+        conn.close()
+    return queued
+
+
+# ---------------- Digest Run ----------------
+def run_digests(period, today=None, page_size=DIGEST_PAGE_SIZE, workers=DIGEST_WORKERS,
+                window_seconds=DIGEST_WINDOW_SECONDS):
+    """
+    Build one digest email per user for the last complete week / month and
+    put them in the outbox (bulk priority, delivered over pooled SMTP).
+
+    Users are paged by id. Pages render on a thread pool while the next
+    page is read; each page's outbox rows and the checkpoint are committed
+    together, so a crash or a closed window resumes after the last
+    committed user. Idempotency keys make a repeated page harmless.
+    """
+    ensure_daily_rollups()
+
+    period_key, start, end = digest_period(period, today)
+    checkpoint = f"digest:{period}:{period_key}"
+    progress = get_checkpoint(checkpoint, "0")
+    if progress == "done":
+        return {"period": period_key, "users": 0, "queued": 0, "finished": True}
+
+    started = time.monotonic()
+    deadline = started + window_seconds
+    after_id = int(progress)
+    users_done = queued = 0
+    finished = False
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"digest-{period}") as pool:
+        in_flight = []  # (last user id, user count, future), in page order
+        while True:
+            users, stats = _fetch_page(after_id, start, end, page_size)
+            if users:
+                after_id = users[-1]["id"]
+                in_flight.append((after_id, len(users),
+                                  pool.submit(_render_page, users, stats, period, period_key)))
+            else:
+                finished = True
+
+            # Commit pages in order; keep at most `workers` rendering ahead.
+            # Once out of users or time, drain everything.
+            stopping = finished or time.monotonic() > deadline
+            while in_flight and (stopping or len(in_flight) >= workers or in_flight[0][2].done()):
+                last_id, count, future = in_flight.pop(0)
+                queued += _commit_page(checkpoint, last_id, future.result())
+                users_done += count
+
+            if stopping:
+                break
+
+    if finished:
+        set_checkpoint(checkpoint, "done")
+
+    result = {
+        "period": period_key,
+        "users": users_done,
+        "queued": queued,
+        "finished": finished,
+        "elapsed_seconds": round(time.monotonic() - started, 2),
+    }
+    print(f"📨 {period.capitalize()} digests:", result)
+    return result
+
+
+def send_weekly_digests():
+    return run_digests("weekly")
+
+
+def send_monthly_digests():
+    return run_digests("monthly")
+
+
+def resume_digests(today=None):
+    """
+    Finish runs that hit their window. The last complete week / month is
+    the same period until the next one starts, so a started checkpoint that
+    isn't "done" yet is picked up where it stopped. The day a period's own
+    job runs is left to that job.
+    """
+    today = today or date.today()
+    first_day = {"weekly": today.weekday() == 0, "monthly": today.day == 1}
+    results = {}
+    for period in ("weekly", "monthly"):
+        if first_day[period]:
+            continue
+        period_key, _, _ = digest_period(period, today)
+        if get_checkpoint(f"digest:{period}:{period_key}") not in (None, "done"):
+            results[period] = run_digests(period, today)
+    return results
+
+
+def schedule_digest_jobs(scheduler):
+    # Shortly after midnight (server time) on the first day after the period
+    scheduler.add_job(send_weekly_digests, trigger="cron", day_of_week="mon", hour=1,
+                      id="weekly_digest", replace_existing=True)
+    scheduler.add_job(send_monthly_digests, trigger="cron", day=1, hour=1, minute=30,
+                      id="monthly_digest", replace_existing=True)
+    scheduler.add_job(resume_digests, trigger="cron", hour=1, minute=15,
+                      id="resume_digests", replace_existing=True)
@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# ---------------- Token Bucket ----------------
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, bursts up to `capacity`.
+    acquire() blocks until a token is available, so a sender can never go
+    faster than the provider allows.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        # A zero rate would divide by zero in acquire(); a bucket smaller
+        # than one token would never hand one out
+        if not self.rate > 0:
+            raise ValueError(f"TokenBucket rate must be positive, got {rate!r}")
+        if not self.capacity >= 1:
+            raise ValueError(f"TokenBucket capacity must be at least 1, got {capacity!r}")
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+# ---------------- Provider Limits ----------------
+# Shared by every dispatch in this process (minute tick + daily run), so
+# together they stay under each provider's limit. Twilio long codes allow
+# ~1 SMS/s; Gmail SMTP tolerates a few messages per second.
+PROVIDER_LIMITS = {
+    "sms": TokenBucket(float(os.getenv("TWILIO_RATE_PER_SEC", "1")),
+                       capacity=float(os.getenv("TWILIO_BURST", "1"))),
+    "email": TokenBucket(float(os.getenv("SMTP_RATE_PER_SEC", "5")),
+                         capacity=float(os.getenv("SMTP_BURST", "5"))),
+}
+
+# Threads per channel. Each channel gets its own pool so SMS waiting on
+# its bucket never holds up email (and vice versa).
+PROVIDER_WORKERS = {
+    "sms": int(os.getenv("TWILIO_WORKERS", "4")),
+    "email": int(os.getenv("SMTP_WORKERS", "4")),
+}
+
+
+# ---------------- Dispatcher ----------------
+class NotificationDispatcher:
+    """
+    Fans a batch of messages out over per-channel thread pools, rate
+    limited per provider, and records one outcome per message.
+
+    A message is a dict: {"channel", "to", "message", optional "subject", "key"}.
+    `senders` maps channel -> callable(message_dict) returning True/False.
+    """
+
+    def __init__(self, senders, limits=None, workers=None, name="dispatch"):
+        self.senders = senders
+        self.limits = PROVIDER_LIMITS if limits is None else limits
+        self.workers = PROVIDER_WORKERS if workers is None else workers
+        self.name = name
+
+        self._lock = threading.Lock()
+        self.outcomes = []
+        self._progress = {"total": 0, "done": 0, "ok": 0, "failed": 0}
+        self._started_at = None
+        self._finished_at = None
+
+    # ---------- progress ----------
+    def progress(self):
+        with self._lock:
+            p = dict(self._progress)
+            started, finished = self._started_at, self._finished_at
+        end = finished or time.monotonic()
+        elapsed = (end - started) if started else 0.0
+        p["name"] = self.name
+        p["running"] = started is not None and finished is None
+        p["elapsed_seconds"] = round(elapsed, 3)
+        p["per_second"] = round(p["done"] / elapsed, 1) if elapsed else 0.0
+        return p
+
+    def _record(self, msg, ok, error, started):
+        outcome = {
+            "key": msg.get("key"),
+            "channel": msg["channel"],
+            "to": msg["to"],
+            "ok": ok,
+            "error": error,
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+        }
+        with self._lock:
+            self.outcomes.append(outcome)
+            self._progress["done"] += 1
+            self._progress["ok" if ok else "failed"] += 1
+        return outcome
+
+    # ---------- sending ----------
+    def _send_one(self, msg):
+        started = time.monotonic()
+        bucket = self.limits.get(msg["channel"])
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            ok = bool(self.senders[msg["channel"]](msg))
+            return self._record(msg, ok, None if ok else "provider rejected", started)
+        except Exception as e:
+            return self._record(msg, False, str(e), started)
+
+    def run(self, messages):
+        messages = [m for m in messages if m["channel"] in self.senders]
+        with self._lock:
+            self._progress["total"] += len(messages)
+            if self._started_at is None:
+                self._started_at = time.monotonic()
+            self._finished_at = None
+
+        pools = {
+            channel: ThreadPoolExecutor(
+                max_workers=max(1, self.workers.get(channel, 1)),
+                thread_name_prefix=f"{self.name}-{channel}"
+            )
+            for channel in {m["channel"] for m in messages}
+        }
+        try:
+            futures = [pools[m["channel"]].submit(self._send_one, m) for m in messages]
+            for _ in as_completed(futures):
+                pass
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+            with self._lock:
+                self._finished_at = time.monotonic()
+
+        return self.progress()
+
+
+# ---------------- Last Run (for /admin/dispatch-status) ----------------
+_recent = {}
+_recent_lock = threading.Lock()
+
+
+def track(dispatcher):
+    with _recent_lock:
+        _recent[dispatcher.name] = dispatcher
+    return dispatcher
+
+
+def dispatch_status():
+    with _recent_lock:
+        dispatchers = list(_recent.values())
+    status = {}
+    for d in dispatchers:
+        p = d.progress()
+        with d._lock:
+            p["recent_failures"] = [o for o in d.outcomes if not o["ok"]][-20:]
+        status[d.name] = p
+    return status
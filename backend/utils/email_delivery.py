@@ -0,0 +1,297 @@
+import os
+import queue
+import smtplib
+import socket
+import ssl
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from email.message import EmailMessage
+
+
+# ---------------- SMTP Settings ----------------
+def _env_flag(name, default):
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def smtp_settings_from_env():
+    """
+    Defaults match the old hard-coded Gmail setup. Point SMTP_HOST/SMTP_PORT
+    at a local sink (SMTP_USE_SSL=0) to test delivery without sending mail.
+    """
+    return {
+        "host": os.getenv("SMTP_HOST", "smtp.gmail.com"),
+        "port": int(os.getenv("SMTP_PORT", "465")),
+        "use_ssl": _env_flag("SMTP_USE_SSL", "1"),
+        "username": os.getenv("EMAIL_ADDRESS"),
+        "password": os.getenv("EMAIL_PASSWORD"),
+        "size": int(os.getenv("SMTP_POOL_SIZE", "3")),
+        "timeout": float(os.getenv("SMTP_TIMEOUT", "20")),
+    }
+
+
+# Errors worth another attempt on a fresh connection. Not OSError as a
+# whole: certificate failures, bad host names and the like fail the same
+# way every time.
+TRANSIENT_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    smtplib.SMTPHeloError,
+    socket.timeout,
+    ConnectionError,
+    ssl.SSLEOFError,
+)
+
+
+def _is_transient(error):
+    # 4xx replies are temporary by definition (greylisting, rate limits)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+# ---------------- Connection Pool ----------------
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` logged-in SMTP sessions open so each message
+    costs one MAIL/RCPT/DATA exchange instead of a TCP + TLS handshake
+    and a LOGIN.
+    """
+
+    IDLE_CHECK_SECONDS = 30
+
+    def __init__(self, host, port, username=None, password=None,
+                 use_ssl=True, size=3, timeout=20):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.size = size
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _open(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        with self._lock:
+            self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _checkout(self):
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    server, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+
+                if time.monotonic() - last_used < self.IDLE_CHECK_SECONDS:
+                    return server
+                # Servers drop idle sessions; probe before reusing an old one
+                try:
+                    if server.noop()[0] == 250:
+                        return server
+                except Exception:
+                    pass
+                self._close(server)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _checkin(self, server, broken=False):
+        if broken:
+            self._close(server)
+        else:
+            self._idle.put((server, time.monotonic()))
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        server = self._checkout()
+        broken = False
+        try:
+            yield server
+        except BaseException as e:
+            broken = not isinstance(e, smtplib.SMTPRecipientsRefused)
+            raise
+        finally:
+            self._checkin(server, broken=broken)
+
+    def close_all(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(server)
+
+
+# ---------------- Delivery Worker ----------------
+class EmailDeliveryWorker:
+    """
+    Background threads that drain a queue of messages over pooled
+    connections, retrying transient failures with exponential backoff.
+
+    submit() returns a Future that resolves to True/False;
+    send() is the blocking equivalent used by send_email().
+    """
+
+    def __init__(self, pool, sender, workers=None, max_retries=3, backoff=1.0):
+        self.pool = pool
+        self.sender = sender
+        self.workers = workers or pool.size
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started = False
+        self.reset_stats()
+
+    # ---------- lifecycle ----------
+    def start(self):
+        with self._lock:
+            if self._started:
+                return self
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"email-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            self._started = True
+        return self
+
+    def stop(self, wait=True):
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+        self._threads = []
+        self._started = False
+        self.pool.close_all()
+
+    def join(self):
+        """Block until every queued message has been attempted."""
+        self._queue.join()
+
+    # ---------- public API ----------
+    def build_message(self, to_email, subject, body):
+        msg = EmailMessage()
+        msg["From"] = self.sender
+        msg["To"] = to_email
+        msg["Subject"] = subject
+        msg.set_content(body)
+        return msg
+
+    def submit(self, to_email, subject, body):
+        self.start()
+        with self._lock:
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+        future = Future()
+        self._queue.put((self.build_message(to_email, subject, body), future))
+        return future
+
+    def send(self, to_email, subject, body):
+        return self.submit(to_email, subject, body).result()
+
+    # ---------- stats ----------
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"sent": 0, "failed": 0, "retries": 0}
+            self._first_at = None
+            self._last_at = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            elapsed = (self._last_at - self._first_at) if self._last_at else 0.0
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["per_second"] = round(stats["sent"] / elapsed, 1) if elapsed else float(stats["sent"])
+        stats["connections_opened"] = self.pool.connections_opened
+        return stats
+
+    def _record(self, key, n=1):
+        with self._lock:
+            self._last_at = time.monotonic()
+            self._stats[key] += n
+
+    # ---------- worker loop ----------
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            msg, future = item
+            try:
+                ok = self._deliver(msg)
+                future.set_result(ok)
+            except Exception as e:  # never let one message kill the worker
+                future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, msg):
+        attempt = 0
+        while True:
+            try:
+                with self.pool.connection() as server:
+                    server.send_message(msg)
+                self._record("sent")
+                print(f"✅ Email sent to {msg['To']}")
+                return True
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_transient(e):
+                    self._record("failed")
+                    print("❌ Email error:", e)
+                    return False
+                self._record("retries")
+                time.sleep(self.backoff * (2 ** attempt))
+                attempt += 1
+
+
+# ---------------- Shared Worker ----------------
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_email_worker():
+    """Process-wide worker, created on first use from the SMTP_* env settings."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                settings = smtp_settings_from_env()
+                pool = SMTPConnectionPool(
+                    settings["host"], settings["port"],
+                    username=settings["username"], password=settings["password"],
+                    use_ssl=settings["use_ssl"], size=settings["size"],
+                    timeout=settings["timeout"]
+                )
+                _worker = EmailDeliveryWorker(pool, sender=settings["username"])
+    return _worker
@@ -0,0 +1,399 @@
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+from database import get_db_connection
+from utils.health_score import ENGINE, days_from_rows
+
+
+# ---------------- Focus Model ----------------
+# An on-box model that predicts, from a user's latest snapshot, how each
+# health module (sleep, hydration, ...) is likely to score on their next
+# logged day. The recommendation leads with the modules predicted to fall
+# furthest short of target - personalised by the user's own history - in
+# well under a millisecond, instead of a 15-30 s round trip to the chat API.
+#
+# Training is offline (`python -m utils.focus_model train`): every pair of
+# consecutive logged days in health_data is one example, features from the
+# first day's snapshot, targets the module fractions the next day actually
+# reached. One ridge regression per module, solved in closed form with
+# NumPy; the weights are a small .npz that each worker loads once.
+#
+#   features per module: today's fraction (history mean if not logged),
+#                        not-logged flag, mean fraction over the history
+#                        window; plus a bias
+
+FOCUS_MODEL_PATH = os.getenv(
+    "FOCUS_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "focus_model.npz")
+)
+FOCUS_CHECK_SECONDS = float(os.getenv("FOCUS_CHECK_SECONDS", "60"))
+FOCUS_HISTORY_DAYS = int(os.getenv("FOCUS_HISTORY_DAYS", "14"))
+# Next logged day must be within this many days to count as an outcome
+FOCUS_MAX_GAP_DAYS = int(os.getenv("FOCUS_MAX_GAP_DAYS", "3"))
+FOCUS_RIDGE = float(os.getenv("FOCUS_RIDGE", "1.0"))
+FOCUS_TOP = int(os.getenv("FOCUS_TOP", "2"))
+# Only modules predicted at least this far below target are worth leading with
+FOCUS_MIN_SHORTFALL = float(os.getenv("FOCUS_MIN_SHORTFALL", "0.25"))
+FOCUS_PAGE_SIZE = int(os.getenv("FOCUS_PAGE_SIZE", "500"))
+
+MODULES = [m.name for m in ENGINE.modules]
+FEATURES = [f"{m}_{kind}" for m in MODULES for kind in ("today", "missing", "history")] + ["bias"]
+# Prior for a module the user has never logged
+UNKNOWN_FRACTION = 0.5
+
+
+# ---------------- Features ----------------
+def _fractions(day):
+    return {m.name: m.fraction(day.get(m.name)) for m in ENGINE.modules}
+
+
+def _vector(latest, history):
+    """Feature vector from {module: fraction|None} snapshot and history means."""
+    row = []
+    for m in MODULES:
+        hist = history.get(m)
+        today = latest.get(m)
+        prior = hist if hist is not None else UNKNOWN_FRACTION
+        row += [prior if today is None else today, 1.0 if today is None else 0.0, prior]
+    row.append(1.0)
+    return row
+
+
+def snapshots(days, history_days=FOCUS_HISTORY_DAYS):
+    """
+    Yield (day, fractions logged that day, feature vector) for every logged
+    day, oldest first. `days` is days_from_rows() output. The snapshot
+    carries each module's latest value forward, like the recommendation
+    page does.
+    """
+    latest = {}
+    window = []  # (date, fractions) inside the history window
+    for day in sorted(days):
+        today = _fractions(days[day])
+        for m, f in today.items():
+            if f is not None:
+                latest[m] = f
+        current = date.fromisoformat(day)
+        window.append((current, today))
+        cutoff = current - timedelta(days=history_days)
+        window = [(d, f) for d, f in window if d > cutoff]
+        history = {}
+        for m in MODULES:
+            values = [f[m] for _, f in window if f[m] is not None]
+            if values:
+                history[m] = sum(values) / len(values)
+        yield day, today, _vector(latest, history)
+
+
+def user_features(rows):
+    """Feature vector for a user's current snapshot from health_data rows (newest first)."""
+    last = None
+    for last in snapshots(days_from_rows(rows)):
+        pass
+    return None if last is None else last[2]
+
+
+# ---------------- Model ----------------
+class FocusModel:
+    """Per-module ridge weights; predict() takes a (users x features) matrix."""
+
+    def __init__(self, weights, version, metrics=None):
+        self.weights = np.asarray(weights, dtype=float)   # (features x modules)
+        self.version = version
+        self.metrics = metrics or {}
+        if self.weights.shape != (len(FEATURES), len(MODULES)):
+            raise ValueError(f"focus model has shape {self.weights.shape}, expected "
+                             f"{(len(FEATURES), len(MODULES))}")
+
+    def predict(self, features):
+        """Predicted next-day fraction per module, clipped to 0..1."""
+        return np.clip(np.asarray(features, dtype=float) @ self.weights, 0.0, 1.0)
+
+    def focus(self, features, top=FOCUS_TOP):
+        """
+        Focus areas for each row of `features`: [[{"module", "predicted",
+        "current"}, ...], ...], biggest weighted shortfall first, among
+        the modules the user logs.
+        """
+        features = np.asarray(features, dtype=float)
+        predicted = self.predict(features)
+        weights = np.array([ENGINE.module(m).weight for m in MODULES])
+        # Modules the user has never logged are left to the "add data" tips
+        logged = features[:, 1:3 * len(MODULES):3] == 0.0
+        shortfall = np.where(logged, (1.0 - predicted) * weights, -1.0)
+        today = features[:, 0:3 * len(MODULES):3]
+        order = np.argsort(-shortfall, axis=1, kind="stable")[:, :top]
+        results = []
+        for u, ranked in enumerate(order):
+            results.append([
+                {
+                    "module": MODULES[k],
+                    "predicted": int(round(predicted[u, k] * 100)),
+                    "current": int(round(today[u, k] * 100)),
+                }
+                for k in ranked if shortfall[u, k] >= FOCUS_MIN_SHORTFALL * weights[k]
+            ])
+        return results
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, weights=self.weights, features=np.array(FEATURES), modules=np.array(MODULES),
+                 version=np.array(self.version), metrics=np.array(json.dumps(self.metrics)))
+        os.replace(tmp, path)  # workers never see a half-written file
+
+
+def load_model(path):
+    with np.load(path, allow_pickle=False) as data:
+        if list(data["features"]) != FEATURES or list(data["modules"]) != MODULES:
+            raise ValueError(f"{path} was trained for different features; retrain it")
+        return FocusModel(data["weights"], str(data["version"]), json.loads(str(data["metrics"])))
+
+
+# ---------------- Training ----------------
+def training_examples(page_size=FOCUS_PAGE_SIZE):
+    """
+    (user_ids, X, Y): one row per consecutive pair of logged days no more
+    than FOCUS_MAX_GAP_DAYS apart. Y holds the next day's module fractions,
+    NaN for modules not logged that day.
+    """
+    user_ids, xs, ys = [], [], []
+    after_id = 0
+    conn = get_db_connection()
+    try:
+        while True:
+            page = [row["id"] for row in conn.execute("""
+                SELECT id FROM users
+                WHERE id > ? AND role != 'admin'
+                ORDER BY id
+                LIMIT ?
+            """, (after_id, page_size))]
+            if not page:
+                break
+            after_id = page[-1]
+            rows = conn.execute(f"""
+                SELECT user_id, category, input_value, created_at
+                FROM health_data
+                WHERE user_id IN ({','.join('?' * len(page))})
+                ORDER BY user_id, created_at DESC
+            """, page).fetchall()
+            by_user = {}
+            for row in rows:
+                by_user.setdefault(row["user_id"], []).append(row)
+            for user_id, user_rows in by_user.items():
+                previous = None
+                for day, today, features in snapshots(days_from_rows(user_rows)):
+                    if previous and (date.fromisoformat(day) - date.fromisoformat(previous[0])).days <= FOCUS_MAX_GAP_DAYS:
+                        user_ids.append(user_id)
+                        xs.append(previous[1])
+                        ys.append([np.nan if today[m] is None else today[m] for m in MODULES])
+                    previous = (day, features)
+    finally:
+        conn.close()
+    return (np.array(user_ids, dtype=np.int64),
+            np.array(xs, dtype=float).reshape(-1, len(FEATURES)),
+            np.array(ys, dtype=float).reshape(-1, len(MODULES)))
+
+
+def fit(X, Y, ridge=FOCUS_RIDGE):
+    """Closed-form ridge per module over the rows where it was logged."""
+    weights = np.zeros((X.shape[1], Y.shape[1]))
+    penalty = ridge * np.eye(X.shape[1])
+    penalty[-1, -1] = 0.0  # leave the bias unpenalised
+    for k in range(Y.shape[1]):
+        seen = ~np.isnan(Y[:, k])
+        if not seen.any():
+            # Never logged by anyone: predict the prior
+            weights[-1, k] = UNKNOWN_FRACTION
+            continue
+        Xk = X[seen]
+        weights[:, k] = np.linalg.solve(Xk.T @ Xk + penalty, Xk.T @ Y[seen, k])
+    return weights
+
+
+def _rmse(predicted, Y):
+    seen = ~np.isnan(Y)
+    if not seen.any():
+        return None
+    return round(float(np.sqrt(np.mean((predicted[seen] - Y[seen]) ** 2))), 4)
+
+
+def train(path=FOCUS_MODEL_PATH, holdout=0.2):
+    """
+    Fit on health_data and save to `path`. Users are split by id so the
+    holdout score is on people the model never saw; the baseline is
+    "tomorrow looks like today's snapshot".
+    """
+    started = time.monotonic()
+    user_ids, X, Y = training_examples()
+    if not len(X):
+        raise ValueError("no consecutive logged days in health_data to train on")
+
+    cut = np.quantile(np.unique(user_ids), 1 - holdout) if holdout else np.inf
+    test = user_ids > cut
+    metrics = {"examples": int(len(X)), "users": int(len(np.unique(user_ids)))}
+    if test.any() and (~test).any():
+        held_out = FocusModel(fit(X[~test], Y[~test]), "holdout")
+        metrics["holdout_rmse"] = _rmse(held_out.predict(X[test]), Y[test])
+        metrics["baseline_rmse"] = _rmse(X[test][:, 0:3 * len(MODULES):3], Y[test])
+
+    version = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    model = FocusModel(fit(X, Y), version, metrics)
+    model.save(path)
+    metrics["elapsed_seconds"] = round(time.monotonic() - started, 2)
+    print(f"✅ Focus model {version} saved to {path}:", metrics)
+    return model
+
+
+# ---------------- Serving ----------------
+_load_lock = threading.Lock()
+_state = {"model": None, "signature": None, "next_check": 0.0}
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def current_model():
+    """
+    The worker's model, or None if none has been trained. Loaded once and
+    re-read only when the file changes (checked every FOCUS_CHECK_SECONDS).
+    """
+    now = time.monotonic()
+    if now >= _state["next_check"] and _load_lock.acquire(blocking=_state["model"] is None):
+        try:
+            _state["next_check"] = now + FOCUS_CHECK_SECONDS
+            signature = _signature(FOCUS_MODEL_PATH)
+            if signature is not None and signature != _state["signature"]:
+                _state["signature"] = signature
+                try:
+                    _state["model"] = load_model(FOCUS_MODEL_PATH)
+                    print(f"✅ Focus model {_state['model'].version} loaded")
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"❌ Focus model {FOCUS_MODEL_PATH} rejected: {e}")
+        finally:
+            _load_lock.release()
+    return _state["model"]
+
+
+def invalidate_focus(cursor, user_id):
+    """
+    Drop a user's precomputed focus areas; save_health_data calls this in
+    the transaction that stores a new entry, so the next view predicts
+    from the latest snapshot. The caller commits.
+    """
+    cursor.execute("DELETE FROM user_focus WHERE user_id = ?", (user_id,))
+
+
+def user_focus(user_id, rows=None):
+    """
+    Focus areas for one user: the nightly precomputed list when it is from
+    the current model and no entry was saved since, otherwise predicted
+    live from `rows` (health_data, newest first, with created_at; read here
+    if not given).
+    """
+    model = current_model()
+    if model is None:
+        return []
+    conn = get_db_connection()
+    try:
+        cached = conn.execute("""
+            SELECT focus FROM user_focus
+            WHERE user_id = ? AND model_version = ? AND DATE(computed_at) = DATE('now', 'localtime')
+        """, (user_id, model.version)).fetchone()
+        if cached:
+            return json.loads(cached["focus"])
+        if rows is None:
+            rows = conn.execute("""
+                SELECT category, input_value, created_at FROM health_data
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+            """, (user_id,)).fetchall()
+    finally:
+        conn.close()
+    features = user_features(rows)
+    return model.focus([features])[0] if features is not None else []
+
+
+def precompute_focus(page_size=FOCUS_PAGE_SIZE):
+    """Nightly batch inference for every active user into user_focus."""
+    model = current_model()
+    if model is None:
+        return {"users": 0, "skipped": "no model"}
+
+    started = time.monotonic()
+    users = 0
+    after_id = 0
+    while True:
+        conn = get_db_connection()
+        try:
+            page = [row["id"] for row in conn.execute("""
+                SELECT id FROM users
+                WHERE id > ? AND role != 'admin' AND is_active = 1
+                ORDER BY id
+                LIMIT ?
+            """, (after_id, page_size))]
+            if not page:
+                break
+            after_id = page[-1]
+            rows = conn.execute(f"""
+                SELECT user_id, category, input_value, created_at
+                FROM health_data
+                WHERE user_id IN ({','.join('?' * len(page))})
+                ORDER BY user_id, created_at DESC
+            """, page).fetchall()
+        finally:
+            conn.close()
+
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(row["user_id"], []).append(row)
+        ids, features = [], []
+        for user_id, user_rows in by_user.items():
+            vector = user_features(user_rows)
+            if vector is not None:
+                ids.append(user_id)
+                features.append(vector)
+        if not ids:
+            continue
+
+        computed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn = get_db_connection()
+        try:
+            conn.executemany("""
+                INSERT INTO user_focus (user_id, focus, model_version, computed_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    focus = excluded.focus,
+                    model_version = excluded.model_version,
+                    computed_at = excluded.computed_at
+            """, [(uid, json.dumps(f), model.version, computed_at)
+                  for uid, f in zip(ids, model.focus(features))])
+            conn.commit()
+        finally:
+            conn.close()
+        users += len(ids)
+
+    result = {"users": users, "model": model.version, "elapsed_seconds": round(time.monotonic() - started, 2)}
+    print("🧠 Focus areas:", result)
+    return result
+
+
+def schedule_focus_jobs(scheduler):
+    scheduler.add_job(precompute_focus, trigger="cron", hour=2, minute=45,
+                      id="nightly_focus", replace_existing=True)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["train"]:
+        print("usage: python -m utils.focus_model train [model.npz]")
+        sys.exit(2)
+    train(sys.argv[2] if len(sys.argv) > 2 else FOCUS_MODEL_PATH)
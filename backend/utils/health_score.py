@@ -1,15 +1,342 @@
 # utils/health_score.py
-from database import get_db_connection
+from bisect import bisect_left, bisect_right
 import json
+from database import get_db_connection
+
+
+# ---------------- Health Score Spec ----------------
+# The one definition of the health score. Every module is worth `weight`;
+# its features map the stored value to a fraction (0..1) through bisect
+# bands (numbers) or a lookup table (labels), and `combine` merges them.
+# A feature missing from a stored record is scored with its missing band /
+# default label (as `value.get(field, "")` did). The total is the weighted
+# share out of 100.
+#
+# bands:  cuts + points, len(points) == len(cuts) + 1.
+#         closed "left": value >= cut moves up a band (bisect_right)
+#         closed "right": value <= cut stays below it (bisect_left)
+# labels: lower-cased value -> fraction, anything else -> default
+# tips:   [fraction, text] pairs, first pair with fraction <= score wins
+
+HEALTH_SCORE_SPEC = {
+    "modules": {
+        "sleep": {
+            "weight": 1,
+            "combine": "min",
+            "features": {
+                # 7-8 whole hours is ideal (8.9 still counts as 8)
+                "hours": {"type": "bands", "cuts": [6, 7, 9], "points": [0, 0.6, 1, 0.6]},
+                "quality": {"type": "labels", "map": {"good": 1}, "default": 0.6},
+            },
+            "tips": [[1, None], [0.6, "Increase sleep duration."], [0, "Sleep is too low."]],
+            "missing_tip": "Add sleep data.",
+        },
+        "hydration": {
+            "weight": 1,
+            "combine": "min",
+            "features": {
+                "level": {"type": "labels", "map": {"high": 1, "moderate": 0.6}, "default": 0},
+            },
+            "tips": [[1, None], [0.6, "Drink more water."], [0, "Very low hydration."]],
+            "missing_tip": "Add hydration data.",
+        },
+        "nutrition": {
+            "weight": 1,
+            "combine": "min",
+            "features": {
+                "quality": {"type": "labels", "map": {"good": 1}, "default": 0.4},
+            },
+            "tips": [[1, None], [0, "Improve nutrition quality."]],
+            "missing_tip": "Add nutrition data.",
+        },
+        "fitness": {
+            "weight": 1,
+            # Full marks need every target; any one "fair" target gives 0.6
+            "combine": "all_or_partial",
+            "partial": 0.6,
+            "features": {
+                "minutes": {"type": "bands", "cuts": [15, 30], "points": [0, 0.6, 1]},
+                "steps": {"type": "bands", "cuts": [4000, 6000], "points": [0, 0.6, 1]},
+            },
+            "tips": [[1, None], [0.6, "Increase activity."], [0, "Very low physical activity."]],
+            "missing_tip": "Add fitness data.",
+        },
+        "stress": {
+            "weight": 1,
+            "combine": "min",
+            "features": {
+                "level": {"type": "labels", "map": {"low": 1, "medium": 0.6}, "default": 0},
+            },
+            "tips": [[1, None], [0.6, "Manage stress better."], [0, "High stress detected."]],
+            "missing_tip": "Add stress data.",
+        },
+        "mood": {
+            "weight": 1,
+            "combine": "min",
+            "features": {
+                "mood": {"type": "labels", "map": {"happy": 1}, "default": 0.6},
+            },
+            "tips": [[1, None], [0, "Mood seems low."]],
+            "missing_tip": "Add mood data.",
+        },
+    },
+    "wellness": {
+        "cuts": [40, 70],
+        "labels": ["Needs Improvement", "Average", "Excellent"],
+    },
+}
+
+# The flat score of models/recommendation.py: one number per module (sleep
+# hours, glasses of water, fitness minutes, stress 0-10, mood text), each
+# worth 0 / 10 / 20 points, and its own wellness scale. Not the dashboard
+# score above: callers of calculate_health_score(user_data) rely on these
+# numbers and labels.
+FLAT_SCORE_SPEC = {
+    "modules": {
+        "sleep": {"features": {"hours": {"type": "bands", "cuts": [5, 7], "points": [0, 0.5, 1]}}},
+        "hydration": {"features": {"glasses": {"type": "bands", "cuts": [2, 3], "points": [0, 0.5, 1]}}},
+        "fitness": {"features": {"minutes": {"type": "bands", "cuts": [15, 30], "points": [0, 0.5, 1]}}},
+        "stress": {"features": {
+            # Lower is better
+            "score": {"type": "bands", "cuts": [3, 6], "points": [1, 0.5, 0], "closed": "right"},
+        }},
+        "mood": {"features": {"mood": {
+            "type": "labels",
+            "map": {"happy": 1, "positive": 1, "good": 1, "neutral": 0.5, "okay": 0.5},
+            "default": 0,
+        }}},
+    },
+    "wellness": {
+        "cuts": [40, 60, 80],
+        "labels": ["Poor 😟", "Fair 😐", "Good 🙂", "Excellent 🌟"],
+    },
+}
+
+
+# ---------------- Compiled Features ----------------
+class BandFeature:
+    def __init__(self, spec):
+        self.cuts = [float(c) for c in spec["cuts"]]
+        self.points = [float(p) for p in spec["points"]]
+        if len(self.points) != len(self.cuts) + 1 or self.cuts != sorted(self.cuts):
+            raise ValueError("bands need sorted cuts and one more point than cuts")
+        self.closed = spec.get("closed", "left")
+        self.missing = float(spec.get("missing", 0))
+        self._bisect = bisect_right if self.closed == "left" else bisect_left
+
+    def fraction(self, value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            value = self.missing
+        return self.points[self._bisect(self.cuts, value)]
+
+
+class LabelFeature:
+    def __init__(self, spec):
+        self.map = {str(k).lower(): float(v) for k, v in spec["map"].items()}
+        self.default = float(spec.get("default", 0))
+        # Stable code per label for vectorized scoring: index into `labels`,
+        # len(labels) for "anything else"
+        self.labels = list(self.map)
+        self.points = [self.map[label] for label in self.labels] + [self.default]
+
+    def fraction(self, value):
+        return self.map.get(str(value or "").strip().lower(), self.default)
+
+    def code(self, value):
+        key = str(value or "").strip().lower()
+        return self.labels.index(key) if key in self.map else len(self.labels)
+
+
+FEATURE_TYPES = {"bands": BandFeature, "labels": LabelFeature}
+
+
+def _combine_min(values, spec):
+    return min(values)
+
+
+def _combine_max(values, spec):
+    return max(values)
+
+
+def _combine_mean(values, spec):
+    return sum(values) / len(values)
+
+
+def _combine_all_or_partial(values, spec):
+    low, high = min(values), max(values)
+    return low if low >= 1 else max(low, min(high, spec.get("partial", 0.5)))
+
+
+COMBINERS = {
+    "min": _combine_min,
+    "max": _combine_max,
+    "mean": _combine_mean,
+    "all_or_partial": _combine_all_or_partial,
+}
+
+
+class Module:
+    def __init__(self, name, spec):
+        self.name = name
+        self.weight = float(spec.get("weight", 1))
+        self.spec = spec
+        self.features = [(field, FEATURE_TYPES[f["type"]](f)) for field, f in spec["features"].items()]
+        self.combine = COMBINERS[spec.get("combine", "min")]
+        self.tips = sorted(((float(f), t) for f, t in spec.get("tips", [])), reverse=True)
+        self.missing_tip = spec.get("missing_tip")
+        self._tip_cache = {}
+        self._fraction = self._compile()
+
+    def _compile(self):
+        """Specialise fraction() for this module's features once."""
+        pairs = [(field, feature.fraction) for field, feature in self.features]
+        first_field, first_fn = pairs[0]
+        combine, spec = self.combine, self.spec
+
+        # A missing feature scores its missing / default value
+        if len(pairs) == 1:
+            def fraction(data):
+                return first_fn(data.get(first_field))
+        else:
+            def fraction(data):
+                return combine([fn(data.get(field)) for field, fn in pairs], spec)
+        return fraction
+
+    def feature(self, field):
+        for name, feature in self.features:
+            if name == field:
+                return feature
+        raise KeyError(f"{self.name} has no feature {field}")
+
+    def fraction(self, data):
+        """Fraction for one module's data dict, or None if it has no data."""
+        if not isinstance(data, dict) or not data:
+            return None
+        return self._fraction(data)
+
+    def tip(self, fraction):
+        try:
+            return self._tip_cache[fraction]
+        except KeyError:
+            pass
+        tip = self.missing_tip if fraction is None else None
+        if fraction is not None:
+            for threshold, text in self.tips:
+                if fraction >= threshold:
+                    tip = text
+                    break
+        self._tip_cache[fraction] = tip
+        return tip
+
+
+# ---------------- Engine ----------------
+class ScoreEngine:
+    """A compiled HEALTH_SCORE_SPEC. Build once, evaluate many days."""
+
+    def __init__(self, spec=HEALTH_SCORE_SPEC):
+        self.modules = [Module(name, m) for name, m in spec["modules"].items()]
+        self.total_weight = sum(m.weight for m in self.modules) or 1.0
+        self.wellness_cuts = [float(c) for c in spec["wellness"]["cuts"]]
+        self.wellness_labels = list(spec["wellness"]["labels"])
+        if len(self.wellness_labels) != len(self.wellness_cuts) + 1:
+            raise ValueError("wellness needs one more label than cuts")
+
+    def module(self, name):
+        for m in self.modules:
+            if m.name == name:
+                return m
+        raise KeyError(name)
+
+    def wellness(self, score):
+        return self.wellness_labels[bisect_right(self.wellness_cuts, score)]
+
+    def score(self, day):
+        """Just the 0-100 score (no tips), for bulk scoring."""
+        total = 0.0
+        for m in self.modules:
+            data = day.get(m.name)
+            if data and isinstance(data, dict):
+                total += m._fraction(data) * m.weight
+        return int(round(total / self.total_weight * 100))
+
+    def evaluate(self, day):
+        """
+        Score one day in a single pass over the modules.
+        `day` maps category -> value dict (as stored in health_data).
+        Returns {"score", "wellness", "tips", "modules": {name: fraction|None}}.
+        """
+        total = 0.0
+        tips = []
+        fractions = {}
+        for m in self.modules:
+            data = day.get(m.name)
+            fraction = m._fraction(data) if data and isinstance(data, dict) else None
+            fractions[m.name] = fraction
+            if fraction is not None:
+                total += fraction * m.weight
+            tip = m.tip(fraction)
+            if tip:
+                tips.append(tip)
+
+        score = int(round(total / self.total_weight * 100))
+        return {"score": score, "wellness": self.wellness(score), "tips": tips, "modules": fractions}
+
+
+ENGINE = ScoreEngine()
+FLAT_ENGINE = ScoreEngine(FLAT_SCORE_SPEC)
+
+
+def score_day(day):
+    return ENGINE.evaluate(day)
+
+
+def wellness_for(score):
+    return ENGINE.wellness(score)
+
+
+# ---------------- Loading Data ----------------
+def parse_value(raw):
+    if isinstance(raw, dict):
+        return raw
+    try:
+        value = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def latest_by_category(rows):
+    """First (newest) parsed value per category from rows ordered newest first."""
+    latest = {}
+    for row in rows:
+        category = (row["category"] or "").lower()
+        if category not in latest:
+            value = parse_value(row["input_value"])
+            if value is not None:
+                latest[category] = value
+    return latest
+
+
+def days_from_rows(rows):
+    """{"YYYY-MM-DD": latest-per-category day dict} from rows ordered newest first."""
+    by_day = {}
+    for row in rows:
+        by_day.setdefault(str(row["created_at"])[:10], []).append(row)
+    return {day: latest_by_category(day_rows) for day, day_rows in by_day.items()}
+
 
 def calculate_health_score(user_id):
+    """Today's (score, wellness, tips) for a user."""
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
 
     cursor.execute("""
         SELECT category, input_value
         FROM health_data
-        WHERE user_id = %s
+        WHERE user_id = ?
+        AND DATE(created_at) = DATE('now')
         ORDER BY created_at DESC
     """, (user_id,))
 
@@ -18,30 +345,7 @@ def calculate_health_score(user_id):
     conn.close()
 
     if not rows:
-        return 0, "No Data", "Please add your health data to generate score."
+        return 0, "No Data", "Please add today’s health data."
 
-    latest = {}
-    for row in rows:
-        if row["category"] not in latest:
-            try:
-                latest[row["category"]] = json.loads(row["input_value"])
-            except:
-                latest[row["category"]] = row["input_value"]
-
-    modules = ["sleep", "hydration", "nutrition", "fitness", "stress", "mood"]
-    filled_modules = sum(1 for m in modules if m in latest and latest[m] not in [None, "", {}])
-
-    score_per_module = 100 // len(modules)
-    score = filled_modules * score_per_module
-
-    if score < 40:
-        wellness = "Needs Improvement"
-        tip = "You have provided limited health data. Add more details to get accurate insights."
-    elif score < 70:
-        wellness = "Average"
-        tip = "Good start! Try completing all health modules for better wellness tracking."
-    else:
-        wellness = "Excellent"
-        tip = "Great work! Keep maintaining your healthy lifestyle."
-
-    return score, wellness, tip
+    result = score_day(latest_by_category(rows))
+    return result["score"], result["wellness"], " ".join(result["tips"])
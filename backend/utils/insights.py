@@ -0,0 +1,285 @@
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+from database import get_db_connection
+from utils.checkpoints import get_checkpoint, set_checkpoint
+from utils.digests import HYDRATION_SCORES, ensure_daily_rollups
+from utils.metric_stats import METRIC_SPEC
+
+
+# ---------------- Cross-Metric Insights ----------------
+# Nightly: for every user, correlate their daily series (sleep hours,
+# workout minutes, hydration, nutrition, stress, mood) over the last
+# INSIGHT_WINDOW_DAYS of daily_rollups, both same-day and with a one-day
+# lag ("after short sleep, next-day stress is higher"). A page of users
+# is one (users x days x series) array and every pair / lag is a handful
+# of einsums, so there is no Python loop per user or per pair.
+#
+# The ranked results are cached in user_insights as JSON; /recommendation
+# only reads that row. Wording comes from the rule pack ("insights").
+
+INSIGHT_WINDOW_DAYS = int(os.getenv("INSIGHT_WINDOW_DAYS", "90"))
+# The same links over the most recent days, to show whether they still hold
+INSIGHT_RECENT_DAYS = int(os.getenv("INSIGHT_RECENT_DAYS", "30"))
+INSIGHT_MIN_DAYS = int(os.getenv("INSIGHT_MIN_DAYS", "10"))    # overlapping days per pair
+INSIGHT_MIN_R = float(os.getenv("INSIGHT_MIN_R", "0.3"))
+# |t| of the correlation; 45 pairs / lags are tested per user, so a
+# plain t >= 2 would show every user a few coincidences
+INSIGHT_MIN_T = float(os.getenv("INSIGHT_MIN_T", "3.5"))
+INSIGHT_TOP = int(os.getenv("INSIGHT_TOP", "5"))
+INSIGHT_PAGE_SIZE = int(os.getenv("INSIGHT_PAGE_SIZE", "500"))
+
+# Daily series from daily_rollups: numeric categories use the day's mean
+# value, labelled ones the mean of their label scores
+SERIES = {
+    "sleep": {"name": "sleep"},
+    "fitness": {"name": "workout time"},
+    "hydration": {"name": "hydration", "labels": HYDRATION_SCORES},
+    "nutrition": {"name": "nutrition quality", "labels": {"poor": 1, "average": 2, "good": 3}},
+    "stress": {"name": "stress", "labels": METRIC_SPEC["stress"]["labels"]},
+    "mood": {"name": "mood", "labels": METRIC_SPEC["mood"]["labels"]},
+}
+SERIES_NAMES = list(SERIES)
+SERIES_INDEX = {name: i for i, name in enumerate(SERIES_NAMES)}
+
+
+# ---------------- Building Series ----------------
+def _series_query(n_users):
+    """
+    SQL that turns a page's daily_rollups into numeric rows
+    (user_id, day offset, series index, value total, entries), with the
+    label scores applied in SQLite instead of per row in Python.
+    """
+    index_case, index_params, score_case, score_params = [], [], [], []
+    for category, spec in SERIES.items():
+        index_case.append("WHEN ? THEN ?")
+        index_params += [category, SERIES_INDEX[category]]
+        if "labels" not in spec:
+            score_case.append("WHEN category = ? THEN value_sum")
+            score_params.append(category)
+        for label, score in spec.get("labels", {}).items():
+            score_case.append("WHEN category = ? AND label = ? THEN entries * ?")
+            score_params += [category, label, score]
+    sql = f"""
+        SELECT user_id, day_offset, k, total, entries FROM (
+            SELECT user_id,
+                   CAST(julianday(day) - julianday(?) AS INTEGER) AS day_offset,
+                   CASE category {' '.join(index_case)} END AS k,
+                   CASE {' '.join(score_case)} END AS total,
+                   entries
+            FROM daily_rollups
+            WHERE user_id IN ({','.join('?' * n_users)})
+              AND day BETWEEN ? AND ?
+        )
+        WHERE k IS NOT NULL AND total IS NOT NULL
+    """
+    return sql, index_params + score_params
+
+
+def build_series(user_ids, rows, days):
+    """
+    (users x days x series) float array, NaN where nothing was logged, from
+    _series_query rows. `user_ids` must be sorted (pages are, by id).
+    """
+    shape = (len(user_ids), days, len(SERIES_NAMES))
+    sums = np.zeros(shape)
+    counts = np.zeros(shape)
+    if rows:
+        data = np.array(rows, dtype=float)
+        idx = (
+            np.searchsorted(np.asarray(user_ids), data[:, 0].astype(np.int64)),
+            data[:, 1].astype(np.intp),
+            data[:, 2].astype(np.intp),
+        )
+        np.add.at(sums, idx, data[:, 3])
+        np.add.at(counts, idx, data[:, 4])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+# ---------------- Correlations ----------------
+def pairwise_correlations(a, b):
+    """
+    Pearson r between every series of `a` and every series of `b` per user,
+    over the days both are present. a, b: (users x days x series), NaN =
+    missing. Returns (r, n), each (users x series x series).
+    """
+    ma = ~np.isnan(a)
+    mb = ~np.isnan(b)
+    a0 = np.where(ma, a, 0.0)
+    b0 = np.where(mb, b, 0.0)
+    fa, fb = ma.astype(float), mb.astype(float)
+
+    n = np.einsum("udi,udj->uij", fa, fb)
+    sa = np.einsum("udi,udj->uij", a0, fb)
+    sb = np.einsum("udi,udj->uij", fa, b0)
+    saa = np.einsum("udi,udj->uij", a0 * a0, fb)
+    sbb = np.einsum("udi,udj->uij", fa, b0 * b0)
+    sab = np.einsum("udi,udj->uij", a0, b0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sab - sa * sb / n
+        var_a = saa - sa * sa / n
+        var_b = sbb - sb * sb / n
+        r = cov / np.sqrt(var_a * var_b)
+    # Constant series (var 0) and too few days carry no signal
+    r[~np.isfinite(r) | (var_a <= 1e-12) | (var_b <= 1e-12)] = np.nan
+    return np.clip(r, -1, 1), n
+
+
+def _lagged(x, lag):
+    """(a, b) so that b is `lag` days after a."""
+    return (x, x) if lag == 0 else (x[:, :-lag], x[:, lag:])
+
+
+def compute_insights(x, recent_days=INSIGHT_RECENT_DAYS, top=INSIGHT_TOP):
+    """
+    Ranked insights per user from a (users x days x series) array:
+    [[{"kind", "a", "b", "r", "n", "r_recent"}, ...], ...], strongest
+    (by t statistic) first.
+    """
+    users, days, k = x.shape
+    candidates = []  # (kind, r, n, r_recent, pair mask)
+    for kind, lag in (("same_day", 0), ("next_day", 1)):
+        r, n = pairwise_correlations(*_lagged(x, lag))
+        r_recent, _ = pairwise_correlations(*_lagged(x[:, max(0, days - recent_days):], lag))
+        # Same day is symmetric (upper triangle); next day keeps both
+        # directions but not a series against itself
+        pairs = np.triu(np.ones((k, k), bool), 1) if lag == 0 else ~np.eye(k, dtype=bool)
+        candidates.append((kind, r, n, r_recent, pairs))
+
+    results = [[] for _ in range(users)]
+    for kind, r, n, r_recent, pairs in candidates:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = r * np.sqrt((n - 2) / np.maximum(1 - r * r, 1e-12))
+        keep = (pairs[None] & (n >= INSIGHT_MIN_DAYS) & (np.abs(r) >= INSIGHT_MIN_R)
+                & (np.abs(t) >= INSIGHT_MIN_T))
+        for u, i, j in zip(*np.nonzero(keep)):
+            recent = r_recent[u, i, j]
+            results[u].append({
+                "kind": kind,
+                "a": SERIES_NAMES[i],
+                "b": SERIES_NAMES[j],
+                "r": round(float(r[u, i, j]), 2),
+                "n": int(n[u, i, j]),
+                "r_recent": None if np.isnan(recent) else round(float(recent), 2),
+                "t": abs(float(t[u, i, j])),
+            })
+
+    for insights in results:
+        insights.sort(key=lambda s: -s["t"])
+        del insights[top:]
+        for s in insights:
+            s.pop("t")
+    return results
+
+
+# ---------------- Nightly Run ----------------
+def _fetch_page(after_id, start, end, page_size):
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id FROM users
+            WHERE id > ? AND role != 'admin' AND is_active = 1
+            ORDER BY id
+            LIMIT ?
+        """, (after_id, page_size))
+        user_ids = [row["id"] for row in cursor.fetchall()]
+        rows = []
+        if user_ids:
+            sql, params = _series_query(len(user_ids))
+            conn.row_factory = None  # plain tuples, straight into NumPy
+            rows = conn.execute(sql, [start.isoformat(), *params, *user_ids,
+                                      start.isoformat(), end.isoformat()]).fetchall()
+    finally:
+        conn.close()
+    return user_ids, rows
+
+
+def _save_page(checkpoint, user_ids, results, window_days):
+    """Cached insights for a page and the checkpoint past it, in one transaction."""
+    computed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO user_insights (user_id, insights, window_days, computed_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                insights = excluded.insights,
+                window_days = excluded.window_days,
+                computed_at = excluded.computed_at
+        """, [(uid, json.dumps(res), window_days, computed_at) for uid, res in zip(user_ids, results)])
+        set_checkpoint(checkpoint, user_ids[-1], cursor=cursor)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_insights(today=None, window_days=INSIGHT_WINDOW_DAYS, page_size=INSIGHT_PAGE_SIZE):
+    """
+    Recompute every user's insights from the `window_days` before `today`.
+    Resumes from its checkpoint if the previous run for the same night
+    stopped part way.
+    """
+    ensure_daily_rollups()
+    today = today or date.today()
+    end = today - timedelta(days=1)
+    start = today - timedelta(days=window_days)
+    checkpoint = f"insights:{today.isoformat()}"
+    progress = get_checkpoint(checkpoint, "0")
+    if progress == "done":
+        return {"users": 0, "with_insights": 0, "finished": True}
+
+    started = time.monotonic()
+    after_id = int(progress)
+    users = with_insights = 0
+    while True:
+        user_ids, rows = _fetch_page(after_id, start, end, page_size)
+        if not user_ids:
+            break
+        results = compute_insights(build_series(user_ids, rows, window_days))
+        _save_page(checkpoint, user_ids, results, window_days)
+        users += len(user_ids)
+        with_insights += sum(1 for r in results if r)
+        after_id = user_ids[-1]
+
+    set_checkpoint(checkpoint, "done")
+    result = {
+        "users": users,
+        "with_insights": with_insights,
+        "finished": True,
+        "elapsed_seconds": round(time.monotonic() - started, 2),
+    }
+    print("🧠 Insights:", result)
+    return result
+
+
+def user_insights(user_id):
+    """The cached, ranked insights for one user ([] until the first run)."""
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT insights FROM user_insights WHERE user_id = ?", (user_id,)).fetchone()
+    finally:
+        conn.close()
+    return json.loads(row["insights"]) if row else []
+
+
+def describe(insight):
+    """Template context for one cached insight (see the rule pack's "insights")."""
+    return {
+        **insight,
+        "a": SERIES[insight["a"]]["name"],
+        "b": SERIES[insight["b"]]["name"],
+        "direction": "higher" if insight["r"] > 0 else "lower",
+        "r_recent": insight["r_recent"] if insight["r_recent"] is not None else float("nan"),
+    }
+
+
+def schedule_insight_jobs(scheduler):
+    # After the digests, when the previous day's rollups are complete
+    scheduler.add_job(run_insights, trigger="cron", hour=2, minute=30,
+                      id="nightly_insights", replace_existing=True)
@@ -0,0 +1,58 @@
+import signal
+import threading
+from utils.reminder_jobs import create_scheduler, schedule_reminder_jobs, drop_legacy_reminder_jobs
+from utils.digests import schedule_digest_jobs
+from utils.metric_stats import schedule_metric_jobs
+from utils.insights import schedule_insight_jobs
+from utils.cohort_sketches import schedule_sketch_jobs
+from utils.focus_model import schedule_focus_jobs
+from utils.bundles import schedule_bundle_jobs
+from utils.rate_limits import schedule_rate_limit_jobs
+
+
+# ---------------- Background Jobs ----------------
+# Jobs are kept in the SQLite job store so they survive restarts.
+# Reminders themselves are not jobs: one minute tick reads the due ones
+# straight from the reminders table.
+#
+# RUN_SCHEDULER=1 (default) starts the scheduler inside the web process,
+# which suits `python app.py` and single-worker deploys. With several
+# workers, set RUN_SCHEDULER=0 for them and run the jobs in one process of
+# their own:
+#
+#     cd backend
+#     python -m utils.jobs
+
+
+def start_scheduler(db_path):
+    """Create the scheduler, register every job and start it."""
+    drop_legacy_reminder_jobs()
+    scheduler = create_scheduler(db_path)
+    scheduler.start()
+    schedule_reminder_jobs(scheduler)
+    schedule_digest_jobs(scheduler)
+    schedule_metric_jobs(scheduler)
+    schedule_insight_jobs(scheduler)
+    schedule_sketch_jobs(scheduler)
+    schedule_focus_jobs(scheduler)
+    schedule_bundle_jobs(scheduler)
+    schedule_rate_limit_jobs(scheduler)
+
+    print("🟢 Scheduler started.")
+    return scheduler
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from database import DB_PATH
+    from init_db import upgrade_schema
+
+    load_dotenv()
+    upgrade_schema()
+    scheduler = start_scheduler(DB_PATH)
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    stop.wait()
+    scheduler.shutdown()
+    print("🔴 Scheduler stopped.")
@@ -0,0 +1,26 @@
+from utils.providers import get_provider
+
+
+# ---------------- Email Function (ONLY ONE) ----------------
+def send_email(to_email, subject, body):
+    """Send one email over the pooled SMTP connections and wait for the result."""
+    return get_provider("email").send(to_email, subject, body)
+
+
+def queue_email(to_email, subject, body):
+    """
+    Non-blocking send_email for bulk jobs: returns a Future that resolves
+    to True/False, or None if email is not configured.
+    """
+    return get_provider("email").submit(to_email, subject, body)
+
+
+def wait_for_emails(futures):
+    """Wait for queued emails; returns how many were delivered."""
+    return sum(1 for f in futures if f is not None and f.result())
+
+
+# ---------------- Twilio SMS Function ----------------
+def send_sms(to_phone, message):
+    """Send SMS through the shared Twilio client (created once per process)."""
+    return get_provider("sms").send(to_phone, message)
@@ -0,0 +1,299 @@
+import json
+import math
+import os
+from datetime import date, datetime, timedelta
+from database import get_db_connection
+from utils.checkpoints import get_checkpoint, set_checkpoint
+
+
+# ---------------- Streaming Metric Stats ----------------
+# One row per (user, metric) in user_metric_stats, updated in O(1) by
+# save-health-data in the same transaction as the raw insert: a running
+# mean / variance (Welford), an exponential moving average and a streak
+# counter of consecutive days that tripped the metric's alert.
+#
+# Stats are per day, not per save: the latest value of the current day is
+# kept as `pending_value` and folded into the running stats once a later
+# day arrives, so re-saving sleep three times on Monday counts Monday once.
+# Anomalies compare the pending day against the folded history, so nothing
+# ever re-reads health_data.
+
+METRIC_EMA_ALPHA = float(os.getenv("METRIC_EMA_ALPHA", "0.3"))
+# |value - mean| / std at which a day is "unusual", once there's history
+METRIC_Z_THRESHOLD = float(os.getenv("METRIC_Z_THRESHOLD", "2.5"))
+METRIC_MIN_DAYS = int(os.getenv("METRIC_MIN_DAYS", "7"))
+
+# alert: "below" / "at_least" / "at_most" a threshold; `streak_days` in a
+# row raises a streak anomaly. `valid` drops impossible / placeholder values
+# (save-health-data stores 0 hours when sleep hours were left empty).
+METRIC_SPEC = {
+    "sleep_hours": {
+        "category": "sleep", "field": "hours", "label": "Sleep", "unit": "h",
+        "valid": [0.5, 24], "alert": {"below": 6}, "streak_days": 3,
+    },
+    "steps": {
+        "category": "fitness", "field": "steps", "label": "Steps", "unit": " steps",
+        "valid": [0, 200000], "alert": {"below": 4000}, "streak_days": 3,
+    },
+    "minutes": {
+        "category": "fitness", "field": "minutes", "label": "Workout", "unit": " min",
+        "valid": [0, 1440], "alert": {"below": 15}, "streak_days": 3,
+    },
+    "stress": {
+        "category": "stress", "field": "level", "label": "Stress",
+        "labels": {"low": 1, "medium": 2, "high": 3},
+        "alert": {"at_least": 3}, "streak_days": 3,
+    },
+    "mood": {
+        "category": "mood", "field": "mood", "label": "Mood",
+        "labels": {"happy": 3, "neutral": 2, "sad": 1, "angry": 1},
+        "alert": {"at_most": 1}, "streak_days": 3,
+    },
+}
+
+METRICS_BY_CATEGORY = {}
+for _name, _spec in METRIC_SPEC.items():
+    METRICS_BY_CATEGORY.setdefault(_spec["category"], []).append(_name)
+
+
+def _alerting(spec, value):
+    alert = spec["alert"]
+    if "below" in alert:
+        return value < alert["below"]
+    if "at_least" in alert:
+        return value >= alert["at_least"]
+    return value <= alert["at_most"]
+
+
+def _threshold(spec):
+    return next(iter(spec["alert"].values()))
+
+
+def metric_value(metric, value):
+    """The numeric value of one metric in a normalized value dict, or None."""
+    spec = METRIC_SPEC[metric]
+    raw = value.get(spec["field"])
+    if "labels" in spec:
+        return spec["labels"].get(str(raw or "").strip().lower())
+    try:
+        number = float(raw)
+    except (TypeError, ValueError):
+        return None
+    low, high = spec["valid"]
+    return number if low <= number <= high and not math.isnan(number) else None
+
+
+def metric_values(category, value):
+    """[(metric, number)] fed by one health_data row."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    if not isinstance(value, dict):
+        return []
+    out = []
+    for metric in METRICS_BY_CATEGORY.get((category or "").lower(), ()):
+        number = metric_value(metric, value)
+        if number is not None:
+            out.append((metric, number))
+    return out
+
+
+# ---------------- Running State ----------------
+EMPTY_STATE = {
+    "n": 0, "mean": 0.0, "m2": 0.0, "ema": None,
+    "last_day": None, "streak": 0,
+    "pending_day": None, "pending_value": None,
+}
+
+STATE_COLUMNS = list(EMPTY_STATE)
+
+
+def _fold(metric, state, day, value):
+    """Add one finished day to the running stats."""
+    n = state["n"] + 1
+    delta = value - state["mean"]
+    mean = state["mean"] + delta / n
+    state["m2"] += delta * (value - mean)
+    state["n"], state["mean"] = n, mean
+    state["ema"] = value if state["ema"] is None else (
+        METRIC_EMA_ALPHA * value + (1 - METRIC_EMA_ALPHA) * state["ema"]
+    )
+
+    consecutive = state["last_day"] == (date.fromisoformat(day) - timedelta(days=1)).isoformat()
+    if _alerting(METRIC_SPEC[metric], value):
+        state["streak"] = state["streak"] + 1 if consecutive else 1
+    else:
+        state["streak"] = 0
+    state["last_day"] = day
+
+
+def apply_value(metric, state, day, value):
+    """O(1) update of a state dict with the latest value for `day`."""
+    pending = state["pending_day"]
+    if pending is None or day == pending:
+        state["pending_day"], state["pending_value"] = day, value
+    elif day > pending:
+        _fold(metric, state, pending, state["pending_value"])
+        state["pending_day"], state["pending_value"] = day, value
+    # An older day than the pending one (backdated entry) is ignored: the
+    # stats are a forward stream and the day was already folded or skipped
+    return state
+
+
+def update_metric_stats(cursor, user_id, category, value, created_at):
+    """Fold one saved health_data value into the user's stats; the caller commits."""
+    day = str(created_at)[:10]
+    for metric, number in metric_values(category, value):
+        cursor.execute(f"""
+            SELECT {', '.join(STATE_COLUMNS)} FROM user_metric_stats
+            WHERE user_id = ? AND metric = ?
+        """, (user_id, metric))
+        row = cursor.fetchone()
+        state = dict(zip(STATE_COLUMNS, row)) if row else dict(EMPTY_STATE)
+        _write_state(cursor, user_id, metric, apply_value(metric, state, day, number))
+
+
+def _write_state(cursor, user_id, metric, state):
+    cursor.execute(f"""
+        INSERT INTO user_metric_stats (user_id, metric, {', '.join(STATE_COLUMNS)}, updated_at)
+        VALUES (?, ?, {', '.join('?' * len(STATE_COLUMNS))}, CURRENT_TIMESTAMP)
+        ON CONFLICT(user_id, metric) DO UPDATE SET
+            {', '.join(f'{c} = excluded.{c}' for c in STATE_COLUMNS)},
+            updated_at = excluded.updated_at
+    """, (user_id, metric, *(state[c] for c in STATE_COLUMNS)))
+
+
+def backfill_metric_stats():
+    """
+    Rebuild user_metric_stats from health_data (once, for existing data).
+    Runs as one write transaction so saves made meanwhile wait for it
+    instead of being counted twice.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("DELETE FROM user_metric_stats")
+        states = {}
+        # Rows in id order are in save order; the JOIN skips deleted users
+        rows = conn.execute("""
+            SELECT h.user_id, h.category, h.input_value, h.created_at
+            FROM health_data h
+            JOIN users u ON u.id = h.user_id
+            ORDER BY h.id
+        """)
+        for row in rows:
+            day = str(row["created_at"])[:10]
+            for metric, number in metric_values(row["category"], row["input_value"]):
+                state = states.setdefault((row["user_id"], metric), dict(EMPTY_STATE))
+                apply_value(metric, state, day, number)
+        for (user_id, metric), state in states.items():
+            _write_state(cursor, user_id, metric, state)
+        set_checkpoint("metric_stats_backfilled", datetime.now().isoformat(), cursor=cursor)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"✅ Metric stats rebuilt for {len(states)} user metrics")
+    return len(states)
+
+
+# ---------------- Reading ----------------
+def _view(metric, state, today):
+    """Stats as of the pending day (folded history + the pending value)."""
+    spec = METRIC_SPEC[metric]
+    value = state["pending_value"]
+    std = math.sqrt(state["m2"] / (state["n"] - 1)) if state["n"] > 1 else 0.0
+
+    streak = 0
+    if value is not None and _alerting(spec, value):
+        yesterday = (date.fromisoformat(state["pending_day"]) - timedelta(days=1)).isoformat()
+        streak = (state["streak"] if state["last_day"] == yesterday else 0) + 1
+
+    ema = state["ema"]
+    if value is not None:
+        ema = value if ema is None else METRIC_EMA_ALPHA * value + (1 - METRIC_EMA_ALPHA) * ema
+
+    return {
+        "metric": metric,
+        "label": spec["label"],
+        "unit": spec.get("unit", ""),
+        "day": state["pending_day"],
+        "current": state["pending_day"] is not None and state["pending_day"] >= (today - timedelta(days=1)).isoformat(),
+        "value": value,
+        "days": state["n"],
+        "mean": state["mean"],
+        "std": std,
+        "ema": ema,
+        "streak": streak,
+    }
+
+
+def user_metric_stats(user_id, today=None):
+    """{metric: view} for one user, one indexed query."""
+    today = today or date.today()
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(f"""
+            SELECT metric, {', '.join(STATE_COLUMNS)} FROM user_metric_stats
+            WHERE user_id = ?
+        """, (user_id,)).fetchall()
+    finally:
+        conn.close()
+    return {
+        row["metric"]: _view(row["metric"], {c: row[c] for c in STATE_COLUMNS}, today)
+        for row in rows if row["metric"] in METRIC_SPEC
+    }
+
+
+def detect_anomalies(views):
+    """
+    Alerts from metric views, most urgent first:
+      streak  - the alert held for `streak_days` days in a row up to today
+      unusual - today's value is METRIC_Z_THRESHOLD std away from the
+                user's own mean (numeric metrics with enough history)
+    """
+    anomalies = []
+    for metric, view in views.items():
+        spec = METRIC_SPEC[metric]
+        if not view["current"] or view["value"] is None:
+            continue
+        info = {
+            "metric": metric, "label": view["label"], "unit": view["unit"],
+            "value": round(view["value"], 1), "mean": round(view["mean"], 1),
+            "threshold": _threshold(spec),
+        }
+        if view["streak"] >= spec["streak_days"]:
+            anomalies.append({**info, "kind": "streak", "days": view["streak"]})
+        elif ("labels" not in spec and view["days"] >= METRIC_MIN_DAYS and view["std"] > 0
+              and abs(view["value"] - view["mean"]) / view["std"] >= METRIC_Z_THRESHOLD):
+            anomalies.append({**info, "kind": "unusual", "days": view["days"]})
+    anomalies.sort(key=lambda a: (a["kind"] != "streak", -a["days"]))
+    return anomalies
+
+
+def metric_trends(views, min_days=3):
+    """
+    Metrics whose moving average has drifted half a standard deviation
+    from the long-run mean: [{"label", "direction", "recent", "usual", "unit"}].
+    """
+    trends = []
+    for metric, view in views.items():
+        if "labels" in METRIC_SPEC[metric] or view["days"] < min_days or not view["std"] or view["ema"] is None:
+            continue
+        drift = view["ema"] - view["mean"]
+        if abs(drift) >= 0.5 * view["std"]:
+            trends.append({
+                "label": view["label"], "direction": "up" if drift > 0 else "down",
+                "recent": round(view["ema"], 1), "usual": round(view["mean"], 1), "unit": view["unit"],
+            })
+    return trends
+
+
+# ---------------- Scheduling ----------------
+def schedule_metric_jobs(scheduler):
+    # Existing data is folded in once, in the background, on first start
+    if get_checkpoint("metric_stats_backfilled") is None:
+        scheduler.add_job(backfill_metric_stats, trigger="date",
+                          id="metric_stats_backfill", replace_existing=True)
@@ -0,0 +1,246 @@
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from flask import g, request
+
+
+# ---------------- Request Metrics ----------------
+# Per-endpoint latency histograms, status codes and in-flight counts,
+# served in the Prometheus text format by /admin/metrics.
+#
+# Endpoints are labelled by route pattern ("/admin/rules", not the raw
+# path) so the label set stays small; unmatched paths share "<unmatched>".
+#
+# Each gunicorn worker counts its own requests. Workers write a snapshot
+# to METRICS_DIR every METRICS_FLUSH_SECONDS, and the worker that answers
+# /admin/metrics adds up the snapshots of every live worker, so a scrape
+# sees the whole server whichever worker gets it. METRICS_DIR="" keeps
+# the numbers per process.
+#
+# Other users must not plant or swap snapshots there: the default is a
+# per-user directory in the temp dir, and whichever directory is used
+# must be owned by this user and not group/world-writable.
+
+METRICS_DIR = os.getenv(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), f"smarthealthplus-metrics-{os.getuid()}")
+)
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "10"))
+
+# Upper bounds in seconds; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED = "<unmatched>"
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}   # (method, endpoint, status) -> count
+        self.latency = {}    # (method, endpoint) -> [bucket counts..., +Inf count, sum]
+        self.in_flight = {}  # endpoint -> requests running now
+
+    def started(self, endpoint):
+        with self._lock:
+            self.in_flight[endpoint] = self.in_flight.get(endpoint, 0) + 1
+
+    def finished(self, method, endpoint, status, seconds):
+        with self._lock:
+            self.in_flight[endpoint] -= 1
+            key = (method, endpoint, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            series = self.latency.get((method, endpoint))
+            if series is None:
+                series = self.latency[(method, endpoint)] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(LATENCY_BUCKETS)] += 1
+            series[-1] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": [[*key, count] for key, count in self.requests.items()],
+                "latency": [[*key, list(series)] for key, series in self.latency.items()],
+                "in_flight": dict(self.in_flight),
+            }
+
+
+METRICS = Metrics()
+
+
+# ---------------- Worker Snapshots ----------------
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _snapshot_path(pid):
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+
+def check_metrics_dir():
+    """Create METRICS_DIR (0700) and refuse it unless only this user can write to it."""
+    os.makedirs(METRICS_DIR, mode=0o700, exist_ok=True)
+    info = os.lstat(METRICS_DIR)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise RuntimeError(f"METRICS_DIR {METRICS_DIR} must be a directory owned by this user and not group/world-writable")
+
+
+def flush_snapshot():
+    if not METRICS_DIR:
+        return
+    path = _snapshot_path(os.getpid())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(METRICS.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _flush_forever():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            flush_snapshot()
+        except OSError as e:
+            print("⚠️ Metrics flush failed:", e)
+
+
+def ensure_flusher():
+    # Started by the first request, i.e. after gunicorn forked the worker
+    global _flusher
+    if _flusher is None and METRICS_DIR:
+        with _flusher_lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_forever, name="metrics-flush", daemon=True)
+                _flusher.start()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merged_snapshot():
+    """This worker's numbers plus every other live worker's last snapshot."""
+    snapshots = [METRICS.snapshot()]
+    if METRICS_DIR:
+        flush_snapshot()
+        for name in os.listdir(METRICS_DIR):
+            if not name.endswith(".json") or not name[:-5].isdigit():
+                continue
+            pid = int(name[:-5])
+            if pid == os.getpid():
+                continue
+            if not _alive(pid):
+                try:
+                    os.remove(_snapshot_path(pid))
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(_snapshot_path(pid)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+    requests_, latency, in_flight = {}, {}, {}
+    for snapshot in snapshots:
+        for method, endpoint, status, count in snapshot["requests"]:
+            key = (method, endpoint, status)
+            requests_[key] = requests_.get(key, 0) + count
+        for method, endpoint, series in snapshot["latency"]:
+            total = latency.setdefault((method, endpoint), [0] * len(series))
+            for i, value in enumerate(series):
+                total[i] += value
+        for endpoint, count in snapshot["in_flight"].items():
+            in_flight[endpoint] = in_flight.get(endpoint, 0) + count
+    return {"requests": requests_, "latency": latency, "in_flight": in_flight}
+
+
+# ---------------- Prometheus Text ----------------
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_label(value)}"' for name, value in labels.items()) + "}"
+
+
+def render_prometheus(snapshot, gauges=None):
+    """
+    Prometheus text format 0.0.4. gauges: extra {name: (help, [(labels, value)])}
+    from other subsystems.
+    """
+    lines = [
+        "# HELP smarthealth_http_requests_total HTTP requests by route and status code.",
+        "# TYPE smarthealth_http_requests_total counter",
+    ]
+    for (method, endpoint, status), count in sorted(snapshot["requests"].items()):
+        lines.append(f"smarthealth_http_requests_total{_labels(method=method, endpoint=endpoint, status=status)} {count}")
+
+    lines += [
+        "# HELP smarthealth_http_request_duration_seconds Request latency by route.",
+        "# TYPE smarthealth_http_request_duration_seconds histogram",
+    ]
+    for (method, endpoint), series in sorted(snapshot["latency"].items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), series[:-1]):
+            cumulative += count
+            lines.append(f"smarthealth_http_request_duration_seconds_bucket"
+                         f"{_labels(method=method, endpoint=endpoint, le=bound)} {cumulative}")
+        lines.append(f"smarthealth_http_request_duration_seconds_sum{_labels(method=method, endpoint=endpoint)} {series[-1]:.6f}")
+        lines.append(f"smarthealth_http_request_duration_seconds_count{_labels(method=method, endpoint=endpoint)} {cumulative}")
+
+    lines += [
+        "# HELP smarthealth_http_requests_in_flight Requests being served right now.",
+        "# TYPE smarthealth_http_requests_in_flight gauge",
+    ]
+    for endpoint, count in sorted(snapshot["in_flight"].items()):
+        lines.append(f"smarthealth_http_requests_in_flight{_labels(endpoint=endpoint)} {count}")
+
+    for name, (help_text, samples) in (gauges or {}).items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(**labels) if labels else ''} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- Flask Hooks ----------------
+def _endpoint():
+    return request.url_rule.rule if request.url_rule is not None else UNMATCHED
+
+
+def init_metrics(app):
+    if METRICS_DIR:
+        check_metrics_dir()
+
+    @app.before_request
+    def _metrics_start():
+        ensure_flusher()
+        g.metrics_started = time.perf_counter()
+        g.metrics_endpoint = _endpoint()
+        METRICS.started(g.metrics_endpoint)
+
+    @app.after_request
+    def _metrics_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(error):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return
+        # No after_request on an unhandled exception: that's a 500
+        status = g.pop("metrics_status", 500)
+        METRICS.finished(request.method, g.pop("metrics_endpoint"), status, time.perf_counter() - started)
@@ -0,0 +1,289 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from database import get_db_connection
+from utils.messaging import send_email, send_sms
+from utils.dispatch import NotificationDispatcher, track
+
+
+# ---------------- Notification Outbox ----------------
+# Every notification is first written to the `outbox` table, in the same
+# transaction as whatever decided to send it (e.g. the reminder tick and
+# its checkpoint). Delivery workers then claim rows under a lease, send
+# them, and record each attempt.
+#
+# - idempotency_key is UNIQUE and rows are inserted with INSERT OR IGNORE,
+#   so two schedulers enqueuing the same reminder minute produce one row.
+# - A claim sets lease_owner / lease_expires in a single UPDATE, so two
+#   workers never hold the same row. A worker that dies mid-batch just lets
+#   its lease expire and the row is picked up again.
+# - Completion is fenced on lease_owner: a worker whose lease was taken
+#   over can't overwrite the new owner's result.
+# - While a batch is being sent its leases are renewed every third of
+#   OUTBOX_LEASE_SECONDS: a batch held back by the SMS / email rate limits
+#   can take longer than one lease, and must not be claimed and sent again
+#   by the next sweep.
+
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_BACKOFF = float(os.getenv("OUTBOX_RETRY_BACKOFF_SECONDS", "30"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "14"))
+
+# Higher is claimed first: a 100k-row digest backlog must not delay reminders
+PRIORITY_NORMAL = 0
+PRIORITY_BULK = -10
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # same shape as CURRENT_TIMESTAMP, sorts as text
+
+
+def _utc(dt=None):
+    return (dt or datetime.now(timezone.utc)).strftime(TIME_FORMAT)
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+# ---------------- Senders ----------------
+def _send_email_message(msg):
+    return send_email(msg["to"], msg.get("subject") or "", msg["message"])
+
+
+def _send_sms_message(msg):
+    return send_sms(msg["to"], msg["message"])
+
+
+OUTBOX_SENDERS = {"email": _send_email_message, "sms": _send_sms_message}
+
+
+# ---------------- Enqueue ----------------
+def enqueue(cursor, messages):
+    """
+    Insert outbox rows on the caller's cursor; the caller commits.
+    Each message: {"key", "channel", "to", "message", optional "subject",
+    "user_id", "reminder_id", "priority"}. Returns how many rows were new.
+    """
+    before = cursor.connection.total_changes
+    cursor.executemany("""
+        INSERT OR IGNORE INTO outbox (
+            idempotency_key, channel, recipient, subject, body,
+            user_id, reminder_id, priority, available_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (m["key"], m["channel"], m["to"], m.get("subject"), m["message"],
+         m.get("user_id"), m.get("reminder_id"), m.get("priority", PRIORITY_NORMAL), _utc())
+        for m in messages
+    ])
+    return cursor.connection.total_changes - before
+
+
+# ---------------- Claim / Complete ----------------
+def claim_batch(owner, limit=OUTBOX_BATCH_SIZE, lease_seconds=OUTBOX_LEASE_SECONDS, min_priority=None):
+    """
+    Lease up to `limit` rows that are pending (and due), or whose previous
+    lease expired, highest priority first. One UPDATE ... RETURNING, so the
+    claim is atomic. `min_priority` leaves lower-priority rows for others.
+    """
+    now = datetime.now(timezone.utc)
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("""
+            UPDATE outbox
+            SET status = 'sending',
+                lease_owner = ?,
+                lease_expires = ?,
+                attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM outbox
+                WHERE ((status = 'pending' AND available_at <= ?)
+                    OR (status = 'sending' AND lease_expires < ?))
+                  AND priority >= ?
+                ORDER BY priority DESC, id
+                LIMIT ?
+            )
+            RETURNING id, idempotency_key, channel, recipient, subject, body, attempts
+        """, (owner, _utc(now + timedelta(seconds=lease_seconds)), _utc(now), _utc(now),
+              PRIORITY_BULK if min_priority is None else min_priority, limit)).fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+    return sorted(rows, key=lambda r: r["id"])
+
+
+def renew_leases(owner, ids, lease_seconds=OUTBOX_LEASE_SECONDS):
+    """Push out the lease of rows this owner is still sending; returns how many."""
+    if not ids:
+        return 0
+    conn = get_db_connection()
+    try:
+        renewed = conn.execute(f"""
+            UPDATE outbox SET lease_expires = ?
+            WHERE id IN ({','.join('?' * len(ids))}) AND lease_owner = ? AND status = 'sending'
+        """, [_utc(datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)), *ids, owner]).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return renewed
+
+
+class LeaseKeeper:
+    """Renews a batch's leases on a background thread until stopped."""
+
+    def __init__(self, owner, ids, lease_seconds=OUTBOX_LEASE_SECONDS):
+        self.owner = owner
+        self.ids = list(ids)
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="outbox-lease", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                renew_leases(self.owner, self.ids, self.lease_seconds)
+            except Exception as e:
+                # The next tick tries again; the lease still has 2/3 left
+                print("⚠️ Outbox lease renewal failed:", e)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def complete(owner, results):
+    """
+    results: list of (row, ok, error, duration_ms). Records one attempt per
+    row and moves it to sent / pending (retry with backoff) / dead.
+    """
+    now = datetime.now(timezone.utc)
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        for row, ok, error, duration_ms in results:
+            cursor.execute("""
+                INSERT INTO outbox_attempts (outbox_id, attempt, worker, ok, error, duration_ms)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (row["id"], row["attempts"], owner, 1 if ok else 0, error, duration_ms))
+
+            if ok:
+                cursor.execute("""
+                    UPDATE outbox
+                    SET status = 'sent', sent_at = ?, last_error = NULL,
+                        lease_owner = NULL, lease_expires = NULL
+                    WHERE id = ? AND lease_owner = ? AND status = 'sending'
+                """, (_utc(now), row["id"], owner))
+            else:
+                dead = row["attempts"] >= OUTBOX_MAX_ATTEMPTS
+                retry_at = now + timedelta(seconds=OUTBOX_RETRY_BACKOFF * 2 ** (row["attempts"] - 1))
+                cursor.execute("""
+                    UPDATE outbox
+                    SET status = ?, last_error = ?, available_at = ?,
+                        lease_owner = NULL, lease_expires = NULL
+                    WHERE id = ? AND lease_owner = ? AND status = 'sending'
+                """, ("dead" if dead else "pending", error, _utc(retry_at), row["id"], owner))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# ---------------- Delivery ----------------
+def deliver_outbox(owner=None, senders=None, batch_size=OUTBOX_BATCH_SIZE, max_batches=None,
+                   min_priority=None):
+    """
+    Claim and send batches until nothing is due. Safe to run in any number
+    of threads / processes at once. Returns counts for this call.
+    """
+    owner = owner or worker_id()
+    senders = senders or OUTBOX_SENDERS
+    dispatcher = track(NotificationDispatcher(senders, name="outbox_delivery"))
+    stats = {"claimed": 0, "sent": 0, "failed": 0, "dead": 0}
+
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = claim_batch(owner, batch_size, min_priority=min_priority)
+        if not rows:
+            break
+        batches += 1
+        stats["claimed"] += len(rows)
+
+        # A row whose lease expired after its last allowed attempt: the
+        # earlier attempt may or may not have gone out, so don't resend.
+        exhausted = [r for r in rows if r["attempts"] > OUTBOX_MAX_ATTEMPTS]
+        rows = [r for r in rows if r["attempts"] <= OUTBOX_MAX_ATTEMPTS]
+        results = [(r, False, "lease expired after last attempt", 0) for r in exhausted]
+        stats["dead"] += len(exhausted)
+
+        by_id = {r["id"]: r for r in rows}
+        seen = len(dispatcher.outcomes)
+        with LeaseKeeper(owner, by_id):
+            dispatcher.run([
+                {"channel": r["channel"], "to": r["recipient"], "subject": r["subject"],
+                 "message": r["body"], "key": r["id"]}
+                for r in rows
+            ])
+        for outcome in dispatcher.outcomes[seen:]:
+            results.append((by_id[outcome["key"]], outcome["ok"], outcome["error"], outcome["duration_ms"]))
+            stats["sent" if outcome["ok"] else "failed"] += 1
+
+        # Unknown channel (no sender): nothing can deliver it
+        for r in rows:
+            if r["channel"] not in senders:
+                results.append((r, False, f"no sender for channel {r['channel']}", 0))
+                stats["failed"] += 1
+
+        complete(owner, results)
+
+    return stats
+
+
+def outbox_counts():
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+    finally:
+        conn.close()
+    return {row["status"]: row["n"] for row in rows}
+
+
+def purge_outbox(days=OUTBOX_RETENTION_DAYS):
+    """Drop delivered rows (and their attempts) older than `days`."""
+    cutoff = _utc(datetime.now(timezone.utc) - timedelta(days=days))
+    conn = get_db_connection()
+    try:
+        conn.execute("""
+            DELETE FROM outbox_attempts WHERE outbox_id IN (
+                SELECT id FROM outbox WHERE status = 'sent' AND sent_at < ?
+            )
+        """, (cutoff,))
+        removed = conn.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (cutoff,)).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return removed
+
+
+# ---------------- Standalone Worker ----------------
+def run_worker(poll_seconds=5.0):
+    owner = worker_id()
+    print(f"🟢 Outbox worker {owner} started")
+    while True:
+        stats = deliver_outbox(owner)
+        if stats["claimed"]:
+            print("📨 Outbox:", stats)
+        else:
+            time.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    # cd backend && python -m utils.outbox
+    from dotenv import load_dotenv
+    load_dotenv()
+    run_worker(float(os.getenv("OUTBOX_POLL_SECONDS", "5")))
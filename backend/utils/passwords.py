@@ -0,0 +1,175 @@
+import base64
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+# ---------------- Password Hashing ----------------
+# A hash or verify costs ~0.1-0.3 s of CPU. bcrypt and hashlib release the
+# GIL meanwhile, so the worker's other threads keep running - but a storm
+# of logins can still occupy every core the worker runs on, and pages
+# queue behind it. Hash and verify therefore run in a small process pool
+# (PASSWORD_POOL_SIZE processes per worker, see start_password_pool()),
+# which caps the cores hashing can take; the request thread just waits on
+# a future. The default leaves
+# one core free for pages: min(2, cores - 1), i.e. no pool (hash on the
+# request thread) on a single-core box, where a pool only adds overhead.
+#
+# PASSWORD_HASH_ALGORITHM picks how new hashes are made:
+#   bcrypt  PASSWORD_HASH_COST = log2 rounds (default 12); stored as
+#           "bcrypt-sha256$<bcrypt hash>" of base64(SHA-256(password)),
+#           since bcrypt only takes 72 bytes (and bcrypt 5 refuses more)
+#   scrypt  PASSWORD_HASH_COST = N (default 32768), werkzeug's format
+#   pbkdf2  PASSWORD_HASH_COST = iterations (default 600000), werkzeug's format
+# Every format verifies. A successful login with a hash that isn't the
+# current algorithm and cost gets a fresh hash back to store.
+
+PASSWORD_HASH_ALGORITHM = os.getenv("PASSWORD_HASH_ALGORITHM", "bcrypt")
+DEFAULT_COSTS = {"bcrypt": 12, "scrypt": 32768, "pbkdf2": 600000}
+PASSWORD_HASH_COST = int(os.getenv("PASSWORD_HASH_COST", DEFAULT_COSTS[PASSWORD_HASH_ALGORITHM]))
+PASSWORD_POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", str(min(2, (os.cpu_count() or 1) - 1))))
+PASSWORD_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_TIMEOUT_SECONDS", "10"))
+
+
+class PasswordBusy(RuntimeError):
+    """The pool didn't get to a hash within PASSWORD_TIMEOUT_SECONDS."""
+
+
+# ---------------- Hash Formats ----------------
+# These run inside the pool's processes.
+BCRYPT_SHA256 = "bcrypt-sha256$"
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+
+def _bcrypt_input(password):
+    # 44 ASCII bytes whatever the password's length, and no NUL bytes
+    return base64.b64encode(hashlib.sha256(password.encode("utf-8")).digest())
+
+
+def _make_hash(password, algorithm, cost):
+    if algorithm == "bcrypt":
+        import bcrypt
+
+        return BCRYPT_SHA256 + bcrypt.hashpw(_bcrypt_input(password), bcrypt.gensalt(cost)).decode("ascii")
+    if algorithm == "scrypt":
+        return generate_password_hash(password, method=f"scrypt:{cost}:8:1")
+    if algorithm == "pbkdf2":
+        return generate_password_hash(password, method=f"pbkdf2:sha256:{cost}")
+    raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+
+
+def _hash_params(stored):
+    """(algorithm, cost) a stored hash was made with."""
+    if stored.startswith(BCRYPT_SHA256):
+        return "bcrypt", int(stored[len(BCRYPT_SHA256):].split("$")[2])
+    if stored.startswith(BCRYPT_PREFIXES):
+        # bcrypt of the raw password: still verifies, rehashed on login
+        return "bcrypt-raw", int(stored.split("$")[2])
+    method = stored.split("$", 1)[0].split(":")
+    if method[0] == "scrypt":
+        return "scrypt", int(method[1]) if len(method) > 1 else 32768
+    if method[0] == "pbkdf2":
+        return "pbkdf2", int(method[2]) if len(method) > 2 else None
+    return method[0], None
+
+
+def _check(stored, password):
+    if stored.startswith(BCRYPT_SHA256):
+        import bcrypt
+
+        return bcrypt.checkpw(_bcrypt_input(password), stored[len(BCRYPT_SHA256):].encode("ascii"))
+    if stored.startswith(BCRYPT_PREFIXES):
+        import bcrypt
+
+        raw = password.encode("utf-8")
+        # Made from at most 72 bytes, so a longer password can't match
+        return len(raw) <= 72 and bcrypt.checkpw(raw, stored.encode("ascii"))
+    return check_password_hash(stored, password)
+
+
+def _verify(stored, password, algorithm, cost):
+    """(matches, new hash if it should be upgraded else None)."""
+    if not _check(stored, password):
+        return False, None
+    if _hash_params(stored) == (algorithm, cost):
+        return True, None
+    try:
+        return True, _make_hash(password, algorithm, cost)
+    except ValueError as e:
+        # Signing in matters more than the upgrade; keep the old hash
+        print("⚠️ Password hash upgrade skipped:", e)
+        return True, None
+
+
+# ---------------- Pool ----------------
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def start_password_pool():
+    """
+    Fork the pool's processes. app.py calls this while it's being
+    imported, before the scheduler or any server thread exists, so the
+    children are copies of a single-threaded process. (spawn/forkserver
+    children would re-run `python app.py`'s __main__, scheduler included.)
+    """
+    global _pool, _pool_pid
+    if PASSWORD_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_POOL_SIZE,
+                                        mp_context=multiprocessing.get_context("fork"))
+            _pool_pid = os.getpid()
+            _pool.submit(int)  # with fork, the first submit starts every process
+    return _pool
+
+
+def _run(fn, *args):
+    global _pool
+    pool = _pool
+    # No pool, or one inherited from another process (gunicorn --preload):
+    # hash on this thread rather than fork from a threaded worker
+    if pool is None or _pool_pid != os.getpid():
+        return fn(*args)
+    future = pool.submit(fn, *args)
+    try:
+        return future.result(timeout=PASSWORD_TIMEOUT_SECONDS)
+    except FutureTimeout:
+        # Backlogged: don't queue the work on this thread as well
+        future.cancel()
+        raise PasswordBusy("password hashing timed out")
+    except BrokenProcessPool:
+        # A pool process died (OOM kill etc.): hash on the request
+        # threads from now on
+        print("⚠️ Password pool broken; hashing in-process")
+        with _pool_lock:
+            _pool = None
+        return fn(*args)
+
+
+def hash_password(password):
+    return _run(_make_hash, password, PASSWORD_HASH_ALGORITHM, PASSWORD_HASH_COST)
+
+
+def verify_password(stored, password):
+    """
+    (matches, upgraded): upgraded is a new hash to store when `stored`
+    uses an old algorithm or cost, else None.
+    """
+    if not stored or not password:
+        return False, None
+    return _run(_verify, stored, password, PASSWORD_HASH_ALGORITHM, PASSWORD_HASH_COST)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,174 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from flask import g, request, session
+
+
+# ---------------- Profiling ----------------
+# On-demand profiles, started by an admin:
+#   - one request: add ?_profile=pstats (cProfile, top functions by
+#     cumulative time) or ?_profile=collapsed (sampled stacks) to any URL
+#     while logged in as admin; the profile replaces the response
+#   - live traffic: /admin/profile?seconds=N samples every thread of the
+#     worker that takes the call for N seconds (&idle=1 keeps idle threads)
+#
+# "collapsed" is one line per distinct stack, "root;...;leaf count", the
+# input of flamegraph.pl and speedscope.
+
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PSTATS_LINES = 60
+
+# One traffic profile at a time per worker; they cost CPU
+_sampling = threading.Lock()
+# One ?_profile=pstats at a time per worker: since Python 3.12 a second
+# cProfile.Profile().enable() while another is on raises ValueError
+_cprofiling = threading.Lock()
+
+# Threads parked in one of these (file, function) leaves are idle - pool
+# workers waiting for work, the scheduler between jobs - and are left out
+# of traffic profiles, as are these helper threads
+IDLE_LEAVES = {
+    ("thread.py", "_worker"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("socket.py", "accept"),
+}
+HELPER_THREADS = {"metrics-flush", "profiler-sampler"}
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class Sampler:
+    """Collects the stacks of some (or all other) threads every `interval` seconds."""
+
+    def __init__(self, thread_ids=None, interval=PROFILE_SAMPLE_INTERVAL, skip_idle=True):
+        self.thread_ids = thread_ids
+        self.skip_idle = skip_idle
+        self.interval = interval
+        self.counts = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own = {threading.get_ident(), self._caller}
+        while not self._stop.is_set():
+            helpers = {t.ident for t in threading.enumerate() if t.name in HELPER_THREADS}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in own or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                if self.skip_idle and (thread_id in helpers or (
+                        os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_LEAVES):
+                    continue
+                stack = _stack(frame)
+                self.counts[stack] = self.counts.get(stack, 0) + 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+    def start(self):
+        # Sampling the caller too is only wanted when it was asked for
+        self._caller = None if self.thread_ids else threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in
+                       sorted(self.counts.items(), key=lambda item: item[1], reverse=True))
+
+
+def sample_traffic(seconds, skip_idle=True):
+    """Collapsed stacks of every other thread for `seconds`; None if one is already running."""
+    seconds = max(1, min(int(seconds), PROFILE_MAX_SECONDS))
+    if not _sampling.acquire(blocking=False):
+        return None
+    try:
+        sampler = Sampler(skip_idle=skip_idle).start()
+        time.sleep(seconds)
+        sampler.stop()
+        header = f"# {sampler.samples} samples over {seconds}s, pid {os.getpid()}\n"
+        return header + sampler.collapsed()
+    finally:
+        _sampling.release()
+
+
+class RequestProfile:
+    """Profile of the current request: cProfile ("pstats") or sampled stacks ("collapsed")."""
+
+    FORMATS = ("pstats", "collapsed")
+
+    def __init__(self, fmt):
+        self.format = fmt
+        self.started = time.perf_counter()
+        if fmt == "pstats":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = Sampler(thread_ids={threading.get_ident()}).start()
+
+    def report(self, status):
+        elapsed = time.perf_counter() - self.started
+        header = f"# status {status}, {elapsed * 1000:.1f} ms, pid {os.getpid()}\n"
+        if self.format == "pstats":
+            try:
+                self._profile.disable()
+            finally:
+                _cprofiling.release()
+            out = io.StringIO()
+            stats = pstats.Stats(self._profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(PSTATS_LINES)
+            return header + out.getvalue()
+        self._sampler.stop()
+        return header + self._sampler.collapsed()
+
+
+def init_request_profiling(app):
+    @app.before_request
+    def _profile_start():
+        fmt = request.args.get("_profile")
+        if fmt in RequestProfile.FORMATS and session.get("role") == "admin":
+            if fmt == "pstats" and not _cprofiling.acquire(blocking=False):
+                return app.response_class("# another request is being profiled with pstats, try again\n",
+                                          status=409, mimetype="text/plain")
+            try:
+                g.request_profile = RequestProfile(fmt)
+            except BaseException:
+                if fmt == "pstats":
+                    _cprofiling.release()
+                raise
+
+    @app.after_request
+    def _profile_report(response):
+        profile = g.pop("request_profile", None)
+        if profile is None:
+            return response
+        return app.response_class(profile.report(response.status_code), mimetype="text/plain")
+
+    @app.teardown_request
+    def _profile_discard(error):
+        # The request raised before after_request: don't leave it profiling
+        profile = g.pop("request_profile", None)
+        if profile is not None:
+            profile.report(500)
@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# ---------------- Notification Providers ----------------
+# One long-lived client per channel per process. Creating a Twilio client
+# or a bare requests.post per message throws away the TCP/TLS connection
+# every time; these keep pooled keep-alive sessions instead.
+#
+# NOTIFY_BACKEND=fake swaps every channel for an in-memory fake so delivery
+# can be exercised and benchmarked offline.
+
+# (connect, read) seconds
+HTTP_TIMEOUT = (
+    float(os.getenv("NOTIFY_CONNECT_TIMEOUT", "3.05")),
+    float(os.getenv("NOTIFY_READ_TIMEOUT", "10")),
+)
+HTTP_POOL_SIZE = int(os.getenv("NOTIFY_HTTP_POOL_SIZE", "10"))
+
+
+def pooled_session(pool_size=HTTP_POOL_SIZE, retries=2):
+    """
+    requests.Session with keep-alive pooling. Retries only 429/503, which
+    providers send before doing any work, and failed connects, where nothing
+    was sent; never a read timeout or reset, so a POST is never sent twice.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        read=0,
+        other=0,
+        backoff_factor=0.5,
+        status_forcelist=(429, 503),
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def normalize_phone(to_phone):
+    to_phone = (to_phone or "").strip()
+    if to_phone and not to_phone.startswith("+"):
+        to_phone = "+91" + to_phone
+    return to_phone
+
+
+# ---------------- SMS (Twilio) ----------------
+class TwilioSMSProvider:
+    def __init__(self):
+        self.account_sid = os.getenv("TWILIO_ACCOUNT_SID")
+        self.auth_token = os.getenv("TWILIO_AUTH_TOKEN")
+        self.from_number = os.getenv("TWILIO_FROM_NUMBER")
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from twilio.rest import Client
+                    from twilio.http.http_client import TwilioHttpClient
+
+                    http_client = TwilioHttpClient(pool_connections=True, timeout=HTTP_TIMEOUT[1])
+                    self._client = Client(self.account_sid, self.auth_token, http_client=http_client)
+        return self._client
+
+    def send(self, to_phone, message):
+        if not self.account_sid or not self.auth_token or not self.from_number:
+            print("❌ Twilio ENV missing!")
+            return False
+
+        to_phone = normalize_phone(to_phone)
+
+        if to_phone == self.from_number:
+            print("❌ To and From numbers cannot be the same")
+            return False
+
+        if not to_phone[1:].isdigit():
+            print("❌ Invalid phone number")
+            return False
+
+        try:
+            msg = self.client.messages.create(
+                body=message,
+                from_=self.from_number,
+                to=to_phone
+            )
+            print(f"✅ SMS sent to {to_phone}! SID: {msg.sid}")
+            return True
+        except Exception as e:
+            print("❌ Twilio SMS error:", e)
+            return False
+
+
+# ---------------- Email (pooled SMTP) ----------------
+class SMTPEmailProvider:
+    def __init__(self):
+        from utils.email_delivery import get_email_worker
+        self.worker = get_email_worker()
+
+    def send(self, to_email, subject, body):
+        if not os.getenv("EMAIL_ADDRESS") or not os.getenv("EMAIL_PASSWORD"):
+            print("❌ Email credentials missing")
+            return False
+        return self.worker.send(to_email, subject, body)
+
+    def submit(self, to_email, subject, body):
+        if not os.getenv("EMAIL_ADDRESS") or not os.getenv("EMAIL_PASSWORD"):
+            print("❌ Email credentials missing")
+            return None
+        return self.worker.submit(to_email, subject, body)
+
+
+# ---------------- Push (OneSignal) ----------------
+class OneSignalPushProvider:
+    URL = "https://onesignal.com/api/v1/notifications"
+
+    def __init__(self):
+        self.app_id = os.getenv("ONESIGNAL_APP_ID")
+        self.api_key = os.getenv("ONESIGNAL_REST_API_KEY")
+        self.session = pooled_session()
+        self.session.headers.update({
+            "Authorization": f"Basic {self.api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def send(self, device_ids, title, message):
+        """Returns the provider's JSON response, or None on failure."""
+        payload = {
+            "app_id": self.app_id,
+            "include_player_ids": list(device_ids),
+            "headings": {"en": title},
+            "contents": {"en": message}
+        }
+        try:
+            response = self.session.post(self.URL, json=payload, timeout=HTTP_TIMEOUT)
+            response.raise_for_status()
+            return response.json()
+        except requests.RequestException as e:
+            print("❌ Push notification error:", e)
+            return None
+
+
+# ---------------- Fakes (offline tests / benchmarks) ----------------
+class _FakeProvider:
+    """
+    Records every send in memory. `latency` sleeps per call to stand in for
+    the provider round trip; `fail_every` makes every Nth call fail.
+    """
+
+    def __init__(self, latency=0.0, fail_every=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.sent = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self, record):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if self.fail_every and self.calls % self.fail_every == 0:
+                return False
+            self.sent.append(record)
+            return True
+
+
+class FakeSMSProvider(_FakeProvider):
+    def send(self, to_phone, message):
+        return self._call((normalize_phone(to_phone), message))
+
+
+class FakeEmailProvider(_FakeProvider):
+    def send(self, to_email, subject, body):
+        return self._call((to_email, subject, body))
+
+    def submit(self, to_email, subject, body):
+        from concurrent.futures import Future
+        future = Future()
+        future.set_result(self.send(to_email, subject, body))
+        return future
+
+
+class FakePushProvider(_FakeProvider):
+    def __init__(self, latency=0.0, fail_every=0, invalid_ids=()):
+        super().__init__(latency, fail_every)
+        self.invalid_ids = set(invalid_ids)
+
+    def send(self, device_ids, title, message):
+        device_ids = list(device_ids)
+        if not self._call((tuple(device_ids), title, message)):
+            return None
+        invalid = [d for d in device_ids if d in self.invalid_ids]
+        response = {"id": f"fake-{self.calls}", "recipients": len(device_ids) - len(invalid)}
+        if invalid:
+            response["errors"] = {"invalid_player_ids": invalid}
+        return response
+
+
+# ---------------- Registry ----------------
+REAL_PROVIDERS = {
+    "sms": TwilioSMSProvider,
+    "email": SMTPEmailProvider,
+    "push": OneSignalPushProvider,
+}
+
+FAKE_PROVIDERS = {
+    "sms": FakeSMSProvider,
+    "email": FakeEmailProvider,
+    "push": FakePushProvider,
+}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(channel):
+    """Process-wide provider for "sms", "email" or "push", built on first use."""
+    provider = _providers.get(channel)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(channel)
+            if provider is None:
+                registry = FAKE_PROVIDERS if os.getenv("NOTIFY_BACKEND") == "fake" else REAL_PROVIDERS
+                provider = registry[channel]()
+                _providers[channel] = provider
+    return provider
+
+
+def set_provider(channel, provider):
+    """Override a channel (benchmarks, local testing)."""
+    with _providers_lock:
+        _providers[channel] = provider
+    return provider
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from database import get_db_connection
+from utils.dispatch import TokenBucket
+from utils.providers import get_provider
+
+
+# ---------------- Push Broadcast Pipeline ----------------
+# Streams device IDs out of user_devices, packs them into provider-sized
+# chunks and sends the chunks concurrently over the push provider's pooled
+# session. Device IDs the provider reports as invalid (uninstalled app,
+# revoked permission) are pruned so later broadcasts don't pay for them.
+
+# OneSignal accepts up to 2000 include_player_ids per request
+PUSH_MAX_IDS_PER_REQUEST = int(os.getenv("PUSH_MAX_IDS_PER_REQUEST", "2000"))
+PUSH_WORKERS = int(os.getenv("PUSH_WORKERS", "8"))
+PUSH_LIMIT = TokenBucket(float(os.getenv("PUSH_RATE_PER_SEC", "10")),
+                         capacity=float(os.getenv("PUSH_BURST", "10")))
+
+PRUNE_BATCH = 500
+
+
+def iter_device_chunks(user_ids=None, chunk_size=PUSH_MAX_IDS_PER_REQUEST, connect=get_db_connection):
+    """
+    Yields lists of device IDs, at most `chunk_size` long.
+
+    Keyset pagination on user_devices.id: each page is a short read, so the
+    table is never held open while chunks are in flight (and pruning can
+    delete rows between pages).
+    """
+    user_filter = ""
+    params = []
+    if user_ids is not None:
+        user_ids = [int(u) for u in user_ids]
+        if not user_ids:
+            return
+        user_filter = f" AND user_id IN ({','.join('?' * len(user_ids))})"
+        params = user_ids
+
+    last_id = 0
+    while True:
+        conn = connect()
+        try:
+            rows = conn.execute(
+                f"""
+                SELECT id, device_id FROM user_devices
+                WHERE id > ?{user_filter}
+                ORDER BY id
+                LIMIT ?
+                """,
+                [last_id, *params, chunk_size]
+            ).fetchall()
+        finally:
+            conn.close()
+
+        if not rows:
+            return
+        last_id = rows[-1][0]
+
+        # The same device can be registered under two accounts
+        chunk = list(dict.fromkeys(row[1] for row in rows))
+        yield chunk
+        if len(rows) < chunk_size:
+            return
+
+
+def invalid_device_ids(response):
+    """Device IDs a OneSignal-style response flags as no longer valid."""
+    if not isinstance(response, dict):
+        return []
+    errors = response.get("errors")
+    if isinstance(errors, dict):
+        return list(errors.get("invalid_player_ids") or [])
+    return []
+
+
+def prune_devices(device_ids, connect=get_db_connection):
+    device_ids = list(device_ids)
+    if not device_ids:
+        return 0
+
+    conn = connect()
+    try:
+        removed = 0
+        for i in range(0, len(device_ids), PRUNE_BATCH):
+            batch = device_ids[i:i + PRUNE_BATCH]
+            cursor = conn.execute(
+                f"DELETE FROM user_devices WHERE device_id IN ({','.join('?' * len(batch))})",
+                batch
+            )
+            removed += cursor.rowcount
+        conn.commit()
+        return removed
+    finally:
+        conn.close()
+
+
+def broadcast_push(title, message, user_ids=None, provider=None, workers=PUSH_WORKERS,
+                   limit=PUSH_LIMIT, chunk_size=PUSH_MAX_IDS_PER_REQUEST, connect=get_db_connection):
+    """
+    Send one push to every registered device (or only `user_ids`' devices).
+
+    At most `workers` chunks are in flight at a time, so memory stays flat
+    no matter how large user_devices grows. Returns a summary dict.
+    """
+    provider = provider or get_provider("push")
+    lock = threading.Lock()
+    stats = {"devices": 0, "chunks": 0, "sent_chunks": 0, "failed_chunks": 0,
+             "recipients": 0, "invalid": 0, "pruned": 0}
+    invalid = []
+
+    def send_chunk(chunk):
+        if limit is not None:
+            limit.acquire()
+        try:
+            response = provider.send(chunk, title, message)
+        except Exception as e:
+            print("❌ Push chunk error:", e)
+            response = None
+        bad = invalid_device_ids(response)
+        with lock:
+            if response is None:
+                stats["failed_chunks"] += 1
+            else:
+                stats["sent_chunks"] += 1
+                stats["recipients"] += response.get("recipients", len(chunk) - len(bad))
+            invalid.extend(bad)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="push") as pool:
+        in_flight = set()
+        for chunk in iter_device_chunks(user_ids, chunk_size, connect):
+            stats["devices"] += len(chunk)
+            stats["chunks"] += 1
+            if len(in_flight) >= workers:
+                _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            in_flight.add(pool.submit(send_chunk, chunk))
+        wait(in_flight)
+
+    stats["invalid"] = len(invalid)
+    stats["pruned"] = prune_devices(invalid, connect)
+    stats["elapsed_seconds"] = round(time.monotonic() - started, 3)
+    print(f"🟢 Push broadcast: {stats['devices']} devices in {stats['chunks']} chunks, "
+          f"{stats['failed_chunks']} failed, {stats['pruned']} pruned ({stats['elapsed_seconds']}s)")
+    return stats
@@ -0,0 +1,346 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import request, session, jsonify
+from database import get_db_connection
+
+
+# ---------------- Rate Limits & Load Shedding ----------------
+# /login, /admin/login and /reset-password hash a password (PBKDF2) and
+# the PDF routes run ReportLab: each call holds a CPU for tens to hundreds
+# of ms, so a burst of them can tie up every worker. Two guards, both
+# answering early instead of letting requests time out:
+#
+#   rate_limited(...)  token buckets per IP and per user/account -> 429
+#   shed_load(...)     caps how many run at once in this process, with a
+#                      short bounded queue; past that -> 503
+#
+# Buckets live in a store shared by the workers, picked by
+# RATE_LIMIT_BACKEND:
+#   memory  per process (default; fine for a single worker)
+#   sqlite  the rate_limits table in the app DB
+#   redis   any Redis-compatible server at RATE_LIMIT_REDIS_URL
+#           (redis, valkey, a local stand-in), via the `redis` package
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://127.0.0.1:6379/0")
+# Behind a reverse proxy, key on the client address it forwards
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+RATE_LIMITS_ENABLED = os.getenv("RATE_LIMITS_ENABLED", "1") == "1"
+
+
+def _limit(name, default):
+    """"<requests>/<seconds>" from RATE_LIMIT_<NAME>, e.g. RATE_LIMIT_LOGIN_IP=20/60."""
+    requests_, seconds = os.getenv(f"RATE_LIMIT_{name.upper()}", default).split("/")
+    return int(requests_), float(seconds)
+
+
+# name -> (burst, per seconds); the bucket refills burst tokens per period
+LIMITS = {
+    "login_ip": _limit("login_ip", "20/60"),
+    "login_account": _limit("login_account", "5/60"),
+    "reset_ip": _limit("reset_ip", "5/300"),
+    "reset_account": _limit("reset_account", "3/300"),
+    "register_ip": _limit("register_ip", "10/600"),
+    "report_user": _limit("report_user", "6/60"),
+    "report_ip": _limit("report_ip", "20/60"),
+}
+
+
+# ---------------- Stores ----------------
+# take(key, capacity, rate) spends one token from the bucket and returns
+# (allowed, retry_after_seconds). rate is tokens per second.
+
+class MemoryStore:
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                if len(self._buckets) > self.max_keys:
+                    # Buckets idle for a full period have refilled: same as absent
+                    idle = max(seconds for _, seconds in LIMITS.values())
+                    self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < idle}
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            return False, (1 - tokens) / rate
+
+    def purge(self, older_than_seconds=86400):
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            self._buckets = {k: v for k, v in self._buckets.items() if v[1] >= cutoff}
+
+
+class SQLiteStore:
+    """Buckets in the rate_limits table; one atomic UPSERT per take()."""
+
+    def take(self, key, capacity, rate, now=None):
+        now = time.time() if now is None else now
+        conn = get_db_connection()
+        try:
+            # The UPDATE only happens when a token is available, so
+            # changes() == 0 means refused; no read-modify-write race
+            conn.execute("""
+                INSERT INTO rate_limits (key, tokens, updated) VALUES (?, ? - 1, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    tokens = MIN(?, tokens + (excluded.updated - updated) * ?) - 1,
+                    updated = excluded.updated
+                WHERE MIN(?, tokens + (excluded.updated - updated) * ?) >= 1
+            """, (key, capacity, now, capacity, rate, capacity, rate))
+            allowed = conn.execute("SELECT changes()").fetchone()[0] == 1
+            conn.commit()
+            if allowed:
+                return True, 0.0
+            row = conn.execute("SELECT tokens, updated FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            tokens = min(capacity, row["tokens"] + (now - row["updated"]) * rate)
+            return False, max(0.0, (1 - tokens) / rate)
+        finally:
+            conn.close()
+
+    def purge(self, older_than_seconds=86400):
+        conn = get_db_connection()
+        try:
+            conn.execute("DELETE FROM rate_limits WHERE updated < ?", (time.time() - older_than_seconds,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class RedisStore:
+    """Buckets as Redis hashes, updated by a Lua script so a take() is atomic."""
+
+    SCRIPT = """
+        local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens = tonumber(bucket[1]) or capacity
+        local updated = tonumber(bucket[2]) or now
+        tokens = math.min(capacity, tokens + (now - updated) * rate)
+        local allowed = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+            allowed = 1
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+        redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+        return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url=RATE_LIMIT_REDIS_URL):
+        import redis
+
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def take(self, key, capacity, rate, now=None):
+        now = time.time() if now is None else now
+        allowed, tokens = self._script(keys=[f"ratelimit:{key}"], args=[capacity, rate, now])
+        if allowed == 1:
+            return True, 0.0
+        return False, (1 - float(tokens)) / rate
+
+    def purge(self, older_than_seconds=86400):
+        pass  # keys expire on their own
+
+
+STORES = {
+    "memory": MemoryStore,
+    "sqlite": SQLiteStore,
+    "redis": RedisStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide bucket store for RATE_LIMIT_BACKEND, built on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = STORES[RATE_LIMIT_BACKEND]()
+    return _store
+
+
+def set_store(store):
+    """Override the store (benchmarks, local testing)."""
+    global _store
+    with _store_lock:
+        _store = store
+    return store
+
+
+def purge_rate_limits():
+    get_store().purge()
+
+
+def schedule_rate_limit_jobs(scheduler):
+    scheduler.add_job(purge_rate_limits, trigger="interval", hours=1,
+                      id="purge_rate_limits", replace_existing=True)
+
+
+# ---------------- Keys ----------------
+def client_ip():
+    if RATE_LIMIT_TRUST_PROXY and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or "unknown"
+
+
+def session_user():
+    return session.get("user_id") or session.get("email")
+
+
+def json_field(field):
+    """Key on a field of the JSON body, e.g. the email a login is trying."""
+    def key():
+        data = request.get_json(silent=True) or {}
+        value = str(data.get(field) or "").strip().lower()
+        return value or None
+    return key
+
+
+def form_field(field):
+    """Same as json_field, for routes that take a form post."""
+    def key():
+        value = str(request.form.get(field) or "").strip().lower()
+        return value or None
+    return key
+
+
+def too_many(message, retry_after, status):
+    response = jsonify(success=False, message=message)
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+
+def check_limit(name, identity):
+    """(allowed, retry_after) for one bucket; identity None skips it."""
+    if identity is None or not RATE_LIMITS_ENABLED:
+        return True, 0.0
+    burst, seconds = LIMITS[name]
+    try:
+        return get_store().take(f"{name}:{identity}", burst, burst / seconds)
+    except Exception as e:
+        # A store outage must not lock everyone out
+        print("⚠️ Rate limit store error:", e)
+        return True, 0.0
+
+
+def rate_limited(*limits):
+    """
+    Decorator: limits is (name, key_fn) pairs, name in LIMITS. Every bucket
+    is charged; if any is empty the request gets 429 with Retry-After.
+
+        @rate_limited(("login_ip", client_ip), ("login_account", json_field("email")))
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            for name, key_fn in limits:
+                allowed, retry_after = check_limit(name, key_fn())
+                if not allowed:
+                    return too_many("Too many requests. Please try again shortly.", retry_after, 429)
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------------- Load Shedding ----------------
+class Gate:
+    """
+    At most `slots` concurrent calls; at most `queue` more may wait, each
+    for up to `wait` seconds. Anyone beyond that is refused at once.
+    """
+
+    def __init__(self, name, slots, queue, wait):
+        self.name = name
+        self.slots = slots
+        self.queue = queue
+        self.wait = wait
+        self.running = 0
+        self.waiting = 0
+        self.shed = 0
+        self._cond = threading.Condition()
+
+    def enter(self):
+        with self._cond:
+            if self.running >= self.slots:
+                if self.waiting >= self.queue:
+                    self.shed += 1
+                    return False
+                self.waiting += 1
+                try:
+                    deadline = time.monotonic() + self.wait
+                    while self.running >= self.slots:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.shed += 1
+                            return False
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.running += 1
+            return True
+
+    def leave(self):
+        with self._cond:
+            self.running -= 1
+            self._cond.notify()
+
+    def status(self):
+        with self._cond:
+            return {"slots": self.slots, "running": self.running, "waiting": self.waiting, "shed": self.shed}
+
+
+# CPU-bound work: more concurrent calls than cores only adds latency
+SHED_SLOTS = int(os.getenv("SHED_SLOTS", str(os.cpu_count() or 2)))
+SHED_QUEUE = int(os.getenv("SHED_QUEUE", str(2 * SHED_SLOTS)))
+SHED_WAIT_SECONDS = float(os.getenv("SHED_WAIT_SECONDS", "2"))
+
+GATES = {
+    "password": Gate("password", SHED_SLOTS, SHED_QUEUE, SHED_WAIT_SECONDS),
+    "pdf": Gate("pdf", max(1, SHED_SLOTS // 2), SHED_SLOTS, SHED_WAIT_SECONDS),
+}
+
+
+@contextmanager
+def gated(gate_name):
+    """Run a block through a Gate; yields False, without a slot, when it's full."""
+    gate = GATES[gate_name]
+    entered = gate.enter()
+    try:
+        yield entered
+    finally:
+        if entered:
+            gate.leave()
+
+
+def busy(gate_name):
+    return too_many("Server is busy. Please try again shortly.", GATES[gate_name].wait, 503)
+
+
+def shed_load(gate_name):
+    """Decorator: run the route through a Gate, 503 when it's full."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with gated(gate_name) as entered:
+                if not entered:
+                    return busy(gate_name)
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def shedding_status():
+    return {name: gate.status() for name, gate in GATES.items()}
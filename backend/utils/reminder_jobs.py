@@ -0,0 +1,347 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from database import get_db_connection
+from utils.messaging import send_email, send_sms
+from utils.dispatch import NotificationDispatcher, track
+from utils.checkpoints import get_checkpoint, set_checkpoint
+from utils.outbox import enqueue, deliver_outbox, purge_outbox, PRIORITY_NORMAL
+
+
+# ---------------- Scheduler Config ----------------
+JOBSTORE_TABLE = "apscheduler_jobs"
+
+# A tick that was due while the app was down (deploy / crash) is still
+# dispatched if we come back within this many seconds; older misses are skipped.
+MISFIRE_GRACE_SECONDS = int(os.getenv("REMINDER_MISFIRE_GRACE_SECONDS", "300"))
+
+# Reminders saved before timezones were recorded were entered in IST.
+DEFAULT_TIMEZONE = "Asia/Kolkata"
+
+TICK_CHECKPOINT = "reminder_tick"
+REMINDER_SUBJECT = "SmartHealthPlus Reminder"
+
+# Set to 0 when dedicated `python -m utils.outbox` workers do the sending
+OUTBOX_DELIVER_IN_SCHEDULER = os.getenv("OUTBOX_DELIVER_IN_SCHEDULER", "1") == "1"
+
+
+def create_scheduler(db_path):
+    """
+    BackgroundScheduler whose jobs live in the app's SQLite DB,
+    so they survive restarts and deploys.
+    """
+    # Only the process that runs the scheduler pays for APScheduler / SQLAlchemy
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+
+    jobstores = {
+        "default": SQLAlchemyJobStore(url=f"sqlite:///{db_path}", tablename=JOBSTORE_TABLE)
+    }
+    job_defaults = {
+        "misfire_grace_time": MISFIRE_GRACE_SECONDS,
+        "coalesce": True,        # several missed runs -> fire once
+        "max_instances": 1
+    }
+    return BackgroundScheduler(jobstores=jobstores, job_defaults=job_defaults)
+
+
+def normalize_timezone(tz_name):
+    """Return a valid IANA zone name, falling back to DEFAULT_TIMEZONE."""
+    if not tz_name:
+        return DEFAULT_TIMEZONE
+    try:
+        ZoneInfo(tz_name)
+        return tz_name
+    except (ZoneInfoNotFoundError, ValueError):
+        return DEFAULT_TIMEZONE
+
+
+def normalize_reminder_time(value):
+    """Return "HH:MM" (zero padded, as stored and queried), or None if invalid."""
+    try:
+        return datetime.strptime(str(value).strip(), "%H:%M").strftime("%H:%M")
+    except ValueError:
+        return None
+
+
+# ---------------- Known Timezones ----------------
+# The tick needs the local "HH:MM" for every timezone that has reminders.
+# Read on every tick (it's an index-only scan of idx_reminders_due): the
+# tick may run in another process than the one that saved a reminder in
+# a new timezone, and a stale list would skip that timezone's due minutes.
+def reminder_timezones(cursor):
+    cursor.execute("SELECT DISTINCT timezone FROM reminders")
+    return sorted({normalize_timezone(r[0]) for r in cursor.fetchall()}) or [DEFAULT_TIMEZONE]
+
+
+# ---------------- Due Reminders ----------------
+def due_slots(minute_utc, timezones):
+    """
+    Map a UTC minute to the (timezone, "HH:MM") pairs that are due in it.
+    Each pair is one seek on idx_reminders_due.
+    """
+    slots = set()
+    for tz_name in timezones:
+        local = minute_utc.astimezone(ZoneInfo(tz_name))
+        slots.add((tz_name, local.strftime("%H:%M")))
+    return sorted(slots)
+
+
+def fetch_due_reminders(cursor, minute_utc, timezones):
+    rows = []
+    for tz_name, hhmm in due_slots(minute_utc, timezones):
+        cursor.execute("""
+            SELECT r.id, r.user_id, r.reminder_type,
+                   r.reminder_email, r.reminder_phone, u.name
+            FROM reminders r
+            JOIN users u ON u.id = r.user_id
+            WHERE r.timezone = ? AND r.reminder_time = ?
+        """, (tz_name, hhmm))
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+# ---------------- Senders ----------------
+def _send_email_message(msg):
+    return send_email(msg["to"], msg.get("subject", REMINDER_SUBJECT), msg["message"])
+
+
+def _send_sms_message(msg):
+    return send_sms(msg["to"], msg["message"])
+
+
+REMINDER_SENDERS = {"email": _send_email_message, "sms": _send_sms_message}
+
+
+def reminder_messages(row, message):
+    """One outgoing message per channel the reminder has."""
+    out = []
+    # ---------------- Email (ALWAYS WORKS) ----------------
+    if row["reminder_email"]:
+        out.append({"channel": "email", "to": row["reminder_email"],
+                    "subject": REMINDER_SUBJECT, "message": message, "key": row["id"]})
+    # ---------------- SMS (OPTIONAL / TRIAL LIMIT) ----------------
+    if row["reminder_phone"]:
+        out.append({"channel": "sms", "to": row["reminder_phone"],
+                    "message": message, "key": row["id"]})
+    return out
+
+
+# ---------------- Coalescing ----------------
+# A user with water, sleep and medicine reminders at 08:00 gets one email
+# and one SMS listing all three, not three of each.
+
+def reminder_text(name, reminder_types):
+    if len(reminder_types) == 1:
+        kinds = reminder_types[0]
+    else:
+        kinds = ", ".join(reminder_types[:-1]) + " and " + reminder_types[-1]
+    return f"⏰ Hi {name}, this is your {kinds} reminder 🌸"
+
+
+def coalesce_reminders(rows, text=reminder_text):
+    """
+    One message per (user, channel, recipient) for rows due together.
+    Each message carries the reminder ids it covers in "reminder_ids".
+    """
+    groups = {}
+    for row in rows:
+        for m in reminder_messages(row, ""):
+            group_key = (row["user_id"], m["channel"], m["to"])
+            group = groups.get(group_key)
+            if group is None:
+                group = groups[group_key] = {"message": m, "name": row["name"], "types": [], "ids": []}
+            if row["reminder_type"] not in group["types"]:
+                group["types"].append(row["reminder_type"])
+            group["ids"].append(row["id"])
+
+    messages = []
+    for (user_id, channel, to), group in groups.items():
+        m = group["message"]
+        m["message"] = text(group["name"], group["types"])
+        m["user_id"] = user_id
+        m["reminder_id"] = group["ids"][0]
+        m["reminder_ids"] = group["ids"]
+        m["key"] = f"u{user_id}:{channel}:{to}"
+        messages.append(m)
+    return messages
+
+
+_coalesce_stats = {"reminders": 0, "uncoalesced": 0, "messages": 0}
+_coalesce_lock = threading.Lock()
+
+
+def _count_coalescing(rows, messages):
+    uncoalesced = sum(bool(r["reminder_email"]) + bool(r["reminder_phone"]) for r in rows)
+    with _coalesce_lock:
+        _coalesce_stats["reminders"] += len(rows)
+        _coalesce_stats["uncoalesced"] += uncoalesced
+        _coalesce_stats["messages"] += len(messages)
+    return uncoalesced
+
+
+def coalescing_status():
+    """Outbound calls saved by coalescing since the process started."""
+    with _coalesce_lock:
+        stats = dict(_coalesce_stats)
+    stats["calls_saved"] = stats["uncoalesced"] - stats["messages"]
+    stats["reduction_pct"] = (
+        round(100.0 * stats["calls_saved"] / stats["uncoalesced"], 1) if stats["uncoalesced"] else 0.0
+    )
+    return stats
+
+
+def dispatch_reminders(rows, name="reminder_tick"):
+    """Send straight away, without the outbox (benchmarks / manual runs)."""
+    messages = coalesce_reminders(rows)
+    _count_coalescing(rows, messages)
+
+    if messages:
+        dispatcher = track(NotificationDispatcher(REMINDER_SENDERS, name=name))
+        dispatcher.run(messages)
+    return len(messages)
+
+
+def due_outbox_messages(rows, slot_prefix, text=reminder_text):
+    """
+    Coalesced messages keyed for the outbox. The key names the slot, user,
+    channel and recipient, so re-enqueuing the same slot is a no-op.
+    """
+    messages = coalesce_reminders(rows, text)
+    for m in messages:
+        m["key"] = f"{slot_prefix}:{m['key']}"
+    return messages
+
+
+# ---------------- Minute Tick ----------------
+def dispatch_due_reminders(now=None):
+    """
+    Runs once a minute. Enqueues every reminder due in the minutes since
+    the last tick (bounded by MISFIRE_GRACE_SECONDS) into the outbox and
+    moves the checkpoint in the same transaction, so a crash either
+    records both or neither. Sending happens in deliver_outbox().
+    """
+    now = (now or datetime.now(timezone.utc)).replace(second=0, microsecond=0)
+
+    last = get_checkpoint(TICK_CHECKPOINT)
+    earliest = now - timedelta(seconds=MISFIRE_GRACE_SECONDS)
+    start = now
+    if last:
+        start = max(datetime.fromisoformat(last) + timedelta(minutes=1), earliest)
+        if start > now:
+            return 0  # this minute was already enqueued (e.g. by another process)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        timezones = reminder_timezones(cursor)
+
+        total = due = calls = 0
+        minute = start
+        while minute <= now:
+            rows = fetch_due_reminders(cursor, minute, timezones)
+            messages = due_outbox_messages(rows, f"reminder:{minute.strftime('%Y-%m-%dT%H:%MZ')}")
+            due += len(rows)
+            calls += _count_coalescing(rows, messages)
+            total += enqueue(cursor, messages)
+            minute += timedelta(minutes=1)
+
+        set_checkpoint(TICK_CHECKPOINT, now.isoformat(), cursor=cursor)
+        conn.commit()
+    finally:
+        conn.close()
+
+    if due:
+        print(f"🟢 Reminder tick: {due} reminders -> {total} messages "
+              f"({calls - total} outbound calls saved by coalescing)")
+    if OUTBOX_DELIVER_IN_SCHEDULER and total:
+        # Only this tick's priority: bulk digests are left to the sweep
+        deliver_outbox(min_priority=PRIORITY_NORMAL)
+    return total
+
+
+def deliver_pending_notifications():
+    """Retries, expired leases, and anything a tick enqueued but didn't send."""
+    if OUTBOX_DELIVER_IN_SCHEDULER:
+        deliver_outbox()
+
+
+# ---------------- Daily Reminder ----------------
+def send_daily_reminder():
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT r.id, r.user_id, r.reminder_type, u.name,
+                   r.reminder_phone, r.reminder_email
+            FROM reminders r
+            JOIN users u ON u.id = r.user_id
+            WHERE r.reminder_type = 'daily'
+        """)
+        rows = cursor.fetchall()
+
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        messages = due_outbox_messages(
+            rows, f"daily:{day}",
+            text=lambda name, _types: f"Hello {name}! This is your daily health reminder 🌸"
+        )
+        _count_coalescing(rows, messages)
+
+        queued = enqueue(cursor, messages)
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"📨 Daily reminder run: {queued} queued")
+    purge_outbox()
+    if OUTBOX_DELIVER_IN_SCHEDULER and queued:
+        deliver_outbox(min_priority=PRIORITY_NORMAL)
+
+
+# ---------------- Register Jobs ----------------
+LEGACY_REMINDER_JOB = re.compile(r"reminder_[0-9]+")
+
+
+def drop_legacy_reminder_jobs():
+    """
+    Remove the old one-cron-job-per-reminder entries ("reminder_<id>") from
+    the job store. Only numeric ids match, so reminder_tick is never touched.
+    """
+    conn = get_db_connection()
+    try:
+        legacy = [
+            (job_id,)
+            for (job_id,) in conn.execute(f"SELECT id FROM {JOBSTORE_TABLE} WHERE id LIKE 'reminder%'")
+            if LEGACY_REMINDER_JOB.fullmatch(job_id)
+        ]
+        conn.executemany(f"DELETE FROM {JOBSTORE_TABLE} WHERE id = ?", legacy)
+        conn.commit()
+    except sqlite3.OperationalError:
+        pass  # job store table not created yet
+    finally:
+        conn.close()
+
+
+def schedule_reminder_jobs(scheduler):
+    scheduler.add_job(
+        dispatch_due_reminders,
+        trigger="cron",
+        second=0,
+        id="reminder_tick",
+        replace_existing=True
+    )
+
+    scheduler.add_job(
+        deliver_pending_notifications,
+        trigger="interval",
+        seconds=30,
+        id="outbox_delivery",
+        replace_existing=True
+    )
+
+    # Only add once: re-adding would reset the 24h interval on every restart.
+    if scheduler.get_job("daily_reminder") is None:
+        scheduler.add_job(send_daily_reminder, "interval", hours=24, id="daily_reminder")  # use minutes=1 for testing
@@ -0,0 +1,508 @@
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from string import Formatter
+
+
+# ---------------- Rule Packs ----------------
+# Recommendation wording and thresholds live in rules/recommendations.json
+# instead of code. The file is validated and compiled once into plain
+# Python structures (dicts keyed by category / label, closures per rule),
+# and the compiled pack is swapped in with a single assignment. Requests
+# read whichever pack is current and never wait on a reload: a reload runs
+# on one thread (the first to notice the new mtime) while the others keep
+# using the previous pack. A file that fails validation is logged and
+# ignored; the last good pack stays active.
+#
+# Pack layout:
+#   block:  {"fields": {name: field}, "parts": [part, ...]}
+#   field:  {"keys": [...], "type": "int" | "float" | "text", "default", "lower"}
+#           keys are tried in order like `a or b or c`
+#   part:   {"rules": [rule, ...]} (first match wins, last one must have no
+#           "when") | {"lookup": lookup} | {"text": template}
+#   rule:   {"when": {field: cond}, "text": template, optional "lookup"}
+#   cond:   "label" (equal), ["a", "b"] (one of), {"lt"|"lte"|"gt"|"gte"|"eq"|"ne"|"in": x}
+#   lookup: {"field", "map": {label: text}, "default": text}
+#   anomalies: {kind: text | {metric: text}}, placeholders from ANOMALY_FIELDS
+#   insights:  {kind: text}, placeholders from INSIGHT_FIELDS
+#   benchmarks: {"default": text, metric: text}, placeholders from BENCHMARK_FIELDS
+#   focus:     {"default": text, module: text}, placeholders from FOCUS_FIELDS
+# Parts are joined with a space; labels compare case-insensitively.
+
+RULES_PATH = os.getenv(
+    "RULES_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rules", "recommendations.json")
+)
+# How often a worker stats the file; the fast path is one clock read
+RULES_CHECK_SECONDS = float(os.getenv("RULES_CHECK_SECONDS", "2"))
+
+
+class RulePackError(ValueError):
+    """The rule file is not a valid pack; `errors` lists every problem found."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("; ".join(self.errors))
+
+
+# ---------------- Compiling ----------------
+NUMERIC_OPS = {
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+}
+
+
+ANOMALY_FIELDS = {"metric", "label", "unit", "value", "mean", "threshold", "kind", "days"}
+INSIGHT_FIELDS = {"kind", "a", "b", "direction", "r", "n", "r_recent"}
+BENCHMARK_FIELDS = {"metric", "label", "unit", "value", "percentile", "cohort", "users"}
+FOCUS_FIELDS = {"module", "predicted", "current"}
+
+
+def _label(value):
+    return str(value if value is not None else "").strip().lower()
+
+
+def _compile_field(spec, where, errors):
+    keys = spec.get("keys")
+    kind = spec.get("type", "text")
+    if not isinstance(keys, list) or not keys or not all(isinstance(k, str) for k in keys):
+        errors.append(f"{where}: keys must be a non-empty list of strings")
+        return None
+    if kind not in ("int", "float", "text"):
+        errors.append(f"{where}: unknown type {kind!r}")
+        return None
+
+    keys = tuple(keys)
+    lower = bool(spec.get("lower"))
+
+    def raw(data):
+        value = None
+        for key in keys:
+            value = data.get(key)
+            if value:
+                break
+        return value
+
+    if kind == "text":
+        default = spec.get("default", "")
+
+        def extract(data):
+            value = raw(data) or default
+            return value.lower() if lower and isinstance(value, str) else value
+        return extract
+
+    convert = int if kind == "int" else float
+    default = spec.get("default", 0)
+
+    def extract(data):
+        try:
+            return convert(raw(data))
+        except (TypeError, ValueError):
+            return default
+    return extract
+
+
+def _compile_condition(field, cond, where, errors):
+    """A predicate on the context value of `field`."""
+    if isinstance(cond, str):
+        cond = {"eq": cond}
+    elif isinstance(cond, list):
+        cond = {"in": cond}
+    if not isinstance(cond, dict) or not cond:
+        errors.append(f"{where}: condition on {field!r} must be a label, a list or an operator dict")
+        return None
+
+    tests = []
+    for op, target in cond.items():
+        if op in NUMERIC_OPS:
+            if isinstance(target, bool) or not isinstance(target, (int, float)):
+                errors.append(f"{where}: {field} {op} needs a number, got {target!r}")
+                continue
+            compare = NUMERIC_OPS[op]
+            tests.append(lambda v, c=compare, t=target: isinstance(v, (int, float)) and c(v, t))
+        elif op in ("eq", "ne"):
+            label = _label(target)
+            tests.append((lambda v, t=label: _label(v) == t) if op == "eq" else (lambda v, t=label: _label(v) != t))
+        elif op == "in":
+            if not isinstance(target, list):
+                errors.append(f"{where}: {field} in needs a list")
+                continue
+            labels = frozenset(_label(t) for t in target)
+            tests.append(lambda v, t=labels: _label(v) in t)
+        else:
+            errors.append(f"{where}: unknown operator {op!r}")
+
+    if len(tests) == 1:
+        return tests[0]
+    return lambda v, ts=tuple(tests): all(t(v) for t in ts)
+
+
+def _check_template(text, names, where, errors):
+    if not isinstance(text, str):
+        errors.append(f"{where}: text must be a string")
+        return False
+    try:
+        used = {name for _, name, _, _ in Formatter().parse(text) if name is not None}
+    except ValueError as e:
+        errors.append(f"{where}: bad template ({e})")
+        return False
+    unknown = used - names
+    if unknown:
+        errors.append(f"{where}: unknown placeholder(s) {sorted(unknown)}")
+        return False
+    return True
+
+
+def _render(text, has_fields):
+    if not has_fields:
+        return lambda ctx: text
+    return lambda ctx: text.format_map(ctx)
+
+
+def _compile_lookup(spec, names, where, errors):
+    if not isinstance(spec, dict) or spec.get("field") not in names:
+        errors.append(f"{where}: lookup needs a declared field")
+        return None
+    mapping = spec.get("map")
+    if not isinstance(mapping, dict) or not all(isinstance(v, str) for v in mapping.values()):
+        errors.append(f"{where}: lookup map must be label -> text")
+        return None
+    default = spec.get("default", "")
+    if not isinstance(default, str):
+        errors.append(f"{where}: lookup default must be a string")
+        return None
+
+    field = spec["field"]
+    table = {_label(k): v for k, v in mapping.items()}
+    return lambda ctx: table.get(_label(ctx[field]), default)
+
+
+def _compile_rules(rules, names, where, errors):
+    """First-match rule list -> one closure returning the rendered text."""
+    if not isinstance(rules, list) or not rules:
+        errors.append(f"{where}: rules must be a non-empty list")
+        return None
+    if not isinstance(rules[-1], dict) or "when" in rules[-1]:
+        errors.append(f"{where}: the last rule must have no 'when' (the fallback)")
+
+    compiled = []
+    for i, rule in enumerate(rules):
+        at = f"{where}[{i}]"
+        if not isinstance(rule, dict):
+            errors.append(f"{at}: rule must be an object")
+            continue
+        tests = []
+        for field, cond in (rule.get("when") or {}).items():
+            if field not in names:
+                errors.append(f"{at}: unknown field {field!r}")
+                continue
+            test = _compile_condition(field, cond, at, errors)
+            if test:
+                tests.append((field, test))
+        text = rule.get("text", "")
+        if not _check_template(text, names, at, errors):
+            continue
+        render = _render(text, bool(names))
+        if "lookup" in rule:
+            lookup = _compile_lookup(rule["lookup"], names, at, errors)
+            if lookup:
+                render = (lambda ctx, r=render, lk=lookup: f"{r(ctx)} {lk(ctx)}")
+        compiled.append((tuple(tests), render))
+
+    def evaluate(ctx):
+        for tests, render in compiled:
+            for field, test in tests:
+                if not test(ctx[field]):
+                    break
+            else:
+                return render(ctx)
+        return ""
+    return evaluate
+
+
+def _compile_block(spec, where, errors, inputs=None):
+    """
+    A block turns a value dict into text. Returns (extract, render):
+    extract(data) -> context dict, render(context) -> text.
+    """
+    if not isinstance(spec, dict):
+        errors.append(f"{where}: must be an object")
+        return None, None
+
+    if inputs is not None:
+        names = set(inputs)
+        extractors = None
+    else:
+        fields = spec.get("fields") or {}
+        extractors = {}
+        for name, field in fields.items():
+            fn = _compile_field(field, f"{where}.fields.{name}", errors)
+            if fn:
+                extractors[name] = fn
+        names = set(fields)
+
+    parts = []
+    for i, part in enumerate(spec.get("parts") or []):
+        at = f"{where}.parts[{i}]"
+        if "rules" in part:
+            fn = _compile_rules(part["rules"], names, at, errors)
+        elif "lookup" in part:
+            fn = _compile_lookup(part["lookup"], names, at, errors)
+        elif "text" in part:
+            fn = _render(part["text"], bool(names)) if _check_template(part["text"], names, at, errors) else None
+        else:
+            errors.append(f"{at}: part needs rules, lookup or text")
+            fn = None
+        if fn:
+            parts.append(fn)
+    if not spec.get("parts"):
+        errors.append(f"{where}: parts must be a non-empty list")
+
+    if extractors is None:
+        extract = dict
+    else:
+        items = tuple(extractors.items())
+
+        def extract(data):
+            return {name: fn(data) for name, fn in items}
+
+    if len(parts) == 1:
+        only = parts[0]
+        render = lambda ctx: only(ctx).strip()  # noqa: E731
+    else:
+        render = lambda ctx: " ".join(p(ctx) for p in parts).strip()  # noqa: E731
+    return extract, render
+
+
+class RulePack:
+    """A validated, compiled rules file. Immutable once built."""
+
+    def __init__(self, spec, source="<memory>"):
+        errors = []
+        if not isinstance(spec, dict):
+            raise RulePackError(["pack must be a JSON object"])
+        self.version = spec.get("version")
+        if not isinstance(self.version, str) or not self.version:
+            errors.append("version must be a non-empty string")
+        self.source = source
+
+        # Suggestions: category -> (extract, render)
+        sug = spec.get("suggestion") or {}
+        self.chatbot_line = sug.get("chatbot_line", "")
+        self.default_suggestion = sug.get("default", "")
+        self.suggestions = {}
+        for category, block in (sug.get("categories") or {}).items():
+            compiled = _compile_block(block, f"suggestion.{category}", errors)
+            if compiled[0]:
+                self.suggestions[category.lower()] = compiled
+        if not self.suggestions:
+            errors.append("suggestion.categories must define at least one category")
+
+        # Recommendation: ordered (category, always, extract, summary, render)
+        rec = spec.get("recommendation") or {}
+        self.recommendation_empty = rec.get("empty", "")
+        self.summary_header = rec.get("summary_header", "")
+        self.closing = rec.get("closing", "")
+        self.recommendations = []
+        for i, block in enumerate(rec.get("categories") or []):
+            where = f"recommendation.categories[{i}]"
+            category = block.get("category") if isinstance(block, dict) else None
+            if not category:
+                errors.append(f"{where}: category is required")
+                continue
+            extract, render = _compile_block(block, where, errors)
+            summary = block.get("summary", "")
+            if extract and _check_template(summary, set(block.get("fields") or {}), f"{where}.summary", errors):
+                self.recommendations.append((category, bool(block.get("always")), extract, summary, render))
+
+        # Anomalies (utils/metric_stats.py): kind -> text, or kind -> {metric: text}
+        self.anomalies = {}
+        for kind, texts in (spec.get("anomalies") or {}).items():
+            for metric, text in (texts.items() if isinstance(texts, dict) else [(None, texts)]):
+                if _check_template(text, ANOMALY_FIELDS, f"anomalies.{kind}", errors):
+                    self.anomalies[(kind, metric)] = text
+
+        # Insights (utils/insights.py): kind -> text
+        self.insights = {}
+        for kind, text in (spec.get("insights") or {}).items():
+            if _check_template(text, INSIGHT_FIELDS, f"insights.{kind}", errors):
+                self.insights[kind] = text
+
+        # Cohort benchmarks (utils/cohort_sketches.py): metric or "default" -> text
+        self.benchmarks = {}
+        for metric, text in (spec.get("benchmarks") or {}).items():
+            if _check_template(text, BENCHMARK_FIELDS, f"benchmarks.{metric}", errors):
+                self.benchmarks[metric] = text
+
+        # Focus areas (utils/focus_model.py): module or "default" -> text
+        self.focus_texts = {}
+        for module, text in (spec.get("focus") or {}).items():
+            if _check_template(text, FOCUS_FIELDS, f"focus.{module}", errors):
+                self.focus_texts[module] = text
+
+        # AI tip: context is {score, wellness, modules_logged}
+        tip = spec.get("ai_tip") or {}
+        _, self._ai_tip = _compile_block(tip, "ai_tip", errors,
+                                         inputs=tip.get("inputs") or ["score", "wellness", "modules_logged"])
+
+        if errors:
+            raise RulePackError(errors)
+
+    # ---------------- Evaluating ----------------
+    def suggestion(self, category, value, include_chatbot_line=True):
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                value = {}
+        if not isinstance(value, dict):
+            value = {}
+
+        tail = self.chatbot_line if include_chatbot_line else ""
+        compiled = self.suggestions.get((category or "").lower())
+        if compiled is None:
+            return self.default_suggestion + tail
+        extract, render = compiled
+        return render(extract(value)) + tail
+
+    def recommendation(self, latest_data):
+        """(recommendation, health_summary) for {category: value dict}."""
+        messages = []
+        summary_lines = []
+        for category, always, extract, summary, render in self.recommendations:
+            data = latest_data.get(category)
+            if not isinstance(data, dict):
+                data = {}
+            if not data and not always:
+                continue
+            ctx = extract(data)
+            summary_lines.append(summary.format_map(ctx))
+            messages.append(render(ctx))
+
+        recommendation = " ".join(messages) + " " + self.closing
+        health_summary = self.summary_header + "\n" + "\n".join(summary_lines)
+        return recommendation, health_summary
+
+    def anomaly(self, anomaly):
+        """Text for one detect_anomalies() entry, or None if the pack has none."""
+        text = self.anomalies.get((anomaly["kind"], anomaly["metric"])) or self.anomalies.get((anomaly["kind"], None))
+        return text.format_map(anomaly) if text else None
+
+    def insight(self, context):
+        """Text for one described insight, or None if the pack has none."""
+        text = self.insights.get(context["kind"])
+        return text.format_map(context) if text else None
+
+    def benchmark(self, benchmark):
+        """Text for one user_benchmarks() entry, or None if the pack has none."""
+        text = self.benchmarks.get(benchmark["metric"]) or self.benchmarks.get("default")
+        return text.format_map(benchmark) if text else None
+
+    def focus(self, focus):
+        """Text for one focus area from the model, or None if the pack has none."""
+        text = self.focus_texts.get(focus["module"]) or self.focus_texts.get("default")
+        return text.format_map(focus) if text else None
+
+    def ai_tip(self, score, wellness, latest_data):
+        return self._ai_tip({"score": score, "wellness": wellness, "modules_logged": len(latest_data)})
+
+
+def load_pack(path):
+    """Read, validate and compile a rules file (raises RulePackError)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RulePackError([f"cannot read {path}: {e}"])
+    return RulePack(spec, source=path)
+
+
+# ---------------- Hot Swap ----------------
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+_reload_lock = threading.Lock()
+_active = None          # current RulePack; replaced, never mutated
+_active_signature = None
+_seen_signature = None  # last file version looked at, good or bad
+_next_check = 0.0
+_status = {"loaded_at": None, "reloads": 0, "last_error": None}
+
+
+def _reload(force=False, wait=False):
+    global _active, _active_signature, _seen_signature
+
+    # Only one thread compiles; everyone else carries on with the old pack
+    if not _reload_lock.acquire(blocking=wait):
+        return
+    try:
+        signature = _signature(RULES_PATH)
+        if not force and (signature is None or signature == _seen_signature):
+            return
+        _seen_signature = signature
+        try:
+            pack = load_pack(RULES_PATH)
+        except RulePackError as e:
+            _status["last_error"] = str(e)
+            print(f"❌ Rule pack {RULES_PATH} rejected, keeping {getattr(_active, 'version', None)}: {e}")
+            return
+        _active, _active_signature = pack, signature
+        _status["loaded_at"] = datetime.now(timezone.utc).isoformat()
+        _status["reloads"] += 1
+        _status["last_error"] = None
+        print(f"✅ Rule pack {pack.version} loaded")
+    finally:
+        _reload_lock.release()
+
+
+def current_pack():
+    """The active pack; checks the file for changes every RULES_CHECK_SECONDS."""
+    global _next_check
+    now = time.monotonic()
+    if now >= _next_check:
+        _next_check = now + RULES_CHECK_SECONDS
+        _reload()
+    if _active is None:
+        # Nothing to fall back on yet: wait for whoever is loading it
+        _reload(wait=True)
+    if _active is None:
+        # The file is missing or bad on first use: fail loudly
+        raise RulePackError([_status["last_error"] or f"no rule pack at {RULES_PATH}"])
+    return _active
+
+
+def reload_rules():
+    """Re-read the file now (admin action); returns rule_pack_status()."""
+    _reload(force=True, wait=True)
+    return rule_pack_status()
+
+
+def rule_pack_status():
+    return {
+        "path": RULES_PATH,
+        "version": getattr(_active, "version", None),
+        **_status,
+    }
+
+
+if __name__ == "__main__":
+    # cd backend && python -m utils.rule_packs rules/recommendations.json
+    path = sys.argv[1] if len(sys.argv) > 1 else RULES_PATH
+    try:
+        pack = load_pack(path)
+    except RulePackError as e:
+        for error in e.errors:
+            print(f"❌ {error}")
+        sys.exit(1)
+    print(f"✅ {path}: version {pack.version}, "
+          f"{len(pack.suggestions)} suggestion categories, {len(pack.recommendations)} recommendation categories")
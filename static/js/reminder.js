@@ -14,7 +14,10 @@ function saveReminder() {
     fetch("/save-reminder", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ type, time, email, phone })  // ✅ send all 4 values
+        body: JSON.stringify({
+            type, time, email, phone,
+            timezone: Intl.DateTimeFormat().resolvedOptions().timeZone
+        })
     })
     .then(res => res.json())
     .then(data => {